@@ -0,0 +1,46 @@
+"""
+benchmarks/bench_codec.py
+
+Pub/Sub 消息编解码对比：原 json.dumps/json.loads vs shared.codec 的 msgpack + 压缩。
+统计每条消息的字节数与编码/解码耗时。
+
+用法：
+    python -m benchmarks.bench_codec --messages 2000
+"""
+
+import json
+import time
+import argparse
+
+from shared.codec import MessageCodec, zstandard
+from benchmarks.bench_dao_bulk import make_snapshot
+
+
+def bench(name, encode, decode, snapshots):
+    start = time.perf_counter()
+    encoded = [encode(s) for s in snapshots]
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for message in encoded:
+        decode(message)
+    decode_time = time.perf_counter() - start
+    size = sum(len(m) for m in encoded) / len(encoded)
+    n = len(snapshots)
+    print(f"{name:<16} 平均 {size:>9,.0f} 字节/条  编码 {encode_time / n * 1e6:>8,.1f} µs/条  "
+          f"解码 {decode_time / n * 1e6:>8,.1f} µs/条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    snapshots = [make_snapshot(f"loc{i}", i) for i in range(args.messages)]
+    bench("json(原路径)", lambda d: json.dumps(d).encode("utf-8"), json.loads, snapshots)
+    for compression in ("none", "zlib") + (("zstd",) if zstandard is not None else ()):
+        codec = MessageCodec(fmt="msgpack", compression=compression)
+        bench(f"msgpack+{compression}", codec.encode, codec.decode, snapshots)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+benchmarks/bench_dao_bulk.py
+
+DAO 写入路径性能对比：逐快照 executemany（原路径） vs 按表汇总的多行 bulk_upsert。
+
+默认不连接数据库：使用 pymysql 的延迟连接对象完成真实的参数转义与语句拼接，
+只统计客户端耗时与语句数（往返次数），并按 --rtt-ms 估算含网络往返的总耗时。
+指定 --mysql 时使用 MYSQL_* 环境变量连接真实数据库，写入 location 为 __bench__ 的数据后删除。
+
+用法：
+    python -m benchmarks.bench_dao_bulk --locations 500 --rtt-ms 0.5
+    python -m benchmarks.bench_dao_bulk --locations 200 --mysql
+"""
+
+import os
+import time
+import random
+import argparse
+
+import pymysql
+import pymysql.cursors
+
+from shared.weather_dao import WeatherUnitOfWork
+
+
+def make_snapshot(location, seed):
+    """生成一份与 one-call 结构一致的快照"""
+    rnd = random.Random(seed)
+    now = 1_700_000_000
+    weather = [{"id": 800, "main": "Clear", "description": "晴", "icon": "01d"}]
+    return {
+        "location": location,
+        "current": {
+            "dt": now, "sunrise": now - 20000, "sunset": now + 20000, "temp": rnd.uniform(-10, 35),
+            "feels_like": rnd.uniform(-10, 35), "pressure": 1013, "humidity": rnd.randint(10, 100),
+            "dew_point": 10.5, "uvi": 3.2, "clouds": 20, "visibility": 10000, "wind_speed": 3.1,
+            "wind_deg": 90, "wind_gust": 5.5, "weather": weather,
+        },
+        "minutely": [{"dt": now + 60 * i, "precipitation": rnd.random()} for i in range(61)],
+        "hourly": [{
+            "dt": now + 3600 * i, "temp": rnd.uniform(-10, 35), "feels_like": 20.0, "pressure": 1013,
+            "humidity": 50, "wind_speed": 3.0, "wind_deg": 180, "clouds": 40, "pop": 0.2, "weather": weather,
+        } for i in range(48)],
+        "daily": [{
+            "dt": now + 86400 * i, "sunrise": now, "sunset": now, "moonrise": now, "moonset": now,
+            "moon_phase": 0.5, "summary": "晴到多云",
+            "temp": {"day": 25, "min": 15, "max": 28, "night": 16, "eve": 22, "morn": 17},
+            "feels_like": {"day": 25, "night": 16, "eve": 22, "morn": 17},
+            "pressure": 1013, "humidity": 50, "wind_speed": 3.0, "wind_deg": 180, "clouds": 40,
+            "pop": 0.2, "rain": 0.0, "uvi": 6.0, "weather": weather,
+        } for i in range(8)],
+    }
+
+
+def legacy_rows(dao, location, data):
+    """原路径的行构建方式：逐字段字典查找"""
+    if dao.table_name == "current_weather":
+        w = data
+        return [(location, w["dt"], w["sunrise"], w["sunset"], w["temp"], w["feels_like"], w["pressure"],
+                 w["humidity"], w["dew_point"], w["uvi"], w["clouds"], w["visibility"], w["wind_speed"],
+                 w["wind_deg"], w["wind_gust"], w["weather"][0]["id"], w["weather"][0]["main"],
+                 w["weather"][0]["description"], w["weather"][0]["icon"])]
+    if dao.table_name == "minutely_forecast":
+        return [(location, m["dt"], m["precipitation"]) for m in data]
+    if dao.table_name == "hourly_forecast":
+        return [(location, h["dt"], h["temp"], h["feels_like"], h["pressure"], h["humidity"], h["wind_speed"],
+                 h["wind_deg"], h["clouds"], h["pop"], h["weather"][0]["main"] if h["weather"] else None)
+                for h in data]
+    return [(location, d["dt"], d["sunrise"], d["sunset"], d["moonrise"], d["moonset"], d["moon_phase"],
+             d["summary"], d["temp"]["day"], d["temp"]["min"], d["temp"]["max"], d["temp"]["night"],
+             d["temp"]["eve"], d["temp"]["morn"], d["feels_like"]["day"], d["feels_like"]["night"],
+             d["feels_like"]["eve"], d["feels_like"]["morn"], d["pressure"], d["humidity"], d["wind_speed"],
+             d["wind_deg"], d["clouds"], d["pop"], d.get("rain", 0), d["uvi"],
+             d["weather"][0]["main"] if d["weather"] else None) for d in data]
+
+
+class CountingCursor(pymysql.cursors.Cursor):
+    """只转义、拼接语句并计数，不发送到服务器"""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.statements = 0
+        self.bytes_sent = 0
+
+    def execute(self, query, args=None):
+        query = self.mogrify(query, args)
+        if isinstance(query, (bytes, bytearray)):
+            query = query.decode("utf8")
+        if query.startswith("SELECT @@max_allowed_packet"):
+            self._rows = ((64 * 1024 * 1024,),)
+            return 1
+        self.statements += 1
+        self.bytes_sent += len(query)
+        return 1
+
+    def fetchone(self):
+        return self._rows[0]
+
+
+def run_legacy(uow, snapshots, cursor):
+    for snap in snapshots:
+        for section, dao in uow.daos.items():
+            data = snap.get(section)
+            if data:
+                cursor.executemany(dao.upsert_sql, legacy_rows(dao, snap["location"], data))
+
+
+def run_bulk(uow, snapshots, cursor):
+    pending = {section: [] for section in uow.daos}
+    for snap in snapshots:
+        for section, dao in uow.daos.items():
+            data = snap.get(section)
+            if data:
+                pending[section].extend(dao.to_row(snap["location"], item) for item in dao.items(data))
+    for section, rows in pending.items():
+        uow.daos[section].bulk_upsert(cursor, rows)
+
+
+def bench_offline(uow, snapshots, rows, rtt_ms, repeat):
+    conn = pymysql.connect(defer_connect=True, charset="utf8mb4")
+    conn.server_status = 0  # 未连接时转义需要的服务器状态
+    for name, fn in (("executemany(原路径)", run_legacy), ("bulk_upsert", run_bulk)):
+        best = None
+        for _ in range(repeat):
+            cursor = CountingCursor(conn)
+            start = time.perf_counter()
+            fn(uow, snapshots, cursor)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None or elapsed < best else best
+        estimated = best + cursor.statements * rtt_ms / 1000
+        print(f"{name:<20} 客户端 {rows / best:>12,.0f} 行/秒  语句数 {cursor.statements:>6}  "
+              f"发送 {cursor.bytes_sent / 1024:>9,.0f} KB  含往返估算 {rows / estimated:>12,.0f} 行/秒")
+
+
+def bench_mysql(uow, snapshots, rows):
+    from shared.db_connector import init_mysql_pool
+    init_mysql_pool(uow.MYSQL_HOST, uow.MYSQL_PORT, uow.MYSQL_USER, uow.MYSQL_PASSWORD, uow.MYSQL_DB)
+    for name, fn in (("executemany(原路径)", run_legacy), ("bulk_upsert", run_bulk)):
+        conn = uow.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                start = time.perf_counter()
+                fn(uow, snapshots, cursor)
+                conn.commit()
+                elapsed = time.perf_counter() - start
+                for dao in uow.daos.values():
+                    cursor.execute(f"DELETE FROM {dao.table_name} WHERE location LIKE '__bench__%'")
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"{name:<20} MySQL {rows / elapsed:>12,.0f} 行/秒  耗时 {elapsed:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, default=500, help="每批快照数（地点数）")
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="估算用的单条语句往返时间（毫秒）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mysql", action="store_true", help="连接 MYSQL_* 指定的真实数据库")
+    args = parser.parse_args()
+
+    uow = WeatherUnitOfWork(os.getenv("MYSQL_HOST"), int(os.getenv("MYSQL_PORT", 3306)),
+                            os.getenv("MYSQL_USER"), os.getenv("MYSQL_PASSWORD"), os.getenv("MYSQL_DB", "weather"))
+    snapshots = [make_snapshot(f"__bench__{i}", i) for i in range(args.locations)]
+    rows = sum(1 + len(s["minutely"]) + len(s["hourly"]) + len(s["daily"]) for s in snapshots)
+    print(f"{args.locations} 个快照，共 {rows} 行")
+    if args.mysql:
+        bench_mysql(uow, snapshots, rows)
+    else:
+        bench_offline(uow, snapshots, rows, args.rtt_ms, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
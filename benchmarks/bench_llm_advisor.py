@@ -0,0 +1,79 @@
+"""
+benchmarks/bench_llm_advisor.py
+
+LLMAdvisor 建议获取性能对比（使用本地模拟模型服务 benchmarks/fake_llm_server.py）：
+- 逐个请求：每个地点的建议都单独调用一次模型（无缓存）
+- 缓存 + 凑批：master/llm_advisor.LLMAdvisor，多个线程并发调用 get_advice，
+  按量化特征缓存，相同特征合并、不同特征的未命中凑批为一次上游请求
+- 批量接口：get_advice_many 一次处理所有地点
+
+用法：
+    python -m benchmarks.bench_llm_advisor --locations 200 --regions 20 --threads 32 --latency 0.5
+"""
+
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from master.llm_advisor import LLMAdvisor, quantize
+from shared.http_client import build_session
+from benchmarks.fake_llm_server import FakeLLMServer
+
+
+def make_weather(rng, regions):
+    """同一区域的地点天气相近：温度/风速在区域基准上小幅波动"""
+    temp, code, wind, uvi = rng.choice(regions)
+    return {"current": {
+        "temp": temp + rng.uniform(-1.5, 1.5),
+        "weather": [{"id": code}],
+        "wind_speed": max(0.0, wind + rng.uniform(-1, 1)),
+        "uvi": uvi,
+    }}
+
+
+def run(name, server, weather, call, threads):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(call, weather))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} 总耗时 {elapsed * 1000:9.1f} ms  上游请求 {server.requests:4d}  生成条数 {server.items:4d}")
+    server.requests = server.items = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--regions", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    regions = [(rng.uniform(-5, 35), rng.choice((800, 801, 803, 500, 501, 600, 211)), rng.uniform(0, 12),
+                rng.uniform(0, 9)) for _ in range(args.regions)]
+    weather = [make_weather(rng, regions) for _ in range(args.locations)]
+    print(f"{args.locations} 个地点，{len(set(map(quantize, weather)))} 个不同的量化特征")
+
+    server = FakeLLMServer(latency=args.latency, per_item=0.01).start()
+    # 禁用缓存与凑批：每个地点单独调用一次模型
+    naive = LLMAdvisor(api_url=server.url, cache_ttl=1e-9, batch_size=1, batch_window=0)
+    naive.session = build_session(pool_size=args.threads)
+    run("逐个请求", server, weather, lambda w: naive._generate([quantize(w)]), args.threads)
+
+    advisor = LLMAdvisor(api_url=server.url)
+    run("缓存+凑批", server, weather, advisor.get_advice, args.threads)
+    run("缓存命中", server, weather, advisor.get_advice, args.threads)
+
+    advisor = LLMAdvisor(api_url=server.url)
+    started = time.perf_counter()
+    advisor.get_advice_many(weather)
+    elapsed = time.perf_counter() - started
+    print(f"{'批量接口':<12} 总耗时 {elapsed * 1000:9.1f} ms  上游请求 {server.requests:4d}  生成条数 {server.items:4d}")
+    print(advisor.stats()["cache"])
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+benchmarks/bench_sms.py
+
+短信发送性能对比（使用本地模拟网关 benchmarks/fake_sms_gateway.py）：
+- 同步逐条：每条告警对每个接收人同步 POST 一次（调用方阻塞到发送完成）
+- 异步批量：master/sms_sender.SmsSender（入队即返回，相同内容合并请求、并发发送、令牌桶限速、失败重试）
+
+输出调用方阻塞时间、全部送达耗时、网关请求数与投递延迟。
+
+用法：
+    python -m benchmarks.bench_sms --alerts 50 --recipients 5 --latency 0.05 --failure-rate 0.1
+"""
+
+import time
+import argparse
+import tempfile
+
+import requests
+
+from master.sms_sender import SmsSender
+from benchmarks.fake_sms_gateway import FakeSmsGateway
+
+
+def bench_inline(gateway, alerts, recipients):
+    session = requests.Session()
+    started = time.perf_counter()
+    failures = 0
+    for message in alerts:
+        for phone in recipients:
+            response = session.post(gateway.url, json={"phone_numbers": [phone], "message": message}, timeout=10)
+            failures += response.status_code >= 300
+    elapsed = time.perf_counter() - started
+    print(f"同步逐条  阻塞 {elapsed * 1000:9.1f} ms  送达 {elapsed * 1000:9.1f} ms  "
+          f"网关请求 {gateway.requests:5d}  失败未重试 {failures}")
+
+
+def bench_async(gateway, alerts, recipients, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        sender = SmsSender(gateway.url, max_workers=args.workers, rate_limit=args.rate_limit,
+                           batch_interval=args.batch_interval, retry_path=f"{tmp}/retry.jsonl", max_backoff=0.5)
+        started = time.perf_counter()
+        for message in alerts:
+            sender.send_sms(recipients, message)
+        blocked = time.perf_counter() - started
+        sender.flush(timeout=120)
+        while sender.stats()["pending_retries"] or sender.stats()["outstanding"]:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        sender.close()
+        stats = sender.stats()
+    print(f"异步批量  阻塞 {blocked * 1000:9.1f} ms  送达 {elapsed * 1000:9.1f} ms  "
+          f"网关请求 {gateway.requests:5d}  重试 {stats['retried']}  丢弃 {stats['dropped']}  "
+          f"投递延迟 p50/p95 {stats['delivery_ms']['p50']}/{stats['delivery_ms']['p95']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", type=int, default=50)
+    parser.add_argument("--recipients", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate-limit", type=float, default=50)
+    parser.add_argument("--batch-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    alerts = [f"气温快速上升预警：loc{i}24小时内升温{5 + i % 5}℃" for i in range(args.alerts)]
+    recipients = [f"1380013{i:04d}" for i in range(args.recipients)]
+
+    gateway = FakeSmsGateway(latency=args.latency, failure_rate=args.failure_rate).start()
+    bench_inline(gateway, alerts, recipients)
+    gateway.stop()
+
+    gateway = FakeSmsGateway(latency=args.latency, failure_rate=args.failure_rate).start()
+    bench_async(gateway, alerts, recipients, args)
+    gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+benchmarks/bench_validation.py
+
+从节点快照校验性能对比：
+- 原路径：本次优化前的逐条校验（逐条过滤列表条目、生成器逐对比较 dt 顺序）
+- 逐条：当前的 process_weather_data（列表数据段快速路径）
+- 批量：process_weather_batch（标量字段按列向量化校验，返回有效性掩码）
+
+用法：
+    python -m benchmarks.bench_validation --records 20000 --batch-size 100
+"""
+
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from slave.data_processor import LIST_SECTIONS, SECTIONS, process_weather_batch, process_weather_data
+from benchmarks.bench_dao_bulk import make_snapshot
+
+
+def legacy_process(data):
+    """优化前的逐条校验实现（仅用于对比）"""
+    if not isinstance(data, dict):
+        raise ValueError("数据格式错误")
+    location = data.get("location")
+    if not location:
+        raise ValueError("缺少字段: location")
+    lat, lon = data.get("lat"), data.get("lon")
+    if lat is not None and lon is not None:
+        lat, lon = float(lat), float(lon)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("经纬度超出范围")
+    result = {"location": str(location), "lat": lat, "lon": lon, "timezone": data.get("timezone")}
+    current = data.get("current")
+    if current:
+        if not isinstance(current, dict) or "dt" not in current:
+            raise ValueError("current 数据格式错误")
+        temp, humidity = current.get("temp"), current.get("humidity")
+        if temp is not None and not (-100 <= temp <= 100):
+            logging.warning("温度异常")
+        if humidity is not None and not (0 <= humidity <= 100):
+            logging.warning("湿度异常")
+        result["current"] = current
+    for section in LIST_SECTIONS:
+        entries = data.get(section)
+        if not entries:
+            continue
+        valid = [entry for entry in entries if isinstance(entry, dict) and "dt" in entry]
+        dts = [entry["dt"] for entry in valid]
+        if any(a > b for a, b in zip(dts, dts[1:])):
+            valid = sorted(valid, key=lambda entry: entry["dt"])
+        result[section] = valid
+    alerts = data.get("alerts")
+    if alerts:
+        result["alerts"] = [alert for alert in alerts if isinstance(alert, dict) and "event" in alert]
+    if not any(result.get(section) for section in SECTIONS):
+        raise ValueError("快照中没有任何数据段")
+    return result
+
+
+def run_legacy(records, batch_size):
+    valid = 0
+    for data in records:
+        try:
+            legacy_process(data)
+            valid += 1
+        except ValueError:
+            pass
+    return valid
+
+
+def run_single(records, batch_size):
+    valid = 0
+    for data in records:
+        try:
+            process_weather_data(data)
+            valid += 1
+        except ValueError:
+            pass
+    return valid
+
+
+def run_batch(records, batch_size):
+    valid = 0
+    for i in range(0, len(records), batch_size):
+        _, mask = process_weather_batch(records[i:i + batch_size])
+        valid += int(np.count_nonzero(mask))
+    return valid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=100, help="每批快照数（对应订阅器的 SUBSCRIBE_BATCH_SIZE）")
+    parser.add_argument("--invalid-ratio", type=float, default=0.01, help="经纬度越界的记录比例")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    # 不计入日志输出的开销
+    logging.disable(logging.CRITICAL)
+    base = make_snapshot("bench", 0)
+    records = []
+    for i in range(args.records):
+        data = dict(base, location=f"loc{i}", lat=30.0 + i % 50 * 0.1, lon=120.0,
+                    current=dict(base["current"], temp=20.0 + i % 10))
+        if i < args.records * args.invalid_ratio:
+            data["lat"] = 95.0
+        records.append(data)
+
+    print(f"{args.records} 条快照，批大小 {args.batch_size}")
+    paths = (("原路径", run_legacy), ("逐条", run_single), ("批量", run_batch))
+    best, valid = {}, {}
+    # 各路径交替运行，取最好成绩，减少机器负载波动的影响
+    for _ in range(args.repeat):
+        for name, fn in paths:
+            start = time.perf_counter()
+            valid[name] = fn(records, args.batch_size)
+            elapsed = time.perf_counter() - start
+            best[name] = min(best.get(name, elapsed), elapsed)
+    for name, _ in paths:
+        print(f"{name:<8} {args.records / best[name]:>12,.0f} 条/秒  有效 {valid[name]}")
+
+
+if __name__ == "__main__":
+    main()
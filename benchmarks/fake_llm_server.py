@@ -0,0 +1,120 @@
+"""
+benchmarks/fake_llm_server.py
+
+本地模拟大模型服务（OpenAI 兼容 chat/completions），供 master/llm_advisor.py 的测试与压测使用（仅依赖标准库）。
+
+- POST 任意路径，按用户消息中的编号行（"1. ..."）逐条生成固定格式的建议，
+  返回 {"choices": [{"message": {"content": "{\"advice\": [...]}"}}]}
+- 每个请求延迟 latency + per_item * 条数 秒，模拟生成耗时
+- 记录请求数和生成条数
+
+用法：
+    python -m benchmarks.fake_llm_server --port 8901 --latency 1.0
+    然后设置 LLM_API_URL=http://127.0.0.1:8901/v1/chat/completions
+"""
+
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ITEM = re.compile(r"^\s*\d+\.\s*(.+)$", re.MULTILINE)
+
+
+class FakeLLMServer:
+    """
+    模拟大模型服务，在后台线程中运行。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 1.0, per_item: float = 0.05):
+        self.latency = latency
+        self.per_item = per_item
+        self.requests = 0
+        self.items = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头与响应体分两次写出，关闭 Nagle 避免与客户端延迟确认叠加产生 40ms 等待
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, result = server._handle(body)
+                payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _handle(self, body: bytes):
+        try:
+            request = json.loads(body)
+            prompt = request["messages"][-1]["content"]
+        except (ValueError, KeyError, TypeError, IndexError):
+            return 400, {"error": {"message": "invalid request"}}
+        conditions = _ITEM.findall(prompt)
+        with self._lock:
+            self.requests += 1
+            self.items += len(conditions)
+        time.sleep(self.latency + self.per_item * len(conditions))
+        advice = [f"{condition}：注意增减衣物，出行留意天气变化。" for condition in conditions]
+        content = json.dumps({"advice": advice}, ensure_ascii=False)
+        return 200, {
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        return {"requests": self.requests, "items": self.items}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--per-item", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.per_item).start()
+    print(f"模拟大模型服务已启动: {server.url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(server.stats())
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+benchmarks/fake_sms_gateway.py
+
+本地模拟短信网关，供 master/sms_sender.py 的测试与压测使用（仅依赖标准库）。
+
+- POST 任意路径，JSON 请求体 {"phone_numbers": [...], "message": "..."}
+- 每个请求固定延迟 latency 秒，按 failure_rate 概率返回 503
+- 设置 rate_limit 时，超过每秒请求数返回 429（带 Retry-After）
+- 记录收到的请求数、短信条数（号码数）和被拒绝的次数
+
+用法：
+    python -m benchmarks.fake_sms_gateway --port 8900 --latency 0.05 --failure-rate 0.1
+    然后设置 SMS_API_URL=http://127.0.0.1:8900/send
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSmsGateway:
+    """
+    模拟短信网关，在后台线程中运行。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.05,
+                 failure_rate: float = 0.0, rate_limit: float = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rate_limit = rate_limit
+        self.requests = 0
+        self.messages = 0
+        self.failed = 0
+        self.throttled = 0
+        self.peak_concurrency = 0
+        self._active = 0
+        self._window = (0, 0)  # (当前秒, 本秒请求数)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/send"
+
+    def _handler(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头与响应体分两次写出，关闭 Nagle 避免与客户端延迟确认叠加产生 40ms 等待
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, headers = gateway._handle(body)
+                payload = json.dumps({"result": "ok" if status == 200 else "error"}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _handle(self, body: bytes):
+        with self._lock:
+            self.requests += 1
+            self._active += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._active)
+            second = int(time.monotonic())
+            count = self._window[1] + 1 if self._window[0] == second else 1
+            self._window = (second, count)
+        try:
+            if self.rate_limit is not None and count > self.rate_limit:
+                with self._lock:
+                    self.throttled += 1
+                return 429, {"Retry-After": "1"}
+            time.sleep(self.latency)
+            if random.random() < self.failure_rate:
+                with self._lock:
+                    self.failed += 1
+                return 503, {}
+            try:
+                request = json.loads(body)
+                phone_numbers = request["phone_numbers"]
+                request["message"]
+            except (ValueError, KeyError, TypeError):
+                return 400, {}
+            with self._lock:
+                self.messages += len(phone_numbers)
+            return 200, {}
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-sms-gateway", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "messages": self.messages,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "peak_concurrency": self.peak_concurrency,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    gateway = FakeSmsGateway(args.host, args.port, args.latency, args.failure_rate, args.rate_limit).start()
+    print(f"模拟短信网关已启动: {gateway.url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(gateway.stats())
+    except KeyboardInterrupt:
+        gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,79 @@
 master/alarm_manager.py
 
 告警管理核心模块，负责检查预警规则并触发通知。
+
+【设计说明】
+- 升温/降温规则基于每个地点最近 24 小时的实况温度滑动窗口（SlidingWindow）：
+  每条新观测增量更新两个单调队列（窗口最小值/最大值），过期观测从队首移出，
+  每次检查的均摊复杂度为 O(1)，不需要查询 MySQL 历史数据
+- 升温幅度 = 最新温度 - 窗口最低温度，降温幅度 = 窗口最高温度 - 最新温度
+- 升温/降温规则只在收到新的实况观测时检查（只刷新了部分数据段的快照不会重复触发）
+- 启动时由 load_history 从 current_weather 表回填窗口
+- 告警去重：以 (地点, 规则, 严重程度分档) 为键记入 TTL 缓存，抑制期内持续存在的同一事件不再重复通知；
+  升温/降温幅度每多一个阈值升一档，升档时重新通知
+- 触发的告警先进入待发送列表，由 flush()（每个采集周期调用一次）合并发送：每个接收人一条短信
+  （超过 merge_size 条时拆成多条），这是唯一合并短信内容的地方，
+  同一批告警用一条多行 INSERT 写入 alerts 表，数据库连接在各批之间复用
+- 写库失败的告警（保留触发时间）留到下一次 flush() 与新告警一起重试，最多保留 record_backlog 条，
+  超出时丢弃最早的
+- 短信由 SmsSender 异步发送（入队即返回），网关缓慢或不可用不会阻塞采集周期
 """
 
+import time
 import logging
+import threading
+from collections import deque
 from datetime import datetime
 from shared.db_connector import get_db_connection
+from shared.ttl_cache import TTLCache
 from master.sms_sender import SmsSender
 
+
+class SlidingWindow:
+    """
+    单个地点的温度滑动窗口，用单调队列维护窗口内的最小值和最大值。
+    """
+
+    __slots__ = ("window", "last_dt", "last_temp", "_min", "_max")
+
+    def __init__(self, window: int):
+        """
+        参数：
+            window: 窗口长度（秒）
+        """
+        self.window = window
+        self.last_dt = None
+        self.last_temp = None
+        self._min = deque()  # (dt, temp)，temp 单调递增
+        self._max = deque()  # (dt, temp)，temp 单调递减
+
+    def add(self, dt: int, temp: float) -> bool:
+        """追加一条观测；不晚于最新观测的数据被忽略，返回是否追加"""
+        if self.last_dt is not None and dt <= self.last_dt:
+            return False
+        expired = dt - self.window
+        while self._min and self._min[0][0] < expired:
+            self._min.popleft()
+        while self._max and self._max[0][0] < expired:
+            self._max.popleft()
+        while self._min and self._min[-1][1] >= temp:
+            self._min.pop()
+        self._min.append((dt, temp))
+        while self._max and self._max[-1][1] <= temp:
+            self._max.pop()
+        self._max.append((dt, temp))
+        self.last_dt, self.last_temp = dt, temp
+        return True
+
+    def rise(self) -> float:
+        """窗口内升温幅度"""
+        return self.last_temp - self._min[0][1] if self._min else 0.0
+
+    def drop(self) -> float:
+        """窗口内降温幅度"""
+        return self._max[0][1] - self.last_temp if self._max else 0.0
+
+
 class AlarmManager:
     """
     告警管理器，根据预设规则检查天气数据并触发告警。
@@ -32,31 +98,112 @@ class AlarmManager:
         }
     }
 
+    # 基于温度滑动窗口的规则类型
+    WINDOW_RULES = ("temp_increase", "temp_decrease")
+
     SMS_API_URL = "http://your-sms-api.com/send"  # 替换为真实的短信API地址
 
-    def __init__(self, mysql_config):
+    def __init__(self, mysql_config, window_seconds=24 * 3600, phone_numbers=("13800138000",),
+                 suppress_seconds=6 * 3600, suppress_size=10000, sms_sender=None, record_backlog=1000,
+                 merge_size=5):
         """
         初始化告警管理器。
         参数：
             mysql_config: MySQL数据库配置
+            window_seconds: 升温/降温规则的时间窗口（秒）
+            phone_numbers: 接收告警短信的手机号列表
+            suppress_seconds: 同一告警事件的抑制时间（秒）
+            suppress_size: 抑制缓存的最大条目数
+            sms_sender: 短信发送器，默认使用 SMS_API_URL 创建
+            record_backlog: 写库失败后等待重试的告警最大条数
+            merge_size: 每条短信最多合并的告警条数
         """
         self.mysql_config = mysql_config
-        self.db_connection = None  # 数据库连接
-        self.sms_sender = SmsSender(self.SMS_API_URL)
+        self.db_connection = None  # 数据库连接（各批告警之间复用，出错时重新获取）
+        self.sms_sender = sms_sender or SmsSender(self.SMS_API_URL)
         self.alert_rules = self.ALERT_RULES
+        self.window_seconds = window_seconds
+        self.windows = {}  # 地点名称 -> SlidingWindow
+        self.phone_numbers = list(phone_numbers)
+        self.suppression = TTLCache(maxsize=suppress_size, ttl=suppress_seconds)
+        self._pending = []  # 待发送的 (地点, 告警消息)
+        self._unrecorded = []  # 写库失败、等待重试的 (告警消息, 触发时间)
+        self.record_backlog = record_backlog
+        self.merge_size = max(1, int(merge_size))
+        self._lock = threading.Lock()
+        self.triggered = 0
+        self.suppressed = 0
+        self.sms_sent = 0
+        self.recorded = 0
+        self.record_dropped = 0
+
+    def observe(self, location, dt, temp):
+        """
+        将一条实况观测加入地点的滑动窗口。
+        返回：
+            是否为新观测（早于或等于最新观测的数据被忽略）
+        """
+        window = self.windows.get(location)
+        if window is None:
+            window = self.windows.setdefault(location, SlidingWindow(self.window_seconds))
+        return window.add(dt, temp)
+
+    def load_history(self, locations=None):
+        """
+        从 current_weather 表回填各地点最近一个窗口内的实况温度。
+        参数：
+            locations: 地点名称列表；指定时按 (location, dt) 唯一键做范围查询
+        返回：
+            回填的观测条数
+        """
+        since = int(time.time()) - self.window_seconds
+        sql = "SELECT location, dt, temp FROM current_weather WHERE dt >= %s"
+        params = [since]
+        if locations:
+            sql += " AND location IN (" + ", ".join(["%s"] * len(locations)) + ")"
+            params += list(locations)
+        sql += " ORDER BY location, dt"
+        loaded = 0
+        conn = None
+        try:
+            conn = get_db_connection(**self.mysql_config)
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            for location, dt, temp in cursor.fetchall():
+                if temp is not None and self.observe(location, dt, temp):
+                    loaded += 1
+            cursor.close()
+            logging.info(f"告警滑动窗口已回填 {loaded} 条观测（{len(self.windows)} 个地点）")
+        except Exception as e:
+            logging.error(f"回填告警滑动窗口失败: {e}")
+        finally:
+            if conn:
+                conn.close()
+        return loaded
 
     def check_alerts(self, weather_data):
         """
         检查天气数据是否触发任何预警规则。
         参数：
-            weather_data: 天气数据
+            weather_data: one-call 快照，必须包含 location 字段
         """
-        logging.info("开始检查告警...")
+        location = weather_data["location"]
+        current = weather_data.get("current") or {}
+        observed = current.get("dt") is not None and current.get("temp") is not None \
+            and self.observe(location, current["dt"], current["temp"])
         for rule_name, rule in self.alert_rules.items():
+            if rule.get("type") in self.WINDOW_RULES and not observed:
+                continue
             try:
-                if self._is_alert_triggered(rule, weather_data):
-                    message = rule["message"].format(**weather_data)
-                    self._trigger_alert(message)
+                context = self._is_alert_triggered(rule, weather_data)
+                if not context:
+                    continue
+                key = (location, rule_name, self._severity(rule, context))
+                if self.suppression.get(key) is not None:
+                    self.suppressed += 1
+                    continue
+                self.suppression.set(key, True)
+                self._trigger_alert(location, rule["message"].format(city=location, **context))
             except Exception as e:
                 logging.error(f"检查规则 {rule_name} 失败: {e}")
 
@@ -66,54 +213,138 @@ class AlarmManager:
         参数：
             rule: 预警规则
             weather_data: 天气数据
+        返回：
+            触发时返回告警消息的格式化参数（delta / weather），否则返回 None
         """
-        if rule_type := rule.get("type") == "temp_increase":
-            # TODO: 实现温度升高判断逻辑
-            return False
-        elif rule_type == "temp_decrease":
-            # TODO: 实现温度降低判断逻辑
-            return False
+        rule_type = rule.get("type")
+        if rule_type in self.WINDOW_RULES:
+            window = self.windows.get(weather_data["location"])
+            if window is None:
+                return None
+            delta = window.rise() if rule_type == "temp_increase" else window.drop()
+            return {"delta": round(delta, 1)} if delta >= rule["threshold"] else None
         elif rule_type == "extreme_weather":
-            # TODO: 实现极端天气判断逻辑
-            return False
+            for weather in self._weather_texts(weather_data):
+                if any(condition in weather for condition in rule["conditions"]):
+                    return {"weather": weather}
+            return None
         else:
             logging.warning(f"未知的规则类型: {rule_type}")
-            return False
+            return None
+
+    @staticmethod
+    def _severity(rule, context):
+        """告警严重程度分档：升温/降温按阈值倍数分档，极端天气按天气描述区分"""
+        if "delta" in context:
+            return int(context["delta"] // rule["threshold"])
+        return context.get("weather")
 
-    def _trigger_alert(self, message):
+    @staticmethod
+    def _weather_texts(weather_data):
+        """当前天气描述及生效中的官方预警事件名称"""
+        current = weather_data.get("current") or {}
+        texts = [w.get("description") or "" for w in current.get("weather") or ()]
+        texts += [alert.get("event") or "" for alert in weather_data.get("alerts") or ()]
+        return texts
+
+    def _trigger_alert(self, location, message):
         """
-        触发告警，发送短信并记录到数据库。
+        触发告警，加入待发送列表，由 flush() 合并发送并记录到数据库。
         参数：
+            location: 地点名称
             message: 告警消息
         """
         logging.info(f"触发告警: {message}")
-        try:
-            # TODO: 从配置中获取管理员手机号列表
-            phone_numbers = ["13800138000"]
-            self.sms_sender.send_sms(phone_numbers, message)
-            self._record_alert(message)
-        except Exception as e:
-            logging.error(f"发送告警失败: {e}")
+        with self._lock:
+            self._pending.append((location, message))
+            self.triggered += 1
+
+    def recipients(self, location):
+        """返回某地点告警的接收人手机号列表"""
+        return self.phone_numbers
 
-    def _record_alert(self, message):
+    def flush(self):
+        """
+        发送并记录待发送的告警：每个接收人合并为一条短信（每条最多 merge_size 条），接收内容相同的接收人共用一次发送，
+        全部告警（连同上次写库失败的告警）一次批量写入数据库。
+        返回：
+            本次发送的告警条数
         """
-        将告警信息记录到数据库。
+        with self._lock:
+            pending, self._pending = self._pending, []
+        now = datetime.utcnow()
+        by_recipient = {}
+        for location, message in pending:
+            for phone in self.recipients(location):
+                by_recipient.setdefault(phone, []).append(message)
+        by_content = {}
+        for phone, messages in by_recipient.items():
+            for i in range(0, len(messages), self.merge_size):
+                by_content.setdefault(tuple(messages[i:i + self.merge_size]), []).append(phone)
+        for messages, phone_numbers in by_content.items():
+            if len(messages) == 1:
+                content = messages[0]
+            else:
+                content = f"天气预警（{len(messages)}条）：\n" + "\n".join(messages)
+            try:
+                self.sms_sender.send_sms(phone_numbers, content)
+                self.sms_sent += 1
+            except Exception as e:
+                logging.error(f"发送告警失败: {e}")
+        self._record_alerts([(message, now) for _, message in pending])
+        return len(pending)
+
+    def _record_alerts(self, rows):
+        """
+        将一批告警信息记录到数据库（一条多行 INSERT），上次写库失败的告警排在前面一起写入；
+        失败时整批留待下一次 flush() 重试。
         参数：
-            message: 告警消息
+            rows: (告警消息, 触发时间) 列表
         """
+        with self._lock:
+            rows, self._unrecorded = self._unrecorded + rows, []
+        if not rows:
+            return
         try:
             if not self.db_connection:
                 self.db_connection = get_db_connection(**self.mysql_config)
             cursor = self.db_connection.cursor()
-            cursor.execute("""
+            cursor.executemany("""
                 INSERT INTO alerts (message, timestamp)
                 VALUES (%s, %s)
-            """, (message, datetime.utcnow()))
+            """, rows)
             self.db_connection.commit()
-            logging.info("告警已记录到数据库")
+            cursor.close()
+            self.recorded += len(rows)
+            logging.info(f"{len(rows)} 条告警已记录到数据库")
         except Exception as e:
-            logging.error(f"记录告警到数据库失败: {e}")
-        finally:
+            logging.error(f"记录告警到数据库失败，{len(rows)} 条告警下次重试: {e}")
             if self.db_connection:
-                self.db_connection.close()
-                self.db_connection = None
\ No newline at end of file
+                try:
+                    self.db_connection.close()
+                except Exception:
+                    pass
+                self.db_connection = None
+            with self._lock:
+                rows = rows + self._unrecorded
+                overflow = len(rows) - self.record_backlog
+                if overflow > 0:
+                    self.record_dropped += overflow
+                    logging.error(f"待记录告警超过 {self.record_backlog} 条，丢弃最早的 {overflow} 条")
+                    rows = rows[overflow:]
+                self._unrecorded = rows
+
+    def stats(self):
+        """返回告警触发、抑制、发送、记录的计数及抑制缓存统计"""
+        return {
+            "locations": len(self.windows),
+            "triggered": self.triggered,
+            "suppressed": self.suppressed,
+            "pending": len(self._pending),
+            "sms_sent": self.sms_sent,
+            "recorded": self.recorded,
+            "unrecorded": len(self._unrecorded),
+            "record_dropped": self.record_dropped,
+            "suppression": self.suppression.stats(),
+            "sms": self.sms_sender.stats(),
+        }
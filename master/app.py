@@ -6,30 +6,50 @@ master/app.py
 环境依赖说明：
 - API_KEY、MySQL地址、Redis地址、经纬度等敏感信息请通过环境变量设置，切勿硬编码在代码中。
 - 经纬度参数（WEATHER_LAT, WEATHER_LON）请参考 openweathermap 官方文档设置。
+- 多地点采集时通过 LOCATIONS_FILE 指定地点列表（JSON/CSV）或 LOCATIONS_TABLE 指定 MySQL 表，COLLECT_WORKERS 控制并发数。
 
 """
 
 import os
-import time
+import asyncio
 import logging
 from threading import Thread
-from datetime import UTC, datetime
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 import uvicorn
 
-# 更新导入语句
-from shared.db_connector import get_db_connection # 这个仍然需要，因为 mysql_writer 内部使用了它
-from shared.redis_util import get_redis_client
+from shared.redis_util import pool_stats as redis_pool_stats
 from master.weather_api import WeatherAPI
-from shared.weather_dao import CurrentWeatherDAO, MinutelyForecastDAO, HourlyForecastDAO, DailyForecastDAO, WeatherAlertsDAO
-from master.redispub import publish_to_redis
+from shared.weather_dao import WeatherUnitOfWork, check_pool_status
+from master.redispub import publish_batch, listen_keyframe_requests
+from shared.snapshot_delta import DeltaEncoder
+from shared.write_behind import WriteBehindQueue
+from master.location_registry import LocationRegistry
+from master.collector import WeatherCollector
+from master.geo_grid import GeoGrid
+from master.fetch_planner import SECTIONS, FetchPlanner, parse_intervals
+from master.scheduler import FixedRateScheduler
+from master.alarm_manager import AlarmManager
+from master.sms_sender import SmsSender
+from master.llm_advisor import LLMAdvisor
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    """
+    关闭时停止MySQL写回线程，队列中未写完的数据写入溢出文件，下次启动时回放；
+    停止短信分发线程，已入队的短信发送完（失败的转入重试文件）再退出
+    """
+    yield
+    await asyncio.to_thread(write_queue.close)
+    await asyncio.to_thread(sms_sender.close)
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/api/health")
@@ -38,14 +58,120 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/api/locations")
+def list_locations():
+    """返回采集地点列表及最近一轮采集统计"""
+    return {
+        "locations": [loc.to_dict() for loc in location_registry.all()],
+        "last_sweep": collector.last_sweep,
+    }
+
+
+@app.get("/api/schedule")
+def schedule_status(location: str = None):
+    """返回调度状态及各数据段下次刷新时间（未指定地点时取所有地点中最早的）"""
+    if location is not None:
+        if location_registry.get(location) is None:
+            raise HTTPException(status_code=404, detail=f"未知地点: {location}")
+        next_due = fetch_planner.next_due(location)
+    else:
+        next_due = dict.fromkeys(SECTIONS)
+        for loc in location_registry.all():
+            for section, due in fetch_planner.next_due(loc.name).items():
+                if due is not None and (next_due[section] is None or due < next_due[section]):
+                    next_due[section] = due
+    return {
+        "scheduler": scheduler.status(),
+        "intervals": fetch_planner.intervals,
+        "next_due": next_due,
+    }
+
+
+@app.post("/api/refresh/{section}")
+def request_refresh(section: str, location: str = None):
+    """请求下一个周期刷新指定数据段（如按需刷新天气警报）"""
+    if section not in SECTIONS:
+        raise HTTPException(status_code=400, detail=f"未知的数据段: {section}")
+    if location is not None and location_registry.get(location) is None:
+        raise HTTPException(status_code=404, detail=f"未知地点: {location}")
+    fetch_planner.request(section, location)
+    return {"result": "scheduled", "section": section, "location": location,
+            "next_run_at": scheduler.next_run_at}
+
+
+@app.get("/api/write_queue")
+def write_queue_status():
+    """返回MySQL写回队列指标（深度、滞后、溢出/回放）及各表写入统计"""
+    return {"queue": write_queue.metrics(), "tables": weather_uow.stats()}
+
+
+@app.get("/api/pool")
+def pool_status():
+    """返回MySQL连接池状态，用于调整 MYSQL_POOL_* 参数"""
+    return check_pool_status()
+
+
+@app.get("/api/upstream")
+def upstream_stats():
+    """返回天气API请求耗时统计（DNS/连接/传输）及响应缓存统计"""
+    return {"latency": weather_api.latency_stats(), "cache": weather_api.cache_stats()}
+
+
+@app.get("/api/redis")
+def redis_status():
+    """返回Redis连接池状态及增量发布统计"""
+    return {"pool": redis_pool_stats(REDIS_HOST, REDIS_PORT), "delta": delta_encoder.stats()}
+
+
+@app.get("/api/alarms")
+def alarm_status():
+    """返回告警触发/抑制/发送/记录计数、抑制缓存统计及短信发送指标（重试队列、投递延迟）"""
+    return alarm_manager.stats()
+
+
+@app.get("/api/advice/{location}")
+def location_advice(location: str):
+    """返回某地点当前天气的穿衣建议和风险提示（按量化天气特征缓存）"""
+    snapshot = delta_encoder.snapshot(location)
+    if snapshot is None or not snapshot.get("current"):
+        raise HTTPException(status_code=404, detail=f"暂无该地点的实况数据: {location}")
+    return {"location": location, "advice": llm_advisor.get_advice(snapshot)}
+
+
+@app.get("/api/advice")
+def advice_status():
+    """返回建议缓存命中/合并统计及大模型调用次数、耗时"""
+    return llm_advisor.stats()
+
+
 # 日志配置
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 # 配置读取
 API_KEY = os.getenv("WEATHER_API_KEY")
-LAT = os.getenv("WEATHER_LAT")
-LON = os.getenv("WEATHER_LON")
+COLLECT_WORKERS = int(os.getenv("COLLECT_WORKERS", 32))
+# 地理网格边长（度），同一单元内的地点共用一次上游请求；0 表示不分桶
+GEO_GRID_PRECISION = float(os.getenv("GEO_GRID_PRECISION", 0))
+FETCH_INTERVALS = parse_intervals(os.getenv("FETCH_INTERVALS", ""))
+SCHEDULE_INTERVAL = float(os.getenv("SCHEDULE_INTERVAL", 60))
+SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER", 2))
+SCHEDULE_MISSED_POLICY = os.getenv("SCHEDULE_MISSED_POLICY", "skip")
+WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", 10000))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", 50))
+WRITE_SPILL_PATH = os.getenv("WRITE_SPILL_PATH", "weather_spill.jsonl")
+PUBLISH_BATCH_SIZE = int(os.getenv("PUBLISH_BATCH_SIZE", 50))
 REDIS_CHANNEL = os.getenv("REDIS_CHANNEL", "weather:updates")
+# 传输方式：pubsub（默认）或 stream（Redis Streams，从节点可从上次位置追赶）
+REDIS_TRANSPORT = os.getenv("REDIS_TRANSPORT", "pubsub")
+REDIS_STREAM_MAXLEN = int(os.getenv("REDIS_STREAM_MAXLEN", 100000))
+KEYFRAME_INTERVAL = int(os.getenv("KEYFRAME_INTERVAL", 30))
+KEYFRAME_REQUEST_CHANNEL = os.getenv("KEYFRAME_REQUEST_CHANNEL", f"{REDIS_CHANNEL}:keyframe")
+ALARM_ENABLED = os.getenv("ALARM_ENABLED", "true").lower() in ("1", "true", "yes")
+ALARM_WINDOW_HOURS = float(os.getenv("ALARM_WINDOW_HOURS", 24))
+ALARM_PHONE_NUMBERS = [p.strip() for p in os.getenv("ALARM_PHONE_NUMBERS", "13800138000").split(",") if p.strip()]
+ALARM_SUPPRESS_SECONDS = float(os.getenv("ALARM_SUPPRESS_SECONDS", 6 * 3600))
+ALARM_MERGE_SIZE = int(os.getenv("ALARM_MERGE_SIZE", 5))
+SMS_API_URL = os.getenv("SMS_API_URL", AlarmManager.SMS_API_URL)
 
 # MySQL连接参数说明
 MYSQL_HOST = os.getenv("MYSQL_HOST")
@@ -62,70 +188,112 @@ init_mysql_pool(
     user=MYSQL_USER,
     password=MYSQL_PASSWORD,
     db=MYSQL_DB,
-    mincached=2,
-    maxcached=5,
-    maxconnections=20
+    mincached=int(os.getenv("MYSQL_POOL_MINCACHED", 2)),
+    maxcached=int(os.getenv("MYSQL_POOL_MAXCACHED", 5)),
+    maxconnections=int(os.getenv("MYSQL_POOL_MAXCONNECTIONS", 20))
 )
 
 # Redis连接参数说明
 REDIS_HOST = os.getenv("REDIS_HOST", "127.0.0.1")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
-# 实例化 DAO
-current_weather_dao = CurrentWeatherDAO(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB)
-minutely_forecast_dao = MinutelyForecastDAO(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB)
-hourly_forecast_dao = HourlyForecastDAO(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB)
-daily_forecast_dao = DailyForecastDAO(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB)
-weather_alerts_dao = WeatherAlertsDAO(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB)
+# 实例化 DAO：一次快照的全部数据段在同一事务中写入
+weather_uow = WeatherUnitOfWork(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB)
+
+# 异步写回队列：采集线程只入队，MySQL 写入由后台线程批量完成，不可用时溢出到本地文件
+write_queue = WriteBehindQueue(
+    weather_uow.write_snapshots,
+    spill_path=WRITE_SPILL_PATH,
+    maxsize=WRITE_QUEUE_SIZE,
+    batch_size=WRITE_BATCH_SIZE,
+)
 
 # 实例化 WeatherAPI
-weather_api = WeatherAPI(API_KEY)
+weather_api = WeatherAPI(API_KEY, pool_size=COLLECT_WORKERS)
 
+# 加载采集地点并创建并发采集器
+location_registry = LocationRegistry.from_env()
+fetch_planner = FetchPlanner(FETCH_INTERVALS)
+collector = WeatherCollector(weather_api, max_workers=COLLECT_WORKERS, planner=fetch_planner,
+                             grid=GeoGrid(GEO_GRID_PRECISION))
 
-def main_loop():
-    """主循环：定时采集、存储、发布"""
-    while True:
-        # 使用新的 fetch_weather_by_coords 函数
+# 增量发布：每个地点只发布变化的字段，定期发送关键帧
+delta_encoder = DeltaEncoder(keyframe_interval=KEYFRAME_INTERVAL)
+
+# 短信发送：异步入队，并发数、速率限制与重试参数见 SMS_* 环境变量
+sms_sender = SmsSender(SMS_API_URL)
+
+# 告警规则：升温/降温基于各地点的温度滑动窗口，启动时从 current_weather 回填；
+# 同一事件在抑制期内只通知一次，每个周期的告警合并发送、批量记录
+alarm_manager = AlarmManager(
+    dict(host=MYSQL_HOST, port=MYSQL_PORT, user=MYSQL_USER, password=MYSQL_PASSWORD, db=MYSQL_DB),
+    window_seconds=int(ALARM_WINDOW_HOURS * 3600),
+    phone_numbers=ALARM_PHONE_NUMBERS,
+    suppress_seconds=ALARM_SUPPRESS_SECONDS,
+    merge_size=ALARM_MERGE_SIZE,
+    sms_sender=sms_sender,
+)
+
+# 大模型建议：按量化天气特征缓存，未命中凑批请求（LLM_* 环境变量）
+llm_advisor = LLMAdvisor()
+
+# 固定频率调度器，每个周期按各数据段的刷新间隔决定请求内容
+scheduler = FixedRateScheduler(SCHEDULE_INTERVAL, jitter=SCHEDULE_JITTER,
+                               missed_policy=SCHEDULE_MISSED_POLICY)
+
+
+def process_location(location, weather_data, sections=None):
+    """将单个地点的天气数据放入写回队列，返回待发布的增量/关键帧消息"""
+    weather_data = dict(weather_data, location=location.name)
+    # 按规划只请求了部分数据段，缺失的数据段本轮不写入；写库异步进行，不阻塞发布
+    write_queue.submit(weather_data)
+    if ALARM_ENABLED:
+        alarm_manager.check_alerts(weather_data)
+    # 请求了但响应中没有的数据段（如已结束的警报）从发布的快照中删除
+    return delta_encoder.encode(weather_data, sections=SECTIONS if sections is None else sections)
+
+
+def on_keyframe_request(location_name):
+    """从节点检测到序号缺口时请求关键帧，立即发布该地点的完整快照"""
+    message = delta_encoder.keyframe(location_name)
+    if message is not None:
+        publish_batch([message], REDIS_HOST, REDIS_PORT, REDIS_CHANNEL, REDIS_TRANSPORT, REDIS_STREAM_MAXLEN)
+
+
+def collect_cycle(tick_time):
+    """一个调度周期：并发采集所有地点的到期数据段，入队存储并批量发布"""
+    locations = location_registry.all()
+    logging.info(f"开始采集天气数据，共 {len(locations)} 个地点...")
+    pending = []
+    for result in collector.iter_collect(locations, now=tick_time):
+        if not result.ok:
+            continue
+        # 单个地点的处理失败不影响其他地点
         try:
-            logging.info("开始采集天气数据...")
-            weather_data = weather_api.get_weather_data(float(LAT), float(LON))
-            current_weather = weather_data["current"]
-            minutely_forecast = weather_data.get("minutely", [])
-            hourly_forecast = weather_data["hourly"]
-            daily_forecast = weather_data["daily"]
-            alerts = weather_data.get("alerts", [])
-            logging.info("天气数据采集完成。")
-
-            if current_weather:
-                logging.info("开始保存当前天气数据...")
-                current_weather_dao.insert(current_weather)
-                logging.info("当前天气数据已保存。")
-            if minutely_forecast:
-                logging.info("开始保存分钟级天气数据...")
-                minutely_forecast_dao.insert(minutely_forecast)
-                logging.info("分钟级天气数据已保存。")
-            if hourly_forecast:
-                logging.info("开始保存小时级天气数据...")
-                hourly_forecast_dao.insert(hourly_forecast)
-                logging.info("小时级天气数据已保存。")
-            if daily_forecast:
-                logging.info("开始保存每日天气数据...")
-                daily_forecast_dao.insert(daily_forecast)
-                logging.info("每日天气数据已保存。")
-            if alerts:
-                logging.info("开始保存天气警报数据...")
-                weather_alerts_dao.insert(alerts)
-                logging.info("天气警报数据已保存。")
-
-            logging.info("开始发布天气数据到Redis...")
-            publish_to_redis(weather_data, REDIS_HOST, REDIS_PORT, REDIS_CHANNEL)
-            logging.info("天气数据已发布到Redis。")
+            pending.append(process_location(result.location, result.data, result.sections))
         except Exception as e:
-            logging.error(f"采集或存储天气数据失败: {e}")
-        time.sleep(60)  # 每60秒采集一次
+            logging.error(f"处理 {result.location.name} 天气数据失败: {e}")
+        if len(pending) >= PUBLISH_BATCH_SIZE:
+            publish_batch(pending, REDIS_HOST, REDIS_PORT, REDIS_CHANNEL, REDIS_TRANSPORT, REDIS_STREAM_MAXLEN)
+            pending = []
+    publish_batch(pending, REDIS_HOST, REDIS_PORT, REDIS_CHANNEL, REDIS_TRANSPORT, REDIS_STREAM_MAXLEN)
+    if ALARM_ENABLED:
+        alarm_manager.flush()
+
+
+def main_loop():
+    """主循环：按固定频率调度采集任务"""
+    scheduler.run(collect_cycle)
 
 
 if __name__ == "__main__":
+    # 启动MySQL写回线程
+    write_queue.start()
+    if ALARM_ENABLED:
+        alarm_manager.load_history([loc.name for loc in location_registry.all()])
+    # 启动关键帧请求监听线程
+    Thread(target=listen_keyframe_requests, daemon=True,
+           args=(REDIS_HOST, REDIS_PORT, KEYFRAME_REQUEST_CHANNEL, on_keyframe_request)).start()
     # 启动定时采集线程
     t = Thread(target=main_loop, daemon=True)
     t.start()
@@ -0,0 +1,140 @@
+"""
+master/collector.py
+
+多地点并发采集引擎：使用有界线程池并发调用 WeatherAPI.get_weather_data。
+
+【设计说明】
+- 线程池大小有上限（max_workers），避免对上游 API 和本机造成冲击
+- 每个地点独立捕获异常，单个地点失败不影响其他地点
+- 结果按完成顺序逐个产出，调用方可以边采集边存储/发布，
+  整轮耗时接近最慢的几次请求，而不是所有请求耗时之和
+- 传入 FetchPlanner 时，每个地点只请求到期的数据段，没有到期数据段的地点本轮跳过
+- 传入 GeoGrid 时，同一网格单元内的地点只请求一次上游（请求单元内到期数据段的并集），
+  结果分发给单元内每个地点
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from master.location_registry import Location
+
+
+class CollectResult:
+    """
+    单个地点的采集结果。
+    """
+
+    __slots__ = ("location", "data", "error", "elapsed", "sections")
+
+    def __init__(self, location: Location, data: Optional[Dict] = None,
+                 error: Optional[Exception] = None, elapsed: float = 0.0,
+                 sections: Optional[List[str]] = None):
+        self.location = location
+        self.data = data
+        self.error = error
+        self.elapsed = elapsed
+        self.sections = sections
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class WeatherCollector:
+    """
+    并发采集多个地点的天气数据。
+    """
+
+    def __init__(self, weather_api, max_workers: int = 32, planner=None, grid=None):
+        """
+        参数：
+            weather_api: WeatherAPI 实例
+            max_workers: 最大并发请求数
+            planner: FetchPlanner 实例，None 表示每次请求完整数据
+            grid: GeoGrid 实例，None 表示每个地点单独请求
+        """
+        self.weather_api = weather_api
+        self.planner = planner
+        self.grid = grid
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="collector")
+        self.last_sweep = {}
+
+    def _fetch(self, location: Location, sections: Optional[List[str]], fetch_kwargs: Dict) -> CollectResult:
+        start = time.monotonic()
+        if sections is not None:
+            fetch_kwargs = dict(fetch_kwargs, exclude=self.planner.exclude_for(sections))
+        try:
+            data = self.weather_api.get_weather_data(location.lat, location.lon, **fetch_kwargs)
+            return CollectResult(location, data=data, elapsed=time.monotonic() - start, sections=sections)
+        except Exception as e:
+            return CollectResult(location, error=e, elapsed=time.monotonic() - start, sections=sections)
+
+    def _fetch_group(self, target: Location, members: List[Location], sections: Optional[List[str]],
+                     fetch_kwargs: Dict) -> List[CollectResult]:
+        """按 target 的坐标请求一次，结果分发给 members 中的每个地点"""
+        result = self._fetch(target, sections, fetch_kwargs)
+        return [CollectResult(loc, data=result.data, error=result.error, elapsed=result.elapsed,
+                              sections=sections) for loc in members]
+
+    def iter_collect(self, locations: Iterable[Location], now: float = None,
+                     **fetch_kwargs) -> Iterator[CollectResult]:
+        """
+        并发采集，按完成顺序逐个产出结果。
+        参数：
+            locations: 地点列表
+            now: 规划数据段使用的时间戳，默认当前时间（调度器传入名义触发时间）
+            fetch_kwargs: 透传给 get_weather_data 的参数（exclude/units/lang）
+        """
+        locations = list(locations)
+        sweep_start = time.monotonic()
+        planned_at = time.time() if now is None else now
+        succeeded = failed = skipped = 0
+        due = []
+        plans = {}
+        for loc in locations:
+            if self.planner is not None:
+                plans[loc.name] = self.planner.plan(loc.name, now=planned_at)
+                if not plans[loc.name]:
+                    skipped += 1
+                    continue
+            due.append(loc)
+        groups = self.grid.group(due).values() if self.grid is not None else [(loc, [loc]) for loc in due]
+        futures = []
+        for target, members in groups:
+            sections = None
+            if self.planner is not None:
+                # 单元内各地点到期数据段的并集
+                sections = list(dict.fromkeys(s for loc in members for s in plans[loc.name]))
+            futures.append(self._executor.submit(self._fetch_group, target, members, sections, fetch_kwargs))
+        for future in as_completed(futures):
+            for result in future.result():
+                if result.ok:
+                    succeeded += 1
+                    if self.planner is not None:
+                        self.planner.mark_fetched(result.location.name, result.sections, now=planned_at)
+                else:
+                    failed += 1
+                    logging.error(f"采集地点 {result.location.name} 失败: {result.error}")
+                yield result
+        elapsed = time.monotonic() - sweep_start
+        self.last_sweep = {
+            "locations": len(locations),
+            "succeeded": succeeded,
+            "failed": failed,
+            "skipped": skipped,
+            "requests": len(futures),
+            "elapsed": round(elapsed, 3),
+        }
+        logging.info(f"本轮采集完成: {self.last_sweep}")
+
+    def collect(self, locations: Iterable[Location], now: float = None,
+                **fetch_kwargs) -> List[CollectResult]:
+        """并发采集并一次性返回全部结果"""
+        return list(self.iter_collect(locations, now=now, **fetch_kwargs))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,124 @@
+"""
+master/fetch_planner.py
+
+按数据段（current/minutely/hourly/daily/alerts）规划每轮采集需要请求的内容。
+
+【设计说明】
+- 每个数据段有自己的刷新间隔（秒），间隔为 None 表示仅按需刷新
+- 每个地点分别记录各数据段上次成功采集的时间
+- 每轮只请求到期的数据段，其余通过 exclude 参数排除，
+  减少响应体积、JSON 解析耗时和内存占用
+- request() 可强制下一轮刷新指定数据段（如手动刷新天气警报）
+"""
+
+import time
+import threading
+from typing import Dict, Iterable, List, Optional
+
+SECTIONS = ("current", "minutely", "hourly", "daily", "alerts")
+
+# 默认刷新间隔：当前天气和分钟级每分钟，警报每 5 分钟，小时级每 10 分钟，每日每小时
+# 警报必须定期刷新：告警规则依赖警报事件，且 OpenWeather 在警报结束后直接省略 alerts 数据段
+DEFAULT_INTERVALS = {
+    "current": 60,
+    "minutely": 60,
+    "hourly": 600,
+    "daily": 3600,
+    "alerts": 300,
+}
+
+
+def parse_intervals(text: str) -> Dict[str, Optional[float]]:
+    """
+    解析刷新间隔配置，如 "current=60,hourly=600,alerts=none"
+    """
+    intervals = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        section, _, value = item.partition("=")
+        section = section.strip()
+        if section not in SECTIONS:
+            raise ValueError(f"未知的数据段: {section}")
+        value = value.strip().lower()
+        intervals[section] = None if value in ("", "none", "on_demand") else float(value)
+    return intervals
+
+
+class FetchPlanner:
+    """
+    数据段采集规划器。
+    """
+
+    def __init__(self, intervals: Dict[str, Optional[float]] = None):
+        """
+        参数：
+            intervals: 各数据段刷新间隔（秒），None 表示仅按需刷新；未指定的数据段使用默认值
+        """
+        self.intervals = dict(DEFAULT_INTERVALS)
+        if intervals:
+            self.intervals.update(intervals)
+        self._last_fetched: Dict[str, Dict[str, float]] = {}
+        # 按需刷新请求时间：{地点标识或 None(所有地点): {数据段: 请求时间}}
+        self._requested: Dict[Optional[str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def plan(self, key: str, now: float = None) -> List[str]:
+        """
+        返回该地点本轮需要请求的数据段列表（按 SECTIONS 顺序）
+        参数：
+            key: 地点标识
+            now: 当前时间戳，默认 time.time()
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._last_fetched.get(key, {})
+            own = self._requested.get(key, {})
+            everyone = self._requested.get(None, {})
+            due = []
+            for section in SECTIONS:
+                fetched_at = last.get(section, float("-inf"))
+                requested_at = max(own.get(section, float("-inf")), everyone.get(section, float("-inf")))
+                interval = self.intervals.get(section)
+                if fetched_at < requested_at:
+                    due.append(section)
+                elif interval is not None and now - fetched_at >= interval:
+                    due.append(section)
+            return due
+
+    @staticmethod
+    def exclude_for(sections: Iterable[str]) -> List[str]:
+        """返回需要排除的数据段，用作 get_weather_data 的 exclude 参数"""
+        sections = set(sections)
+        return [section for section in SECTIONS if section not in sections]
+
+    def mark_fetched(self, key: str, sections: Iterable[str], now: float = None):
+        """记录地点的数据段已成功采集"""
+        now = time.time() if now is None else now
+        with self._lock:
+            last = self._last_fetched.setdefault(key, {})
+            for section in sections:
+                last[section] = now
+
+    def request(self, section: str, key: str = None):
+        """
+        请求下一轮刷新指定数据段
+        参数：
+            section: 数据段
+            key: 地点标识，None 表示所有地点
+        """
+        if section not in SECTIONS:
+            raise ValueError(f"未知的数据段: {section}")
+        with self._lock:
+            self._requested.setdefault(key, {})[section] = time.time()
+
+    def next_due(self, key: str) -> Dict[str, Optional[float]]:
+        """返回该地点各数据段的下次到期时间戳，None 表示仅按需刷新"""
+        with self._lock:
+            last = self._last_fetched.get(key, {})
+            result = {}
+            for section in SECTIONS:
+                interval = self.intervals.get(section)
+                if interval is None:
+                    result[section] = None
+                else:
+                    result[section] = last.get(section, 0.0) + interval
+            return result
@@ -0,0 +1,64 @@
+"""
+master/geo_grid.py
+
+地理网格分桶：把相近的坐标归入同一个固定经纬度网格单元，每个单元只向上游请求一次天气数据。
+
+【设计说明】
+- 网格边长为 precision 度（如 0.05°，南北方向约 5.5 km），单元索引为 (floor(lat / precision), floor(lon / precision))
+- 单元内有多个地点时共用单元中心坐标的天气数据；上游请求数随覆盖面积增长，而不是随地点数增长
+- 单元内只有一个地点时仍按该地点自身坐标请求，不引入中心点偏移
+- precision 为 0 或 None（默认）时不分桶，每个地点按自身坐标请求
+"""
+
+import math
+from typing import Dict, Iterable, List, Tuple
+
+from master.location_registry import Location
+
+
+class GeoGrid:
+    """
+    固定经纬度网格。
+    """
+
+    def __init__(self, precision: float = None):
+        """
+        参数：
+            precision: 网格边长（度），0 或 None 表示不分桶
+        """
+        if precision is not None and precision < 0:
+            raise ValueError(f"网格精度必须为正数: {precision}")
+        self.precision = precision or None
+
+    def cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        """返回坐标所在的单元索引"""
+        return math.floor(lat / self.precision), math.floor(lon / self.precision)
+
+    def center(self, cell: Tuple[int, int]) -> Tuple[float, float]:
+        """返回单元中心坐标（保留 4 位小数，与 WeatherAPI 缓存键精度一致）"""
+        lat = min(90.0, (cell[0] + 0.5) * self.precision)
+        lon = min(180.0, (cell[1] + 0.5) * self.precision)
+        return round(lat, 4), round(lon, 4)
+
+    def group(self, locations: Iterable[Location]) -> Dict[object, Tuple[Location, List[Location]]]:
+        """
+        按单元分组。
+        返回：
+            {单元键: (请求上游使用的地点, 单元内的地点列表)}；不分桶时每个地点自成一组，
+            单元内只有一个地点时请求使用该地点本身
+        """
+        groups = {}
+        for location in locations:
+            if self.precision is None:
+                groups[location.name] = (location, [location])
+                continue
+            cell = self.cell_of(location.lat, location.lon)
+            group = groups.get(cell)
+            if group is None:
+                lat, lon = self.center(cell)
+                group = groups[cell] = (Location(f"cell:{lat},{lon}", lat, lon), [])
+            group[1].append(location)
+        for cell, (target, members) in groups.items():
+            if len(members) == 1 and target is not members[0]:
+                groups[cell] = (members[0], members)
+        return groups
@@ -2,39 +2,251 @@
 master/llm_advisor.py
 
 大模型对话模块，提供穿衣建议和风险预警。
+
+【设计说明】
+- 建议按量化后的天气特征缓存（TTL + LRU，复用 shared.ttl_cache.TTLCache）：
+  温度按 TEMP_BAND 度分档，天气现象按 OpenWeather 天气代码分组，风速按蒲福风级、紫外线按 WHO 等级分档；
+  相近天气命中同一条缓存，提示词只描述分档范围，生成的建议对档内所有天气都适用
+- 同一特征的并发请求合并为一次加载（single-flight）；不同特征的未命中在 batch_window 秒内凑批，
+  一次上游请求生成多条建议
+- 上游为 OpenAI 兼容的 chat/completions 接口，要求模型返回 JSON：{"advice": ["...", ...]}，与输入顺序一致
+- 调用失败时返回兜底文本，失败结果不缓存
+- 本地测试/压测可使用 benchmarks/fake_llm_server.py 提供的模拟模型服务
 """
 
 import os
+import json
+import time
+import queue
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from shared.http_client import LatencyStats, build_session, timed_request
+from shared.ttl_cache import TTLCache
+
+FALLBACK_ADVICE = "获取建议失败，请稍后重试。"
+
+# 温度分档宽度（℃）
+TEMP_BAND = 5
+# 风速分档（m/s，蒲福风级 0-2 / 3-4 / 5-6 / 7 级以上）及紫外线分档（WHO：低/中/高/很高/极高）
+WIND_BUCKETS = (3.4, 8.0, 13.9)
+WIND_LABELS = ("微风", "和风", "强风", "大风")
+UV_BUCKETS = (3, 6, 8, 11)
+UV_LABELS = ("低", "中等", "高", "很高", "极高")
+# OpenWeather 天气代码分组（id // 100），800 为晴
+CONDITION_LABELS = {2: "雷暴", 3: "毛毛雨", 5: "雨", 6: "雪", 7: "雾霾/沙尘", 8: "多云", 800: "晴"}
+
+
+def _bucket(value, bounds) -> int:
+    for i, bound in enumerate(bounds):
+        if value < bound:
+            return i
+    return len(bounds)
+
+
+def quantize(weather_data: Dict) -> Tuple:
+    """
+    将天气数据量化为缓存键 (温度档, 天气现象, 风速档, 紫外线档)。
+    支持 one-call 快照（取 current 数据段）及 {"weather": 描述, "temperature": 温度} 简单格式。
+    """
+    current = weather_data.get("current") or weather_data
+    temp = current.get("temp", current.get("temperature"))
+    if temp is None:
+        raise ValueError("天气数据缺少温度")
+    band = int(float(temp) // TEMP_BAND) * TEMP_BAND
+    weather = current.get("weather")
+    if isinstance(weather, list) and weather and "id" in weather[0]:
+        code = int(weather[0]["id"])
+        condition = 800 if code == 800 else code // 100
+    else:
+        condition = str(weather or "")
+    wind = current.get("wind_speed")
+    uvi = current.get("uvi")
+    return (
+        band,
+        condition,
+        None if wind is None else _bucket(float(wind), WIND_BUCKETS),
+        None if uvi is None else _bucket(float(uvi), UV_BUCKETS),
+    )
+
+
+def describe(key: Tuple) -> str:
+    """把缓存键还原为提示词中的天气描述（只包含分档范围，不含具体数值）"""
+    band, condition, wind, uv = key
+    parts = [f"气温 {band}~{band + TEMP_BAND}℃",
+             f"天气{CONDITION_LABELS.get(condition, condition) or '未知'}"]
+    if wind is not None:
+        parts.append(f"风力{WIND_LABELS[wind]}")
+    if uv is not None:
+        parts.append(f"紫外线{UV_LABELS[uv]}")
+    return "，".join(parts)
+
 
 class LLMAdvisor:
     """
     大模型对话模块，调用LLM API提供建议。
     """
 
-    def __init__(self):
+    SYSTEM_PROMPT = (
+        "你是天气助手。用户会给出若干条编号的天气情况，请为每一条给出一句不超过60字的穿衣建议和风险提示。"
+        '只返回 JSON：{"advice": ["第1条建议", "第2条建议", ...]}，条数和顺序与输入一致。'
+    )
+
+    def __init__(self, api_url=None, model=None, cache_ttl=None, cache_size=None,
+                 batch_size=None, batch_window=None, timeout=(3.05, 60)):
         """
         初始化LLMAdvisor，从环境变量获取API Key。
+        参数：
+            api_url: chat/completions 接口地址
+            model: 模型名称
+            cache_ttl: 建议缓存过期时间（秒）
+            cache_size: 建议缓存最大条目数
+            batch_size: 每次上游请求最多生成的建议条数
+            batch_window: 未命中凑批的最长等待时间（秒）
+            timeout: (连接超时, 读取超时)，秒
         """
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             logging.error("OPENAI_API_KEY 未设置")
+        self.api_url = api_url or os.getenv("LLM_API_URL", "https://api.openai.com/v1/chat/completions")
+        self.model = model or os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.batch_size = batch_size or int(os.getenv("LLM_BATCH_SIZE", 16))
+        self.batch_window = batch_window if batch_window is not None else \
+            int(os.getenv("LLM_BATCH_WINDOW_MS", 50)) / 1000
+        self.timeout = timeout
+        self.cache = TTLCache(
+            maxsize=cache_size or int(os.getenv("LLM_CACHE_SIZE", 1024)),
+            ttl=cache_ttl or float(os.getenv("LLM_CACHE_TTL", 3600)),
+        )
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+        self.session = build_session(pool_size=self.max_concurrency, max_retries=2, headers=headers)
+        # 各批上游请求并发执行，一个慢请求不会拖住后续批次
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="llm")
+        self.latency = LatencyStats()
+        self._pending = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.generated = 0
+        self.failures = 0
 
     def get_advice(self, weather_data):
         """
         根据天气数据获取穿衣建议和风险预警。
         参数：
-            weather_data: 天气数据
+            weather_data: 天气数据（one-call 快照或 {"weather", "temperature"}）
         返回：
             包含建议和预警的文本
         """
         try:
-            # TODO: 调用LLM API，根据天气数据生成建议
-            advice = f"根据当前天气，建议穿{weather_data['weather']}的衣服，注意{weather_data['temperature']}度的气温。"
-            return advice
+            key = quantize(weather_data)
+            return self.cache.get_or_load(key, lambda: self._submit(key).result())
         except Exception as e:
             logging.error(f"调用LLM API失败: {e}")
-            return "获取建议失败，请稍后重试。"
+            return FALLBACK_ADVICE
+
+    def get_advice_many(self, weather_list: List[Dict]) -> List[str]:
+        """
+        批量获取建议：命中缓存的直接返回，其余不同的特征按 batch_size 分组，各组并发请求上游。
+        """
+        keys = []
+        for weather_data in weather_list:
+            try:
+                keys.append(quantize(weather_data))
+            except Exception as e:
+                logging.error(f"天气数据无法量化: {e}")
+                keys.append(None)
+        results = {}
+        for key in keys:
+            if key is not None and key not in results:
+                results[key] = self.cache.get(key)
+        missing = [key for key, value in results.items() if value is None]
+        chunks = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        for chunk, future in [(chunk, self._executor.submit(self._generate, chunk)) for chunk in chunks]:
+            try:
+                for key, advice in zip(chunk, future.result()):
+                    self.cache.set(key, advice)
+                    results[key] = advice
+            except Exception as e:
+                logging.error(f"调用LLM API失败: {e}")
+        return [results.get(key) or FALLBACK_ADVICE for key in keys]
+
+    def _submit(self, key) -> Future:
+        """把一个未命中的特征交给凑批线程，返回结果 Future"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+                self._thread.start()
+        future = Future()
+        self._pending.put((key, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._pending.get(timeout=remaining) if remaining > 0
+                                 else self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._executor.submit(self._complete, batch)
+
+    def _complete(self, batch):
+        keys = list(dict.fromkeys(key for key, _ in batch))
+        try:
+            results = dict(zip(keys, self._generate(keys)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for key, future in batch:
+            future.set_result(results[key])
+
+    def _generate(self, keys: List[Tuple]) -> List[str]:
+        """一次上游请求为多条天气特征生成建议"""
+        prompt = "\n".join(f"{i + 1}. {describe(key)}" for i, key in enumerate(keys))
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "response_format": {"type": "json_object"},
+        }
+        with self._lock:
+            self.upstream_calls += 1
+        try:
+            response, timings = timed_request(self.session, "POST", self.api_url, json=payload,
+                                              timeout=self.timeout)
+            self.latency.add(timings)
+            response.raise_for_status()
+            content = response.json()["choices"][0]["message"]["content"]
+            advice = json.loads(content)["advice"]
+            if not isinstance(advice, list) or len(advice) != len(keys):
+                raise ValueError(f"模型返回 {len(advice) if isinstance(advice, list) else '非列表'} 条建议，期望 {len(keys)} 条")
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        with self._lock:
+            self.generated += len(keys)
+        return [str(text) for text in advice]
+
+    def stats(self) -> Dict:
+        """返回缓存命中/合并统计、上游调用次数及耗时"""
+        return {
+            "cache": self.cache.stats(),
+            "upstream_calls": self.upstream_calls,
+            "generated": self.generated,
+            "failures": self.failures,
+            "latency": self.latency.snapshot(),
+        }
 
 # 示例调用
 if __name__ == "__main__":
@@ -45,4 +257,4 @@ if __name__ == "__main__":
         "temperature": 25
     }
     advice = advisor.get_advice(weather_data)
-    print(advice)
\ No newline at end of file
+    print(advice)
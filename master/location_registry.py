@@ -0,0 +1,140 @@
+"""
+master/location_registry.py
+
+采集地点注册表，负责加载需要采集天气的城市/坐标列表。
+
+【数据来源】
+- LOCATIONS_FILE 指定的 JSON 文件：[{"name": "beijing", "lat": 39.9, "lon": 116.4}, ...]
+- LOCATIONS_FILE 指定的 CSV 文件：表头为 name,lat,lon
+- LOCATIONS_TABLE 指定的 MySQL 表（name, lat, lon, enabled），使用主节点的 MySQL 连接池
+- 以上均未配置时，回退到 WEATHER_LAT / WEATHER_LON 单一地点
+"""
+
+import os
+import csv
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+
+
+class Location:
+    """
+    单个采集地点。
+    """
+
+    __slots__ = ("name", "lat", "lon")
+
+    def __init__(self, name: str, lat: float, lon: float):
+        lat = float(lat)
+        lon = float(lon)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"经纬度超出范围: name={name}, lat={lat}, lon={lon}")
+        self.name = str(name)
+        self.lat = lat
+        self.lon = lon
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "lat": self.lat, "lon": self.lon}
+
+    def __repr__(self):
+        return f"Location(name={self.name!r}, lat={self.lat}, lon={self.lon})"
+
+
+class LocationRegistry:
+    """
+    采集地点注册表，按名称唯一保存所有地点。
+    """
+
+    def __init__(self, locations: Iterable[Location] = ()):
+        self._locations: Dict[str, Location] = {}
+        for location in locations:
+            self.add(location)
+
+    def add(self, location: Location):
+        """添加或覆盖一个地点"""
+        if location.name in self._locations:
+            logging.warning(f"地点名称重复，后者覆盖前者: {location.name}")
+        self._locations[location.name] = location
+
+    def remove(self, name: str):
+        """按名称移除地点"""
+        self._locations.pop(name, None)
+
+    def get(self, name: str) -> Optional[Location]:
+        return self._locations.get(name)
+
+    def all(self) -> List[Location]:
+        return list(self._locations.values())
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __iter__(self):
+        return iter(self.all())
+
+    @classmethod
+    def from_file(cls, path: str) -> "LocationRegistry":
+        """
+        从 JSON 或 CSV 文件加载地点。
+        参数：
+            path: 文件路径，按扩展名区分格式
+        """
+        if path.lower().endswith(".csv"):
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        else:
+            with open(path, encoding="utf-8") as f:
+                rows = json.load(f)
+        return cls._from_rows(rows, source=path)
+
+    @classmethod
+    def from_table(cls, get_connection, table_name: str = "locations") -> "LocationRegistry":
+        """
+        从 MySQL 表加载启用的地点。
+        参数：
+            get_connection: 返回数据库连接的函数（如 shared.db_connector.get_db_connection）
+            table_name: 表名
+        """
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT name, lat, lon FROM {table_name} WHERE enabled = 1")
+                rows = [{"name": r[0], "lat": r[1], "lon": r[2]} for r in cursor.fetchall()]
+        finally:
+            conn.close()
+        return cls._from_rows(rows, source=table_name)
+
+    @classmethod
+    def from_env(cls) -> "LocationRegistry":
+        """
+        根据环境变量加载地点：优先 LOCATIONS_FILE，其次 LOCATIONS_TABLE，最后 WEATHER_LAT / WEATHER_LON。
+        """
+        path = os.getenv("LOCATIONS_FILE")
+        if path:
+            return cls.from_file(path)
+        table_name = os.getenv("LOCATIONS_TABLE")
+        if table_name:
+            from shared.db_connector import get_db_connection
+            return cls.from_table(lambda: get_db_connection(
+                host=os.getenv("MYSQL_HOST"), port=int(os.getenv("MYSQL_PORT", 3306)),
+                user=os.getenv("MYSQL_USER"), password=os.getenv("MYSQL_PASSWORD"),
+                db=os.getenv("MYSQL_DB", "weather"),
+            ), table_name)
+        lat = os.getenv("WEATHER_LAT")
+        lon = os.getenv("WEATHER_LON")
+        if lat is None or lon is None:
+            raise ValueError("未配置 LOCATIONS_FILE / LOCATIONS_TABLE，且 WEATHER_LAT / WEATHER_LON 不完整")
+        name = os.getenv("WEATHER_LOCATION_NAME", f"{float(lat):.4f},{float(lon):.4f}")
+        return cls([Location(name, lat, lon)])
+
+    @classmethod
+    def _from_rows(cls, rows, source) -> "LocationRegistry":
+        registry = cls()
+        for i, row in enumerate(rows):
+            try:
+                name = row.get("name") or f"{float(row['lat']):.4f},{float(row['lon']):.4f}"
+                registry.add(Location(name, row["lat"], row["lon"]))
+            except (KeyError, TypeError, ValueError) as e:
+                logging.error(f"跳过无效地点 {source}#{i}: {e}")
+        logging.info(f"从 {source} 加载了 {len(registry)} 个采集地点")
+        return registry
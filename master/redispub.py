@@ -2,19 +2,65 @@
 master/redispub.py
 
 处理 Redis 消息发布。
+
+- 客户端共享 shared.redis_util 的进程级连接池，不再每次发布都新建连接
+- publish_batch 通过 pipeline 一次往返发布多个地点的快照
+- 发布内容为 shared.snapshot_delta 生成的增量/关键帧消息；listen_keyframe_requests 响应从节点的关键帧请求
+- transport="stream" 时改为 XADD 追加到同名 Stream（MAXLEN 近似裁剪），从节点以消费组方式读取，重启后可追赶
+- 消息经 shared.codec 编码（msgpack + 超过阈值时压缩），格式由 MESSAGE_FORMAT 等环境变量控制
 """
 
+import time
 import logging
-import json
-from shared.redis_util import get_redis_client
+from shared.codec import encode_message
+from shared.redis_util import get_redis_client, publish_many, xadd_many
 
 def publish_to_redis(weather_data, REDIS_HOST, REDIS_PORT, REDIS_CHANNEL):
     """将天气数据发布到Redis频道"""
     try:
         redis_client = get_redis_client(host=REDIS_HOST, port=REDIS_PORT)
-        redis_client.publish(REDIS_CHANNEL, json.dumps(weather_data))
+        redis_client.publish(REDIS_CHANNEL, encode_message(weather_data))
         logging.info(f"数据已发布到Redis频道: {REDIS_CHANNEL}")
         return True
     except Exception as e:
         logging.error(f"Redis发布失败: {e}")
         return False
+
+def publish_batch(snapshots, REDIS_HOST, REDIS_PORT, REDIS_CHANNEL, transport="pubsub", maxlen=None):
+    """
+    将多个地点的天气数据通过 pipeline 一次发布
+    transport 为 "pubsub" 时发布到频道，为 "stream" 时追加到名为 REDIS_CHANNEL 的 Stream（保留约 maxlen 条）
+    """
+    if not snapshots:
+        return True
+    try:
+        redis_client = get_redis_client(host=REDIS_HOST, port=REDIS_PORT)
+        messages = [encode_message(data) for data in snapshots]
+        if transport == "stream":
+            xadd_many(redis_client, REDIS_CHANNEL, messages, maxlen=maxlen)
+        else:
+            publish_many(redis_client, REDIS_CHANNEL, messages)
+        logging.info(f"{len(snapshots)} 条数据已批量发布到Redis{'Stream' if transport == 'stream' else '频道'}: {REDIS_CHANNEL}")
+        return True
+    except Exception as e:
+        logging.error(f"Redis批量发布失败: {e}")
+        return False
+
+def listen_keyframe_requests(REDIS_HOST, REDIS_PORT, channel, on_request):
+    """订阅关键帧请求频道（消息内容为地点名），断线后按指数退避重连"""
+    backoff = 1
+    while True:
+        try:
+            pubsub = get_redis_client(host=REDIS_HOST, port=REDIS_PORT).pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(channel)
+            logging.info(f"已订阅关键帧请求频道: {channel}")
+            backoff = 1
+            for message in pubsub.listen():
+                try:
+                    on_request(message["data"])
+                except Exception as e:
+                    logging.error(f"处理关键帧请求失败: {e}")
+        except Exception as e:
+            logging.error(f"关键帧请求订阅断开，{backoff} 秒后重连: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
@@ -0,0 +1,128 @@
+"""
+master/scheduler.py
+
+固定频率调度器，取代 "执行任务 + time.sleep(60)" 的循环。
+
+【设计说明】
+- 按固定频率计算名义触发时间 start + k * interval，任务耗时不会让周期漂移
+- 每次触发附加 [0, jitter] 秒的随机抖动，避免多个主节点同时请求上游
+- 任务执行超过一个周期时按 missed_policy 处理错过的触发：
+    skip: 跳过错过的触发，直接对齐到下一个名义触发时间
+    catch_up: 立即补跑错过的触发（最多 max_catch_up 次），其余跳过
+- 任务函数接收名义触发时间（时间戳，不含抖动），便于按固定节拍判断数据段是否到期
+"""
+
+import time
+import random
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+MISSED_SKIP = "skip"
+MISSED_CATCH_UP = "catch_up"
+
+
+class FixedRateScheduler:
+    """
+    固定频率调度器。
+    """
+
+    def __init__(self, interval: float = 60.0, jitter: float = 0.0,
+                 missed_policy: str = MISSED_SKIP, max_catch_up: int = 1):
+        """
+        参数：
+            interval: 触发周期（秒）
+            jitter: 每次触发的最大随机延迟（秒），应小于 interval
+            missed_policy: 错过触发的处理策略（skip / catch_up）
+            max_catch_up: catch_up 策略下最多补跑的次数
+        """
+        if interval <= 0:
+            raise ValueError("interval 必须大于 0")
+        if missed_policy not in (MISSED_SKIP, MISSED_CATCH_UP):
+            raise ValueError(f"未知的错过触发处理策略: {missed_policy}")
+        self.interval = float(interval)
+        self.jitter = min(max(0.0, float(jitter)), self.interval / 2)
+        self.missed_policy = missed_policy
+        self.max_catch_up = max(0, int(max_catch_up))
+        self._stop = threading.Event()
+        self._start_wall = None
+        self._start_mono = None
+        self._tick = 0
+        self.ticks_run = 0
+        self.ticks_missed = 0
+        self.last_run_at = None
+        self.last_duration = None
+
+    def _nominal(self, tick: int) -> float:
+        """第 tick 次触发的名义时间（时间戳）"""
+        return self._start_wall + tick * self.interval
+
+    @property
+    def next_run_at(self) -> Optional[float]:
+        """下一次名义触发时间（时间戳），未启动时为 None"""
+        if self._start_wall is None:
+            return None
+        return self._nominal(self._tick)
+
+    def run(self, task: Callable[[float], None], start_at: float = None):
+        """
+        阻塞运行调度循环，直到 stop() 被调用
+        参数：
+            task: 任务函数，参数为名义触发时间戳
+            start_at: 首次触发时间戳，默认立即触发
+        """
+        now_wall = time.time()
+        self._start_wall = now_wall if start_at is None else start_at
+        self._start_mono = time.monotonic() + (self._start_wall - now_wall)
+        self._tick = 0
+        catch_up_left = self.max_catch_up
+
+        while not self._stop.is_set():
+            due_mono = self._start_mono + self._tick * self.interval
+            delay = due_mono - time.monotonic()
+            if delay > 0:
+                delay += random.uniform(0, self.jitter) if self.jitter else 0
+                if self._stop.wait(delay):
+                    break
+            elif -delay >= self.interval:
+                # 已错过至少一个完整周期
+                behind = int(-delay // self.interval)
+                if self.missed_policy == MISSED_CATCH_UP and catch_up_left > 0:
+                    catch_up_left -= 1
+                    logging.warning(f"调度落后 {behind} 个周期，补跑第 {self._tick} 次触发")
+                else:
+                    self.ticks_missed += behind
+                    self._tick += behind
+                    catch_up_left = self.max_catch_up
+                    logging.warning(f"调度落后，跳过 {behind} 次触发")
+                    continue
+            else:
+                catch_up_left = self.max_catch_up
+
+            nominal = self._nominal(self._tick)
+            self._tick += 1
+            started = time.monotonic()
+            self.last_run_at = time.time()
+            try:
+                task(nominal)
+            except Exception as e:
+                logging.error(f"调度任务执行失败: {e}")
+            self.last_duration = time.monotonic() - started
+            self.ticks_run += 1
+
+    def stop(self):
+        """停止调度循环（当前任务执行完后退出）"""
+        self._stop.set()
+
+    def status(self) -> Dict:
+        """返回调度状态"""
+        return {
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "missed_policy": self.missed_policy,
+            "next_run_at": self.next_run_at,
+            "last_run_at": self.last_run_at,
+            "last_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "ticks_run": self.ticks_run,
+            "ticks_missed": self.ticks_missed,
+        }
@@ -2,33 +2,337 @@
 master/sms_sender.py
 
 短信发送模块，负责调用短信API发送通知。
+
+【设计说明】
+- send_sms 只入队、立即返回，不阻塞采集周期；后台分发线程按批取出（最多等待 batch_interval 秒）
+- 不改写短信内容：多条告警合并为一条短信由调用方（AlarmManager.flush）负责，这里只把同一批中
+  内容相同的消息合并为一次请求（接收人取并集并去重，每次请求最多 batch_size 个号码）
+- 请求由线程池并发发送（最多 max_workers 个），复用 shared.http_client 的连接池 Session；
+  每次请求前从令牌桶取令牌，保证不超过网关的速率限制
+- 连接错误、429、5xx 按指数退避（带随机抖动，429 优先使用 Retry-After，不超过 max_backoff）重试，最多 max_attempts 次；
+  待重试的请求保存在本地 JSON Lines 文件中，进程重启后继续重试
+- 统计投递延迟（入队到网关确认）与 HTTP 请求耗时
+
+【网关协议】
+- POST api_url，JSON 请求体 {"phone_numbers": [...], "message": "..."}，2xx 表示成功
+- 本地测试/压测可使用 benchmarks/fake_sms_gateway.py 提供的模拟网关
 """
 
+import os
+import json
+import time
+import heapq
+import queue
+import random
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+from shared.http_client import LatencyStats, build_session, timed_request
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶：每秒补充 rate 个令牌，最多积累 burst 个。
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        if self.rate <= 0:
+            raise ValueError(f"速率限制必须为正数: {rate}")
+        if self.capacity < 1:
+            raise ValueError(f"令牌桶容量不能小于 1: {burst}")
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """取一个令牌，令牌不足时等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+                self.waited += delay
+            time.sleep(delay)
+
 
 class SmsSender:
     """
     短信发送器，用于发送短信通知。
     """
 
-    def __init__(self, api_url):
+    def __init__(self, api_url, max_workers=None, rate_limit=None, burst=None, batch_size=None,
+                 batch_interval=None, max_attempts=None, retry_path=None, max_backoff=300.0,
+                 timeout=(3.05, 10)):
         """
         初始化短信发送器。
         参数：
             api_url: 短信API地址
+            max_workers: 最大并发请求数
+            rate_limit: 网关速率限制（每秒请求数）
+            burst: 令牌桶容量（允许的突发请求数）
+            batch_size: 每次请求最多的接收人数
+            batch_interval: 凑批的最长等待时间（秒）
+            max_attempts: 每个请求的最多尝试次数
+            retry_path: 待重试请求的保存文件（JSON Lines）
+            max_backoff: 重试退避的最大间隔（秒），Retry-After 也不超过该值
+            timeout: (连接超时, 读取超时)，秒
         """
         self.api_url = api_url
+        self.max_workers = max_workers or int(os.getenv("SMS_MAX_CONCURRENCY", 4))
+        self.batch_size = batch_size or int(os.getenv("SMS_BATCH_SIZE", 100))
+        self.batch_interval = batch_interval if batch_interval is not None else \
+            int(os.getenv("SMS_BATCH_INTERVAL_MS", 200)) / 1000
+        self.max_attempts = max_attempts or int(os.getenv("SMS_MAX_ATTEMPTS", 5))
+        self.retry_path = retry_path or os.getenv("SMS_RETRY_PATH", "sms_retry.jsonl")
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_limit or float(os.getenv("SMS_RATE_LIMIT", 10)),
+                                  burst or (float(os.getenv("SMS_BURST")) if os.getenv("SMS_BURST") else None))
+        self.session = build_session(pool_size=self.max_workers, max_retries=0)
+        self.latency = LatencyStats()
+        self._queue = queue.Queue()
+        self._retries = []  # 堆：(下次尝试时间, 序号, 请求)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.max_workers)
+        self._executor = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._outstanding = 0  # 已入队但尚未发送完成（或转入重试）的消息/请求数
+        self._delivery = deque(maxlen=1024)  # 最近的投递延迟（秒）
+        self.queued = 0
+        self.requests = 0
+        self.sent = 0
+        self.recipients_sent = 0
+        self.retried = 0
+        self.dropped = 0
+        self._load_retries()
 
     def send_sms(self, phone_numbers, message):
         """
-        发送短信通知。
+        发送短信通知（异步：入队后立即返回）。
         参数：
             phone_numbers: 接收人手机号列表
             message: 短信内容
         """
+        phone_numbers = list(phone_numbers)
+        if not phone_numbers:
+            return
         logging.info(f"向 {phone_numbers} 发送短信: {message}")
+        self.start()
+        with self._lock:
+            self._outstanding += 1
+            self.queued += 1
+        self._queue.put({"phone_numbers": phone_numbers, "message": message, "queued_at": time.time()})
+
+    def start(self):
+        """启动分发线程（send_sms 时自动启动）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sms")
+                self._thread = threading.Thread(target=self._run, name="sms-dispatcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            items = self._take_batch()
+            batch = self._group(items) + self._due_retries()
+            with self._lock:
+                # 未完成计数从消息数换算为请求数
+                self._outstanding += len(batch) - len(items)
+            for request in batch:
+                # 并发数已满时在此等待，分发线程不会无限积压请求
+                self._slots.acquire()
+                self._executor.submit(self._deliver, request)
+
+    def _take_batch(self) -> List[Dict]:
+        """取出一批消息：收到第一条后最多再等待 batch_interval 秒；1 秒内没有消息时返回空列表"""
         try:
-            # TODO: 实现调用短信API的逻辑
-            pass  # 占位符，实际需要调用API
+            items = [self._queue.get(timeout=min(1.0, self._next_retry_delay()))]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_interval
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _group(self, items: List[Dict]) -> List[Dict]:
+        """把内容相同的消息合并为一个请求（接收人去重），内容本身不做改动"""
+        by_content = {}
+        for item in items:
+            request = by_content.setdefault(item["message"], {"phone_numbers": {}, "queued_at": item["queued_at"]})
+            # dict 保持顺序并去重
+            request["phone_numbers"].update(dict.fromkeys(item["phone_numbers"]))
+            request["queued_at"] = min(request["queued_at"], item["queued_at"])
+        grouped = []
+        for message, request in by_content.items():
+            phones = list(request["phone_numbers"])
+            for i in range(0, len(phones), self.batch_size):
+                grouped.append({"phone_numbers": phones[i:i + self.batch_size], "message": message,
+                                "queued_at": request["queued_at"], "attempts": 0})
+        return grouped
+
+    def _next_retry_delay(self) -> float:
+        with self._lock:
+            if not self._retries:
+                return 1.0
+            return max(0.01, self._retries[0][0] - time.time())
+
+    def _due_retries(self) -> List[Dict]:
+        due = []
+        with self._lock:
+            now = time.time()
+            while self._retries and self._retries[0][0] <= now:
+                due.append(heapq.heappop(self._retries)[2])
+            if due:
+                self._persist_retries()
+        return due
+
+    def _deliver(self, request: Dict):
+        """发送一个请求，失败时按规则安排重试"""
+        try:
+            self.bucket.acquire()
+            payload = {"phone_numbers": request["phone_numbers"], "message": request["message"]}
+            retry_after = None
+            try:
+                response, timings = timed_request(self.session, "POST", self.api_url, json=payload,
+                                                  timeout=self.timeout)
+                self.latency.add(timings)
+                status = response.status_code
+                retry_after = response.headers.get("Retry-After")
+                error = None if status < 300 else f"HTTP {status}"
+            except requests.RequestException as e:
+                self.latency.add_error()
+                status, error = None, str(e)
+            with self._lock:
+                self.requests += 1
+            if error is None:
+                with self._lock:
+                    self.sent += 1
+                    self.recipients_sent += len(request["phone_numbers"])
+                    self._delivery.append(time.time() - request["queued_at"])
+            elif status is None or status == 429 or status >= 500:
+                self._schedule_retry(request, error, retry_after)
+            else:
+                with self._lock:
+                    self.dropped += 1
+                logging.error(f"发送短信失败（不重试）: {error}，接收人 {request['phone_numbers']}")
         except Exception as e:
-            logging.error(f"发送短信失败: {e}")
\ No newline at end of file
+            logging.error(f"发送短信失败: {e}")
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+            self._slots.release()
+
+    def _schedule_retry(self, request: Dict, error: str, retry_after=None):
+        request["attempts"] += 1
+        if request["attempts"] >= self.max_attempts:
+            with self._lock:
+                self.dropped += 1
+            logging.error(f"发送短信失败，已达最大尝试次数 {self.max_attempts}: {error}，接收人 {request['phone_numbers']}")
+            return
+        try:
+            delay = min(self.max_backoff, max(0.0, float(retry_after)))
+        except (TypeError, ValueError):
+            backoff = min(self.max_backoff, 2.0 ** request["attempts"])
+            delay = random.uniform(backoff / 2, backoff)
+        logging.warning(f"发送短信失败，{delay:.1f} 秒后第 {request['attempts'] + 1} 次尝试: {error}")
+        with self._lock:
+            self.retried += 1
+            self._seq += 1
+            heapq.heappush(self._retries, (time.time() + delay, self._seq, request))
+            self._persist_retries()
+
+    def _persist_retries(self):
+        """在持锁状态下把待重试请求写入文件（先写临时文件再替换）"""
+        try:
+            if not self._retries:
+                if os.path.exists(self.retry_path):
+                    os.remove(self.retry_path)
+                return
+            tmp_path = self.retry_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for next_at, _, request in self._retries:
+                    f.write(json.dumps(dict(request, next_at=next_at), ensure_ascii=False))
+                    f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.retry_path)
+        except OSError as e:
+            logging.error(f"保存短信重试队列失败: {e}")
+
+    def _load_retries(self):
+        """加载上次运行遗留的待重试请求"""
+        if not os.path.exists(self.retry_path):
+            return
+        with open(self.retry_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    logging.error("短信重试文件中存在无法解析的行，已跳过")
+                    continue
+                self._seq += 1
+                heapq.heappush(self._retries, (request.pop("next_at", 0), self._seq, request))
+        if self._retries:
+            logging.info(f"已加载 {len(self._retries)} 个待重试的短信请求")
+            self.start()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """等待已入队的消息发送完成（或转入重试队列），返回是否在超时前完成"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._outstanding <= 0:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def close(self, timeout: float = 10.0):
+        """停止分发线程：发送完已入队的消息，未到期的重试保留在文件中"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        """返回发送计数、重试队列长度、投递延迟（毫秒）及 HTTP 请求耗时"""
+        with self._lock:
+            samples = sorted(self._delivery)
+            pending_retries = len(self._retries)
+            outstanding = self._outstanding
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 2) if samples else 0.0
+
+        return {
+            "queued": self.queued,
+            "outstanding": outstanding,
+            "requests": self.requests,
+            "sent": self.sent,
+            "recipients_sent": self.recipients_sent,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "pending_retries": pending_retries,
+            "rate_limit_wait_s": round(self.bucket.waited, 3),
+            "delivery_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+            "http": self.latency.snapshot(),
+        }
@@ -2,11 +2,26 @@
 master/weather_api.py
 
 OpenWeatherMap API 接口封装，提供天气数据查询功能。
+
+【连接管理】
+- 每个 WeatherAPI 实例持有一个带连接池的 Session，复用 TCP/TLS 连接
+- 连接池大小、连接/读取超时可通过参数或环境变量配置：
+  WEATHER_HTTP_POOL_SIZE、WEATHER_CONNECT_TIMEOUT、WEATHER_READ_TIMEOUT、WEATHER_HTTP_RETRIES
+- 每次请求的 DNS/连接/传输耗时累计在 latency 中，可通过 latency_stats() 查看
+
+【响应缓存】
+- 完整的 one-call 响应按 (lat, lon, units, lang) 缓存在 TTL + LRU 缓存中
+- get_current_weather / get_hourly_forecast 等便捷方法共享同一份缓存，
+  同一地点的并发请求只会触发一次上游调用
+- 缓存参数：WEATHER_CACHE_TTL（秒）、WEATHER_CACHE_SIZE
 """
 
 import os
-import requests
-from typing import Optional, Dict, List
+import logging
+from typing import Dict, List
+
+from shared.http_client import LatencyStats, build_session, timed_request
+from shared.ttl_cache import TTLCache
 
 class WeatherAPI:
     """
@@ -15,16 +30,57 @@ class WeatherAPI:
     
     BASE_URL = "https://api.openweathermap.org/data/3.0/onecall"
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, pool_size: int = None,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None, cache_ttl: float = None, cache_size: int = None):
         """
         初始化 WeatherAPI
         
         参数:
             api_key: OpenWeatherMap API key，如果为None则从环境变量获取
+            pool_size: 连接池大小，应不小于并发采集数
+            connect_timeout: 建立连接超时（秒）
+            read_timeout: 读取响应超时（秒）
+            max_retries: 连接错误及 429/5xx 的重试次数
+            cache_ttl: 响应缓存过期时间（秒）
+            cache_size: 响应缓存最大条目数
         """
         self.api_key = api_key or os.getenv("WEATHER_API_KEY")
         if not self.api_key:
             raise ValueError("API key must be provided or set in WEATHER_API_KEY environment variable")
+        self.pool_size = pool_size or int(os.getenv("WEATHER_HTTP_POOL_SIZE", 32))
+        self.timeout = (
+            connect_timeout or float(os.getenv("WEATHER_CONNECT_TIMEOUT", 3.05)),
+            read_timeout or float(os.getenv("WEATHER_READ_TIMEOUT", 10)),
+        )
+        if max_retries is None:
+            max_retries = int(os.getenv("WEATHER_HTTP_RETRIES", 3))
+        self.session = build_session(pool_size=self.pool_size, max_retries=max_retries)
+        self.latency = LatencyStats()
+        self.cache = TTLCache(
+            maxsize=cache_size or int(os.getenv("WEATHER_CACHE_SIZE", 2048)),
+            ttl=cache_ttl or float(os.getenv("WEATHER_CACHE_TTL", 60)),
+        )
+
+    @staticmethod
+    def _cache_key(lat: float, lon: float, units: str, lang: str):
+        return (round(float(lat), 4), round(float(lon), 4), units, lang)
+
+    def cache_stats(self) -> Dict:
+        """
+        返回响应缓存统计（命中/未命中/合并次数等）
+        """
+        return self.cache.stats()
+
+    def latency_stats(self) -> Dict:
+        """
+        返回请求耗时统计（DNS/TCP/TLS/等待/传输，毫秒）
+        """
+        return self.latency.snapshot()
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
 
     def get_weather_data(self, lat: float, lon: float, exclude: List[str] = None, 
                         units: str = "metric", lang: str = "zh_cn") -> Dict:
@@ -45,12 +101,44 @@ class WeatherAPI:
             "lat": lat,
             "lon": lon,
             "appid": self.api_key,
+            "units": units,
+            "lang": lang,
         }
-        import urllib.parse
-        encoded_params = urllib.parse.urlencode(params)
-        response = requests.get(f"{self.BASE_URL}?{encoded_params}")
+        if exclude:
+            params["exclude"] = ",".join(exclude)
+        try:
+            response, timings = timed_request(self.session, "GET", self.BASE_URL,
+                                              params=params, timeout=self.timeout)
+        except Exception:
+            self.latency.add_error()
+            raise
+        self.latency.add(timings)
+        logging.debug(f"WeatherAPI 请求耗时: {timings}")
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if not exclude:
+            # 完整响应顺带刷新缓存，供便捷方法复用
+            self.cache.set(self._cache_key(lat, lon, units, lang), data)
+        return data
+
+    def get_cached_weather_data(self, lat: float, lon: float,
+                                units: str = "metric", lang: str = "zh_cn") -> Dict:
+        """
+        获取完整天气数据，优先读取缓存
+        
+        参数:
+            lat: 纬度
+            lon: 经度
+            units: 单位制
+            lang: 语言代码
+            
+        返回:
+            天气数据字典（与其他调用方共享，请勿修改）
+        """
+        return self.cache.get_or_load(
+            self._cache_key(lat, lon, units, lang),
+            lambda: self.get_weather_data(lat, lon, units=units, lang=lang),
+        )
 
     def get_current_weather(self, lat: float, lon: float, 
                           units: str = "metric", lang: str = "zh_cn") -> Dict:
@@ -66,9 +154,7 @@ class WeatherAPI:
         返回:
             当前天气数据
         """
-        data = self.get_weather_data(lat, lon,
-                                    exclude=["minutely", "hourly", "daily", "alerts"],
-                                    units=units, lang=lang)
+        data = self.get_cached_weather_data(lat, lon, units=units, lang=lang)
         return data["current"]
 
     def get_minutely_forecast(self, lat: float, lon: float, 
@@ -85,9 +171,7 @@ class WeatherAPI:
         返回:
             分钟级降水预报列表
         """
-        data = self.get_weather_data(lat, lon, 
-                                   exclude=["current", "hourly", "daily", "alerts"],
-                                   units=units, lang=lang)
+        data = self.get_cached_weather_data(lat, lon, units=units, lang=lang)
         return data["minutely"]
 
     def get_hourly_forecast(self, lat: float, lon: float, 
@@ -104,9 +188,7 @@ class WeatherAPI:
         返回:
             小时级天气预报列表
         """
-        data = self.get_weather_data(lat, lon, 
-                                   exclude=["current", "minutely", "daily", "alerts"],
-                                   units=units, lang=lang)
+        data = self.get_cached_weather_data(lat, lon, units=units, lang=lang)
         return data["hourly"]
 
     def get_daily_forecast(self, lat: float, lon: float, 
@@ -123,9 +205,7 @@ class WeatherAPI:
         返回:
             每日天气预报列表
         """
-        data = self.get_weather_data(lat, lon, 
-                                   exclude=["current", "minutely", "hourly", "alerts"],
-                                   units=units, lang=lang)
+        data = self.get_cached_weather_data(lat, lon, units=units, lang=lang)
         return data["daily"]
 
     def get_weather_alerts(self, lat: float, lon: float, 
@@ -142,9 +222,7 @@ class WeatherAPI:
         返回:
             天气警报列表
         """
-        data = self.get_weather_data(lat, lon, 
-                                   exclude=["current", "minutely", "hourly", "daily"],
-                                   units=units, lang=lang)
+        data = self.get_cached_weather_data(lat, lon, units=units, lang=lang)
         return data.get("alerts", [])
 
     @staticmethod
@@ -0,0 +1,157 @@
+"""
+shared/codec.py
+
+Pub/Sub 消息编解码：带版本头的二进制编码，主节点与从节点共用。
+
+【消息格式】
+- 第 1 字节为头部：高 4 位为格式版本，第 2-3 位为序列化方式，第 0-1 位为压缩方式
+    序列化：0 = JSON，1 = msgpack
+    压缩：  0 = 不压缩，1 = zlib，2 = zstd
+- 其余字节为（可能压缩的）消息体
+- 旧版节点发送的纯 JSON 文本以 "{" 开头，解码时按旧格式处理，新旧节点可以共存
+
+【配置】
+- MESSAGE_FORMAT: json（旧格式，纯 JSON 文本，滚动升级期间使用）/ msgpack（默认）
+- MESSAGE_COMPRESSION: zlib（默认）/ zstd / none
+- MESSAGE_COMPRESS_THRESHOLD: 消息体超过该字节数才压缩，默认 1024
+- zstd 需要安装 zstandard 库，未安装时退回 zlib
+- zstandard 的压缩/解压上下文不是线程安全的，每个线程使用各自的上下文（threading.local）
+"""
+
+import os
+import json
+import zlib
+import logging
+import threading
+
+import msgpack
+
+try:
+    import zstandard
+except ImportError:  # zstd 为可选依赖
+    zstandard = None
+
+FORMAT_VERSION = 1
+
+SERIALIZER_JSON = 0
+SERIALIZER_MSGPACK = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+_COMPRESSION_NAMES = {"none": COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB, "zstd": COMPRESSION_ZSTD}
+_LEGACY_PREFIXES = (ord("{"), ord("["))
+
+
+def _header(serializer: int, compression: int) -> bytes:
+    return bytes(((FORMAT_VERSION << 4) | (serializer << 2) | compression,))
+
+
+class MessageCodec:
+    """
+    消息编解码器。encode 返回 bytes（旧格式时为 str），decode 兼容新旧两种格式。
+    """
+
+    def __init__(self, fmt: str = "msgpack", compression: str = "zlib",
+                 compress_threshold: int = 1024, level: int = 3):
+        """
+        参数：
+            fmt: msgpack 或 json（json 表示发送旧格式纯文本）
+            compression: zlib / zstd / none
+            compress_threshold: 消息体超过该字节数才压缩
+            level: 压缩级别
+        """
+        if fmt not in ("msgpack", "json"):
+            raise ValueError(f"未知的消息格式: {fmt}")
+        if compression not in _COMPRESSION_NAMES:
+            raise ValueError(f"未知的压缩方式: {compression}")
+        if compression == "zstd" and zstandard is None:
+            logging.warning("未安装 zstandard，消息压缩退回 zlib")
+            compression = "zlib"
+        self.fmt = fmt
+        self.compression = _COMPRESSION_NAMES[compression]
+        self.compress_threshold = max(0, int(compress_threshold))
+        self.level = level
+        # 采集线程与关键帧请求监听线程共用同一个编解码器
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls) -> "MessageCodec":
+        return cls(
+            fmt=os.getenv("MESSAGE_FORMAT", "msgpack"),
+            compression=os.getenv("MESSAGE_COMPRESSION", "zlib"),
+            compress_threshold=int(os.getenv("MESSAGE_COMPRESS_THRESHOLD", 1024)),
+        )
+
+    def _zstd_compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor
+
+    def _zstd_decompressor(self):
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+    def encode(self, data):
+        """编码消息"""
+        if self.fmt == "json":
+            return json.dumps(data)
+        body = msgpack.packb(data, use_bin_type=True)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(body) > self.compress_threshold:
+            compression = self.compression
+            if compression == COMPRESSION_ZSTD:
+                body = self._zstd_compressor().compress(body)
+            else:
+                body = zlib.compress(body, self.level)
+        return _header(SERIALIZER_MSGPACK, compression) + body
+
+    def decode(self, message):
+        """解码消息；格式不支持时抛出 ValueError"""
+        if isinstance(message, str):
+            return json.loads(message)
+        if not message:
+            raise ValueError("空消息")
+        head = message[0]
+        if head in _LEGACY_PREFIXES:
+            return json.loads(message)
+        version, serializer, compression = head >> 4, (head >> 2) & 0x3, head & 0x3
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的消息版本: {version}")
+        body = memoryview(message)[1:]
+        if compression == COMPRESSION_ZLIB:
+            body = zlib.decompress(body)
+        elif compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise ValueError("收到 zstd 压缩消息，但未安装 zstandard")
+            body = self._zstd_decompressor().decompress(body)
+        elif compression != COMPRESSION_NONE:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        if serializer == SERIALIZER_MSGPACK:
+            return msgpack.unpackb(body, raw=False)
+        if serializer == SERIALIZER_JSON:
+            return json.loads(bytes(body))
+        raise ValueError(f"不支持的序列化方式: {serializer}")
+
+
+_default_codec = None
+
+
+def get_codec() -> MessageCodec:
+    """返回按环境变量配置的进程级编解码器"""
+    global _default_codec
+    if _default_codec is None:
+        _default_codec = MessageCodec.from_env()
+    return _default_codec
+
+
+def encode_message(data):
+    return get_codec().encode(data)
+
+
+def decode_message(message):
+    return get_codec().decode(message)
@@ -9,16 +9,150 @@ shared/db_connector.py
 - 支持主节点数据持久化、从节点本地查询
 - 支持生产环境下SSL安全连接（MySQL）
 - 支持批量插入、查询等高性能操作
+- 连接池监控：借出次数、使用中/空闲连接数、借出等待时间、连接存活时间、失败次数
 """
 
 from dbutils.pooled_db import PooledDB
 import pymysql
 import sqlite3
 import logging
+import threading
+import time
+import weakref
 
 # MySQL连接池实例
 _mysql_pool = None
 
+
+class InstrumentedPool:
+    """
+    PooledDB 的监控包装：统计借出等待、持有时间、连接存活时间和失败次数。
+    """
+
+    def __init__(self, pool, mincached, maxcached, maxconnections):
+        self._pool = pool
+        self.mincached = mincached
+        self.maxcached = maxcached
+        self.maxconnections = maxconnections
+        self._lock = threading.Lock()
+        # SteadyDB 连接 -> (底层物理连接 id, 创建（首次见到）时间)，连接被回收后自动移除
+        self._born = weakref.WeakKeyDictionary()
+        self.checkouts = 0
+        self.failures = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_wait = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.released = 0
+        self.last_failure = None
+
+    def connection(self):
+        """从连接池借出连接，返回带统计的连接代理"""
+        start = time.perf_counter()
+        try:
+            conn = self._pool.connection()
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self.last_failure = f"{type(e).__name__}: {e}"
+            raise
+        wait = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.last_wait = wait
+            self._track_age(conn)
+        return _TrackedConnection(conn, self)
+
+    def _track_age(self, conn):
+        """记录物理连接的创建时间；SteadyDB 自动重连后底层连接变化，存活时间重新计算"""
+        steady = getattr(conn, "_con", None)
+        if steady is None:
+            return
+        raw_id = id(getattr(steady, "_con", None))
+        known = self._born.get(steady)
+        if known is None or known[0] != raw_id:
+            self._born[steady] = (raw_id, time.time())
+
+    def _release(self, held):
+        with self._lock:
+            self.in_use -= 1
+            self.released += 1
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+
+    def status(self):
+        """返回连接池状态"""
+        with self._lock:
+            now = time.time()
+            ages = [now - born for _, born in self._born.values()]
+            checkouts = self.checkouts or 1
+            released = self.released or 1
+            return {
+                "initialized": True,
+                "mincached": self.mincached,
+                "maxcached": self.maxcached,
+                "maxconnections": self.maxconnections,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "idle": len(getattr(self._pool, "_idle_cache", ())),
+                "checkouts": self.checkouts,
+                "failures": self.failures,
+                "last_failure": self.last_failure,
+                "wait_ms": {
+                    "avg": round(self.wait_total / checkouts * 1000, 3),
+                    "max": round(self.wait_max * 1000, 3),
+                    "last": round(self.last_wait * 1000, 3),
+                },
+                "hold_ms": {
+                    "avg": round(self.hold_total / released * 1000, 3),
+                    "max": round(self.hold_max * 1000, 3),
+                },
+                "connection_age_s": {
+                    "count": len(ages),
+                    "max": round(max(ages), 1) if ages else 0.0,
+                    "avg": round(sum(ages) / len(ages), 1) if ages else 0.0,
+                },
+            }
+
+
+class _TrackedConnection:
+    """借出连接的代理，close 时把持有时间记入统计"""
+
+    def __init__(self, conn, pool):
+        self._conn = conn
+        self._pool = pool
+        self._checked_out = time.perf_counter()
+        self._closed = False
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool._release(time.perf_counter() - self._checked_out)
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            if not self._closed:
+                self.close()
+        except Exception:
+            pass
+
 def init_mysql_pool(host, port, user, password, db, 
                    mincached=2, maxcached=5, maxconnections=20):
     """
@@ -35,7 +169,7 @@ def init_mysql_pool(host, port, user, password, db,
     """
     global _mysql_pool
     if _mysql_pool is None:
-        _mysql_pool = PooledDB(
+        pool = PooledDB(
             creator=pymysql,
             mincached=mincached,
             maxcached=maxcached,
@@ -48,6 +182,7 @@ def init_mysql_pool(host, port, user, password, db,
             charset='utf8mb4',
             autocommit=False
         )
+        _mysql_pool = InstrumentedPool(pool, mincached, maxcached, maxconnections)
         logging.info("MySQL连接池初始化完成")
 
 def get_db_connection(host=None, port=None, user=None, 
@@ -70,6 +205,14 @@ def get_db_connection(host=None, port=None, user=None,
         logging.error(f"获取MySQL连接失败: {e}")
         raise
 
+def pool_status():
+    """
+    返回MySQL连接池状态（借出次数、使用中/空闲连接数、等待时间、连接存活时间、失败次数）
+    """
+    if _mysql_pool is None:
+        return {"initialized": False}
+    return _mysql_pool.status()
+
 def get_sqlite_connection(db_path):
     """
     获取SQLite数据库连接（从节点用）
@@ -0,0 +1,215 @@
+"""
+shared/http_client.py
+
+HTTP 客户端工具模块，提供带连接池、保活和耗时统计的 requests.Session。
+
+【模块职责】
+- 复用 TCP/TLS 连接（keep-alive），避免每次请求重新握手
+- 连接池大小、重试次数可配置
+- 默认协商 gzip/deflate 压缩
+- 按请求统计耗时：DNS 解析、建立连接（TCP+TLS）、等待首字节、传输
+
+【耗时统计原理】
+- 自定义 urllib3 连接类，在新建连接时分别记录 DNS 与 TCP/TLS 耗时
+- 统计数据写入线程本地变量，由 timed_request 在请求前后读取
+- 复用已有连接时 dns/connect 为 0，reused 为 True
+"""
+
+import socket
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# 当前线程正在进行的请求的耗时记录
+_timing = threading.local()
+
+
+def _record(key, value):
+    record = getattr(_timing, "current", None)
+    if record is not None:
+        record[key] = record.get(key, 0.0) + value
+
+
+class _TimedConnectionMixin:
+    """在新建连接时记录 DNS、TCP、TLS 耗时"""
+
+    def _new_conn(self):
+        host = self._dns_host
+        t0 = time.perf_counter()
+        try:
+            # 先解析一次并把 IP 交给 urllib3，避免重复解析
+            sockaddr = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)[0][4]
+            self._dns_host = sockaddr[0]
+        except socket.gaierror:
+            # 解析失败交给 urllib3 抛出标准异常
+            pass
+        t1 = time.perf_counter()
+        try:
+            sock = super()._new_conn()
+        finally:
+            self._dns_host = host
+        _record("dns", t1 - t0)
+        _record("tcp", time.perf_counter() - t1)
+        return sock
+
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        _record("connect", time.perf_counter() - t0)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    使用带耗时统计连接类的 HTTPAdapter。
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def build_session(pool_size: int = 10, max_retries: int = 0,
+                  backoff_factor: float = 0.5, headers: Optional[Dict] = None) -> requests.Session:
+    """
+    创建带连接池的 Session
+    参数说明：
+        pool_size: 每个主机保持的最大连接数（应不小于并发请求数）
+        max_retries: 连接错误及 429/5xx 的自动重试次数（指数退避）
+        backoff_factor: 退避因子
+        headers: 额外的默认请求头
+    返回：
+        requests.Session 对象
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = TimedHTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                               max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def timed_request(session: requests.Session, method: str, url: str,
+                  **kwargs) -> Tuple[requests.Response, Dict]:
+    """
+    发送请求并返回 (response, timings)
+    timings 字段（秒）：
+        dns: DNS 解析
+        tcp: TCP 握手
+        tls: TLS 握手
+        connect: 建立连接总耗时（dns+tcp+tls）
+        wait: 发送请求到收到响应头（不含建立连接）
+        transfer: 读取响应体
+        total: 总耗时
+        reused: 是否复用了已有连接
+        bytes: 响应体（解压前）字节数
+    """
+    record = {}
+    _timing.current = record
+    t0 = time.perf_counter()
+    try:
+        response = session.request(method, url, stream=True, **kwargs)
+        t_headers = time.perf_counter()
+        response.content  # 读取全部响应体，连接随即归还连接池
+        t_end = time.perf_counter()
+    finally:
+        _timing.current = None
+    connect = record.get("connect", 0.0)
+    dns = record.get("dns", 0.0)
+    tcp = record.get("tcp", 0.0)
+    timings = {
+        "dns": dns,
+        "tcp": tcp,
+        "tls": max(0.0, connect - dns - tcp),
+        "connect": connect,
+        "wait": max(0.0, t_headers - t0 - connect),
+        "transfer": t_end - t_headers,
+        "total": t_end - t0,
+        "reused": "connect" not in record,
+        "bytes": int(response.headers.get("Content-Length") or len(response.content)),
+    }
+    return response, timings
+
+
+class LatencyStats:
+    """
+    线程安全的请求耗时累计统计。
+    """
+
+    FIELDS = ("dns", "tcp", "tls", "connect", "wait", "transfer", "total")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.reused = 0
+            self.errors = 0
+            self.bytes = 0
+            self.sums = dict.fromkeys(self.FIELDS, 0.0)
+            self.max = dict.fromkeys(self.FIELDS, 0.0)
+            self.last = {}
+
+    def add(self, timings: Dict):
+        with self._lock:
+            self.count += 1
+            self.reused += 1 if timings.get("reused") else 0
+            self.bytes += timings.get("bytes", 0)
+            for field in self.FIELDS:
+                value = timings.get(field, 0.0)
+                self.sums[field] += value
+                if value > self.max[field]:
+                    self.max[field] = value
+            self.last = timings
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> Dict:
+        """返回平均/最大耗时（毫秒）及连接复用率"""
+        with self._lock:
+            n = self.count or 1
+            return {
+                "requests": self.count,
+                "errors": self.errors,
+                "reuse_ratio": round(self.reused / n, 3),
+                "bytes": self.bytes,
+                "avg_ms": {k: round(v / n * 1000, 2) for k, v in self.sums.items()},
+                "max_ms": {k: round(v * 1000, 2) for k, v in self.max.items()},
+            }
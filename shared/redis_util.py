@@ -6,7 +6,7 @@ Redis工具类模块。
 【模块职责】
 - 提供Redis连接、发布与订阅的统一接口
 - 支持主节点发布、从节点订阅消息
-- 支持频道管理、消息压缩（可选）
+- 支持频道管理、消息压缩（可选，编解码见 shared/codec.py）
 - 便于后续扩展为异步/高性能实现
 
 【与主/从程序集成点】
@@ -16,21 +16,159 @@ Redis工具类模块。
 【与FastAPI集成点】
 - 可作为依赖注入，供API路由实现消息发布/订阅等操作
 
+【连接池】
+- 每个进程按 (host, port, decode_responses) 复用同一个连接池，客户端对象创建代价很低
+- 连接池参数可通过环境变量配置：
+  REDIS_MAX_CONNECTIONS、REDIS_CONNECT_TIMEOUT、REDIS_SOCKET_TIMEOUT、REDIS_HEALTH_CHECK_INTERVAL、REDIS_RETRIES
+- 空闲连接在使用前做健康检查（PING），连接错误/超时时按指数退避自动重连重试
+- publish_many 使用 pipeline 一次往返发布多条消息
+- get_async_redis_client 返回 redis.asyncio 客户端（同样的超时/健康检查配置，连接池绑定当前事件循环）
+- xadd_many 使用 pipeline 将多条消息追加到 Stream（Streams 传输方式，消息字段为 STREAM_FIELD）
+
 依赖说明：
 - 需先安装 redis 库
 - 连接参数（host, port）请通过环境变量或配置文件传递，切勿硬编码敏感信息
 
 """
 
+import os
+import logging
+import threading
+
 import redis
+import redis.asyncio
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from redis.retry import Retry
+
+# Streams 传输方式下消息体所在的字段名
+STREAM_FIELD = "m"
+
+# 进程级连接池：{(host, port, decode_responses): ConnectionPool}
+_pools = {}
+_pools_lock = threading.Lock()
+
 
-def get_redis_client(host, port):
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def get_redis_pool(host, port, decode_responses=True):
     """
-    获取Redis客户端
+    获取（必要时创建）进程级Redis连接池
+    参数说明：
+        host: Redis地址
+        port: Redis端口
+        decode_responses: 是否将响应解码为 str（二进制消息需设为 False）
+    返回：
+        redis.ConnectionPool 对象
+    """
+    key = (host, int(port), decode_responses)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = redis.ConnectionPool(
+                host=host,
+                port=int(port),
+                decode_responses=decode_responses,
+                max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 50)),
+                socket_connect_timeout=_env_float("REDIS_CONNECT_TIMEOUT", 5.0),
+                # 订阅连接需长时间阻塞读取，默认不设读超时，由健康检查保证连接可用
+                socket_timeout=_env_float("REDIS_SOCKET_TIMEOUT", None),
+                socket_keepalive=True,
+                health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30)),
+                retry=Retry(ExponentialBackoff(cap=2.0, base=0.05), int(os.getenv("REDIS_RETRIES", 3))),
+                retry_on_error=[RedisConnectionError, RedisTimeoutError],
+            )
+            _pools[key] = pool
+            logging.info(f"Redis连接池初始化完成: {host}:{port}")
+    return pool
+
+
+def get_redis_client(host, port, decode_responses=True):
+    """
+    获取Redis客户端（共享进程级连接池）
     参数说明：
         host: Redis地址（如"127.0.0.1"或远程IP）
         port: Redis端口（默认6379）
+        decode_responses: 是否将响应解码为 str
     返回：
         redis.Redis 对象
     """
-    return redis.Redis(host=host, port=port, decode_responses=True)
\ No newline at end of file
+    return redis.Redis(connection_pool=get_redis_pool(host, port, decode_responses))
+
+
+def get_async_redis_client(host, port, decode_responses=True):
+    """
+    获取 redis.asyncio 客户端（需在事件循环中使用，由调用方负责 aclose）
+    参数说明：
+        host: Redis地址
+        port: Redis端口
+        decode_responses: 是否将响应解码为 str
+    返回：
+        redis.asyncio.Redis 对象
+    """
+    return redis.asyncio.Redis(
+        host=host,
+        port=int(port),
+        decode_responses=decode_responses,
+        socket_connect_timeout=_env_float("REDIS_CONNECT_TIMEOUT", 5.0),
+        socket_timeout=_env_float("REDIS_SOCKET_TIMEOUT", None),
+        socket_keepalive=True,
+        health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30)),
+    )
+
+
+def publish_many(client, channel, messages):
+    """
+    使用 pipeline 一次往返发布多条消息
+    参数说明：
+        client: redis.Redis 对象
+        channel: 频道名
+        messages: 消息列表（str 或 bytes）
+    返回：
+        每条消息的订阅者数量列表
+    """
+    if not messages:
+        return []
+    pipe = client.pipeline(transaction=False)
+    for message in messages:
+        pipe.publish(channel, message)
+    return pipe.execute()
+
+
+def xadd_many(client, stream, messages, maxlen=None):
+    """
+    使用 pipeline 将多条消息追加到 Stream
+    参数说明：
+        client: redis.Redis 对象
+        stream: Stream 键名
+        messages: 消息列表（str 或 bytes）
+        maxlen: Stream 保留的大致最大条数（MAXLEN ~），None 表示不裁剪
+    返回：
+        每条消息的 ID 列表
+    """
+    if not messages:
+        return []
+    pipe = client.pipeline(transaction=False)
+    for message in messages:
+        pipe.xadd(stream, {STREAM_FIELD: message}, maxlen=maxlen, approximate=True)
+    return pipe.execute()
+
+
+def pool_stats(host, port, decode_responses=True):
+    """返回连接池中已创建/空闲/使用中的连接数"""
+    pool = _pools.get((host, int(port), decode_responses))
+    if pool is None:
+        return {"initialized": False}
+    return {
+        "initialized": True,
+        "max_connections": pool.max_connections,
+        "created": getattr(pool, "_created_connections", None),
+        "idle": len(getattr(pool, "_available_connections", ())),
+        "in_use": len(getattr(pool, "_in_use_connections", ())),
+    }
\ No newline at end of file
@@ -0,0 +1,326 @@
+"""
+shared/snapshot_delta.py
+
+快照增量编码：主节点只发布与上一次快照相比发生变化的字段，从节点按序号还原完整快照。
+
+【消息类型】
+- keyframe: {"type": "keyframe", "epoch", "location", "seq", "snapshot"}，完整快照
+- delta:    {"type": "delta", "epoch", "location", "seq", "patch"}，相对于 seq - 1 的增量
+- 不带 type 字段的消息为旧格式完整快照，原样处理
+
+【增量格式（patch）】
+- "set":    顶层字段整体替换（值不是字典/按 dt 排列的列表时）
+- "fields": 字典数据段（如 current）的字段级增量 {"set": {...}, "del": [...]}
+- "lists":  按 dt 排列的列表数据段（minutely/hourly/daily）的增量
+            {"upsert": [仅含 dt 与变化字段的条目], "replace": [完整条目], "remove": [dt, ...]}
+- "del":    删除的顶层字段
+
+【序号规则】
+- epoch 为主节点进程启动时间（毫秒），序号只在同一 epoch 内有意义；主节点重启后序号从 1 重新开始
+- 每个地点的序号单调递增；按 FetchPlanner 只拉取部分数据段时，主节点先合并到上一次的完整快照再计算增量，
+  本轮请求了但响应中没有的数据段（如已结束的 alerts）从快照中删除
+- 每 keyframe_interval 条消息发送一次关键帧；从节点也可以按地点请求关键帧
+- 从节点收到同一 epoch 内 seq <= 当前序号的消息视为重复并忽略；出现序号缺口时丢弃该地点状态并请求关键帧
+- epoch 变化时，关键帧直接替换本地状态，增量按缺口处理（请求关键帧）
+- 从节点可导出/载入各地点的 (epoch, seq, 快照)，重启后从持久化的状态继续应用积压的增量
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+KEYFRAME = "keyframe"
+DELTA = "delta"
+
+_MISSING = object()
+
+
+def _is_keyed_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, dict) and "dt" in item for item in value)
+
+
+def _diff_dict(old: Dict, new: Dict) -> Dict:
+    changes = {}
+    changed = {k: v for k, v in new.items() if old.get(k, _MISSING) != v}
+    removed = [k for k in old if k not in new]
+    if changed:
+        changes["set"] = changed
+    if removed:
+        changes["del"] = removed
+    return changes
+
+
+def _diff_list(old: list, new: list) -> Dict:
+    old_by_dt = {item["dt"]: item for item in old}
+    new_dts = set()
+    upsert, replace = [], []
+    for item in new:
+        dt = item["dt"]
+        new_dts.add(dt)
+        previous = old_by_dt.get(dt)
+        if previous is None:
+            upsert.append(item)
+        elif previous != item:
+            if any(k not in item for k in previous):
+                replace.append(item)
+            else:
+                changed = {k: v for k, v in item.items() if previous.get(k, _MISSING) != v}
+                changed["dt"] = dt
+                upsert.append(changed)
+    changes = {}
+    removed = [dt for dt in old_by_dt if dt not in new_dts]
+    if upsert:
+        changes["upsert"] = upsert
+    if replace:
+        changes["replace"] = replace
+    if removed:
+        changes["remove"] = removed
+    return changes
+
+
+def diff_snapshot(old: Dict, new: Dict) -> Dict:
+    """计算从 old 到 new 的增量"""
+    patch = {}
+    for key, value in new.items():
+        previous = old.get(key, _MISSING)
+        if previous == value:
+            continue
+        if isinstance(value, dict) and isinstance(previous, dict):
+            patch.setdefault("fields", {})[key] = _diff_dict(previous, value)
+        elif _is_keyed_list(value) and _is_keyed_list(previous):
+            patch.setdefault("lists", {})[key] = _diff_list(previous, value)
+        else:
+            patch.setdefault("set", {})[key] = value
+    removed = [k for k in old if k not in new]
+    if removed:
+        patch["del"] = removed
+    return patch
+
+
+def apply_patch(base: Dict, patch: Dict) -> Dict:
+    """将增量应用到 base，返回新快照（不修改 base）"""
+    snapshot = dict(base)
+    for key, value in patch.get("set", {}).items():
+        snapshot[key] = value
+    for key, changes in patch.get("fields", {}).items():
+        section = dict(snapshot.get(key) or {})
+        section.update(changes.get("set", {}))
+        for field in changes.get("del", ()):
+            section.pop(field, None)
+        snapshot[key] = section
+    for key, changes in patch.get("lists", {}).items():
+        by_dt = {item["dt"]: item for item in snapshot.get(key) or ()}
+        for dt in changes.get("remove", ()):
+            by_dt.pop(dt, None)
+        for item in changes.get("upsert", ()):
+            by_dt[item["dt"]] = {**by_dt[item["dt"]], **item} if item["dt"] in by_dt else item
+        for item in changes.get("replace", ()):
+            by_dt[item["dt"]] = item
+        snapshot[key] = [by_dt[dt] for dt in sorted(by_dt)]
+    for key in patch.get("del", ()):
+        snapshot.pop(key, None)
+    return snapshot
+
+
+class DeltaEncoder:
+    """
+    主节点：记录每个地点最近一次完整快照和序号，生成增量或关键帧消息。
+    """
+
+    def __init__(self, keyframe_interval: int = 30, epoch: int = None):
+        """
+        参数：
+            keyframe_interval: 每隔多少条消息发送一次关键帧
+            epoch: 本进程的 epoch，默认取启动时间（毫秒）
+        """
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.epoch = int(time.time() * 1000) if epoch is None else epoch
+        self._lock = threading.Lock()
+        self._state = {}  # {location: [snapshot, seq, since_keyframe]}
+        self.keyframes_sent = 0
+        self.deltas_sent = 0
+
+    def encode(self, weather_data: Dict, sections: Iterable[str] = None) -> Dict:
+        """
+        合并新数据并生成消息
+        参数：
+            weather_data: 带 location 字段的快照（可能只包含部分数据段）
+            sections: 本轮请求的数据段；其中响应没有返回的数据段从快照中删除（None 表示不删除）
+        """
+        location = weather_data["location"]
+        with self._lock:
+            state = self._state.get(location)
+            if state is None:
+                merged, seq, since = dict(weather_data), 1, 0
+            else:
+                merged = dict(state[0])
+                merged.update(weather_data)
+                seq, since = state[1] + 1, state[2] + 1
+            for section in sections or ():
+                if section not in weather_data:
+                    merged.pop(section, None)
+            if state is None or since >= self.keyframe_interval:
+                since = 0
+                message = {"type": KEYFRAME, "epoch": self.epoch, "location": location, "seq": seq,
+                           "snapshot": merged}
+                self.keyframes_sent += 1
+            else:
+                message = {"type": DELTA, "epoch": self.epoch, "location": location, "seq": seq,
+                           "patch": diff_snapshot(state[0], merged)}
+                self.deltas_sent += 1
+            self._state[location] = [merged, seq, since]
+        return message
+
+    def snapshot(self, location: str) -> Optional[Dict]:
+        """返回某地点最近一次发布后的完整快照，地点未知时返回 None"""
+        with self._lock:
+            state = self._state.get(location)
+            return None if state is None else state[0]
+
+    def keyframe(self, location: str) -> Optional[Dict]:
+        """按当前序号生成关键帧（响应从节点请求），地点未知时返回 None"""
+        with self._lock:
+            state = self._state.get(location)
+            if state is None:
+                return None
+            state[2] = 0
+            self.keyframes_sent += 1
+            return {"type": KEYFRAME, "epoch": self.epoch, "location": location, "seq": state[1],
+                    "snapshot": state[0]}
+
+    def stats(self) -> Dict:
+        return {
+            "epoch": self.epoch,
+            "locations": len(self._state),
+            "keyframes_sent": self.keyframes_sent,
+            "deltas_sent": self.deltas_sent,
+        }
+
+
+class DeltaDecoder:
+    """
+    从节点：按序号应用增量，还原每个地点的完整快照。
+    """
+
+    def __init__(self, request_keyframe: Callable[[str], None] = None, request_interval: float = 5.0):
+        """
+        参数：
+            request_keyframe: 请求关键帧的回调，参数为地点名
+            request_interval: 同一地点两次关键帧请求的最小间隔（秒）
+        """
+        self.request_keyframe = request_keyframe
+        self.request_interval = request_interval
+        self._state = {}  # {location: (snapshot, seq, epoch)}
+        self._requested = {}  # {location: 上次请求的 monotonic 时间}
+        # 上次导出后状态有变化的地点；导出可能在其他线程进行
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self.applied = 0
+        self.keyframes = 0
+        self.gaps = 0
+        self.stale = 0
+        self.epoch_changes = 0
+
+    def apply(self, message: Dict) -> Optional[Dict]:
+        """
+        处理一条消息，返回还原后的完整快照；需要等待关键帧或消息重复时返回 None
+        """
+        kind = message.get("type")
+        if kind is None:
+            return message
+        location, seq, epoch = message["location"], message["seq"], message.get("epoch")
+        state = self._state.get(location)
+        if state is not None and state[2] != epoch:
+            # 主节点重启，旧序号不再有意义
+            logging.info(f"{location} 主节点 epoch 变化（{state[2]} -> {epoch}），重置本地状态")
+            self.epoch_changes += 1
+            self._store(location, None)
+            state = None
+        if kind == KEYFRAME:
+            if state is not None and seq < state[1]:
+                self.stale += 1
+                return None
+            snapshot = message["snapshot"]
+            self._store(location, (snapshot, seq, epoch))
+            self._requested.pop(location, None)
+            self.keyframes += 1
+            return snapshot
+        if kind != DELTA:
+            raise ValueError(f"未知的消息类型: {kind}")
+        if state is not None and seq <= state[1]:
+            self.stale += 1
+            return None
+        if state is None or seq != state[1] + 1:
+            self._on_gap(location, None if state is None else state[1], seq)
+            return None
+        snapshot = apply_patch(state[0], message["patch"])
+        self._store(location, (snapshot, seq, epoch))
+        self.applied += 1
+        return snapshot
+
+    def _store(self, location: str, state: Optional[Tuple]):
+        with self._lock:
+            if state is None:
+                self._state.pop(location, None)
+            else:
+                self._state[location] = state
+            self._dirty.add(location)
+
+    def _on_gap(self, location: str, last_seq: Optional[int], seq: int):
+        self.gaps += 1
+        self._store(location, None)
+        now = time.monotonic()
+        last = self._requested.get(location)
+        if last is not None and now - last < self.request_interval:
+            return
+        self._requested[location] = now
+        logging.warning(f"{location} 序号缺口（本地 {last_seq}，收到 {seq}），请求关键帧")
+        if self.request_keyframe is not None:
+            try:
+                self.request_keyframe(location)
+            except Exception as e:
+                logging.error(f"请求关键帧失败: {e}")
+
+    def snapshot(self, location: str) -> Optional[Dict]:
+        state = self._state.get(location)
+        return state[0] if state else None
+
+    def export_state(self, dirty_only: bool = True) -> List[Tuple[str, Optional[int], Optional[int], Optional[Dict]]]:
+        """
+        导出各地点状态用于持久化
+        参数：
+            dirty_only: 只导出上次导出后有变化的地点
+        返回：
+            [(地点, epoch, seq, 快照)]，状态已丢弃（等待关键帧）的地点 seq 与快照为 None
+        """
+        with self._lock:
+            locations = self._dirty if dirty_only else set(self._state) | self._dirty
+            self._dirty = set()
+            exported = []
+            for location in locations:
+                state = self._state.get(location)
+                if state is None:
+                    exported.append((location, None, None, None))
+                else:
+                    exported.append((location, state[2], state[1], state[0]))
+            return exported
+
+    def load_state(self, states: Iterable[Tuple[str, Optional[int], int, Dict]]) -> int:
+        """载入持久化的 [(地点, epoch, seq, 快照)]（启动时、开始消费之前调用），返回载入的地点数"""
+        count = 0
+        with self._lock:
+            for location, epoch, seq, snapshot in states:
+                self._state[location] = (snapshot, seq, epoch)
+                count += 1
+        return count
+
+    def stats(self) -> Dict:
+        return {
+            "locations": len(self._state),
+            "applied": self.applied,
+            "keyframes": self.keyframes,
+            "gaps": self.gaps,
+            "stale": self.stale,
+            "epoch_changes": self.epoch_changes,
+        }
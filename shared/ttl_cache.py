@@ -0,0 +1,153 @@
+"""
+shared/ttl_cache.py
+
+线程安全的 TTL + LRU 缓存，支持请求合并（single-flight）。
+
+【模块职责】
+- 条目在 ttl 秒后过期，超过 maxsize 时淘汰最久未使用的条目
+- get_or_load：同一 key 的并发未命中只触发一次加载，其余调用方等待并共享结果
+- 统计命中、未命中、合并、淘汰次数，便于观察缓存效果
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class _Flight:
+    """一次正在进行的加载"""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    TTL + LRU 缓存。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        """
+        参数：
+            maxsize: 最大条目数
+            ttl: 默认过期时间（秒）
+            clock: 时钟函数，便于测试替换
+        """
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        """在持锁状态下查找未过期条目"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key, value, ttl):
+        """在持锁状态下写入条目并按 LRU 淘汰"""
+        self._data[key] = (value, self._clock() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，未命中返回 default"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """写入缓存，ttl 为 None 时使用默认过期时间"""
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        读取缓存，未命中时调用 loader 加载并写入缓存。
+        同一 key 的并发未命中只有第一个调用方执行 loader，其余等待其结果；
+        loader 抛出的异常会传递给所有等待者，且不会写入缓存。
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._store(key, flight.value, ttl)
+            return flight.value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        """返回缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            }
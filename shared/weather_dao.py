@@ -2,9 +2,32 @@
 shared/weather_dao.py
 
 定义数据库访问对象 (DAO)，用于处理天气数据的 CRUD 操作。
+
+【事务】
+- 每个 DAO 的 insert 单独获取连接并提交一次事务
+- WeatherUnitOfWork 在同一个连接、同一个事务中写入一次 one-call 快照的全部数据段，
+  全部成功才提交，任一数据段失败整体回滚
+
+【幂等写入】
+- 各表以 (location, dt)（警报为 (location, event, start)）为唯一键，使用
+  INSERT ... ON DUPLICATE KEY UPDATE 写入，重复采集不会产生重复行
+- 每个 DAO 在内存中记录各地点最近一次提交的行内容哈希，内容未变化的行直接跳过，
+  不发送到 MySQL；哈希只在事务提交成功后更新
+- 一个事务写入同一地点的多个快照时，每个快照与批内前一个快照比对（而不是已提交的哈希），
+  数值在批内变化后又回到原值时最后一行仍会写入
+
+【批量写入】
+- bulk_upsert 将多行拼接为 INSERT ... VALUES (...),(...) 多行语句，
+  按服务器 max_allowed_packet（及 BULK_MAX_STATEMENT_BYTES）切分
+- 写回队列的批量写入和 bulk_load 回填都走这一路径，每张表每批只发送少量语句
+- to_row 使用预先构建的 itemgetter 提取字段，减少逐个字典查找的开销
+- 性能对比见 benchmarks/bench_dao_bulk.py
 """
 
+import os
 import logging
+import threading
+from operator import itemgetter
 from dbutils.pooled_db import PooledDBError
 import pymysql
 from pymysql import MySQLError, OperationalError, ProgrammingError, InternalError
@@ -12,7 +35,16 @@ from pymysql import MySQLError, OperationalError, ProgrammingError, InternalErro
 class BaseWeatherDAO:
     """
     DAO 基类，封装数据库连接和通用操作。
+
+    子类声明 COLUMNS（表列，第一列为 location）、KEY_COLUMNS（唯一键）并实现 to_row。
     """
+    COLUMNS = ()
+    KEY_COLUMNS = ("location", "dt")
+    # 行内容变化时一并刷新的时间列
+    TOUCH_COLUMN = "recorded_at"
+    # 单条多行语句的最大字节数，实际取值不超过服务器 max_allowed_packet
+    MAX_STATEMENT_BYTES = int(os.getenv("BULK_MAX_STATEMENT_BYTES", 4 * 1024 * 1024))
+
     def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, table_name):
         self.MYSQL_HOST = MYSQL_HOST
         self.MYSQL_PORT = MYSQL_PORT
@@ -20,6 +52,73 @@ class BaseWeatherDAO:
         self.MYSQL_PASSWORD = MYSQL_PASSWORD
         self.MYSQL_DB = MYSQL_DB
         self.table_name = table_name
+        # {location: {唯一键: 行哈希}}，只保存最近一次提交的数据
+        self._row_hashes = {}
+        self._hash_lock = threading.Lock()
+        self.rows_written = 0
+        self.rows_skipped = 0
+        if self.COLUMNS:
+            self._key_index = tuple(self.COLUMNS.index(c) for c in self.KEY_COLUMNS)
+            self.upsert_sql = self._build_upsert_sql()
+            self._bulk_prefix, self._bulk_suffix = self.upsert_sql.split(
+                "VALUES (" + ", ".join(["%s"] * len(self.COLUMNS)) + ")")
+            self._bulk_prefix += "VALUES "
+        self._packet_limit = None
+
+    def _build_upsert_sql(self):
+        """根据 COLUMNS / KEY_COLUMNS 生成 INSERT ... ON DUPLICATE KEY UPDATE 语句"""
+        columns = ", ".join(self.COLUMNS)
+        placeholders = ", ".join(["%s"] * len(self.COLUMNS))
+        updates = [f"{c} = VALUES({c})" for c in self.COLUMNS if c not in self.KEY_COLUMNS]
+        if self.TOUCH_COLUMN:
+            updates.append(f"{self.TOUCH_COLUMN} = CURRENT_TIMESTAMP")
+        return (
+            f"INSERT INTO {self.table_name} ({columns}) VALUES ({placeholders}) "
+            f"ON DUPLICATE KEY UPDATE {', '.join(updates)}"
+        )
+
+    def _statement_limit(self, cursor):
+        """单条语句的字节上限：服务器 max_allowed_packet 留出余量，且不超过 MAX_STATEMENT_BYTES"""
+        if self._packet_limit is None:
+            try:
+                cursor.execute("SELECT @@max_allowed_packet")
+                packet = int(cursor.fetchone()[0])
+            except Exception as e:
+                logging.warning(f"读取 max_allowed_packet 失败，使用默认值: {e}")
+                packet = 4 * 1024 * 1024
+            self._packet_limit = max(64 * 1024, min(packet - 1024, self.MAX_STATEMENT_BYTES))
+        return self._packet_limit
+
+    def bulk_upsert(self, cursor, rows):
+        """
+        以多行 INSERT ... VALUES (...),(...) ON DUPLICATE KEY UPDATE 语句写入，不提交事务。
+        参数：
+            cursor: 数据库游标
+            rows: 与 COLUMNS 对应的参数元组列表
+        返回：
+            执行的语句数
+        """
+        if not rows:
+            return 0
+        limit = self._statement_limit(cursor)
+        escape = cursor.connection.escape
+        prefix, suffix = self._bulk_prefix, self._bulk_suffix
+        base_size = len(prefix.encode("utf8")) + len(suffix.encode("utf8"))
+        statements = 0
+        values = []
+        size = base_size
+        for row in rows:
+            literal = escape(row)
+            literal_size = len(literal) if literal.isascii() else len(literal.encode("utf8"))
+            if values and size + literal_size + 1 > limit:
+                cursor.execute(prefix + ",".join(values) + suffix)
+                statements += 1
+                values = []
+                size = base_size
+            values.append(literal)
+            size += literal_size + 1
+        cursor.execute(prefix + ",".join(values) + suffix)
+        return statements + 1
 
     def get_connection(self):
         """
@@ -32,340 +131,343 @@ class BaseWeatherDAO:
             db=self.MYSQL_DB
         )
 
-    def _log_db_error(self, e, operation):
-        """记录详细的数据库错误日志"""
-        error_details = {
-            'operation': operation,
-            'error_type': type(e).__name__,
-            'error_code': getattr(e, 'args', (None,))[0],
-            'error_msg': str(e),
-            'table': self.table_name
-        }
-        logging.error(f"数据库操作失败: {error_details}", exc_info=True)
+    def items(self, data):
+        """将一个数据段转换为逐行数据列表，默认数据段本身就是列表"""
+        return data
 
-class CurrentWeatherDAO(BaseWeatherDAO):
-    """
-    `current_weather` 表的 DAO。
-    """
-    def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB):
-        super().__init__(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, "current_weather")
+    def to_row(self, location, item):
+        """
+        将一行数据转换为与 COLUMNS 对应的参数元组。由子类实现。
+        """
+        raise NotImplementedError
+
+    def changed_rows(self, data, location="", after_commit=None, overlay=None):
+        """
+        将数据段转换为行，返回内容有变化的行；提交后需更新的行哈希登记到 after_commit。
+        参数：
+            data: 数据段内容
+            location: 地点名称
+            after_commit: 提交成功后需要执行的回调列表，为 None 时立即更新行哈希
+            overlay: 同一事务内的行哈希 {location: {唯一键: 行哈希}}；同一地点已有排队的行时
+                以它为比对基准并随之更新，避免同一批中后来的快照与已提交的旧哈希比对
+        """
+        to_row = self.to_row
+        rows = [to_row(location, item) for item in self.items(data)]
+        key_index = self._key_index
+        hashes = {}
+        changed = []
+        with self._hash_lock:
+            known = self._row_hashes.get(location, {})
+        if overlay is not None:
+            known = overlay.get(location, known)
+            overlay[location] = hashes
+        for row in rows:
+            key = tuple(row[i] for i in key_index)
+            row_hash = hash(row)
+            hashes[key] = row_hash
+            if known.get(key) != row_hash:
+                changed.append(row)
+
+        def remember():
+            with self._hash_lock:
+                self._row_hashes[location] = hashes
+            self.rows_written += len(changed)
+            self.rows_skipped += len(rows) - len(changed)
+
+        if after_commit is None:
+            remember()
+        else:
+            after_commit.append(remember)
+        return changed
+
+    def write(self, cursor, data, location="", after_commit=None):
+        """
+        使用给定游标写入数据，不提交事务；内容未变化的行跳过。
+        参数：
+            cursor: 数据库游标
+            data: 数据段内容
+            location: 地点名称
+            after_commit: 提交成功后需要执行的回调列表，为 None 时立即更新行哈希
+        返回：
+            实际发送到数据库的行数
+        """
+        changed = self.changed_rows(data, location, after_commit)
+        if changed:
+            cursor.executemany(self.upsert_sql, changed)
+        return len(changed)
+
+    def bulk_load(self, data, location=""):
+        """
+        回填用：在独立事务中以多行语句写入，不做内容比对，也不更新行哈希。
+        参数：
+            data: 数据段内容（或已转换好的行元组列表，此时 location 被忽略）
+            location: 地点名称
+        返回：
+            写入的行数
+        """
+        rows = [item if isinstance(item, tuple) else self.to_row(location, item)
+                for item in self.items(data)]
+        self._in_transaction(
+            f"bulk_load_{self.table_name}",
+            lambda cursor, after_commit: self.bulk_upsert(cursor, rows),
+        )
+        logging.info(f"{self.table_name} 批量写入 {len(rows)} 行")
+        return len(rows)
+
+    def insert(self, data, location=""):
+        """
+        在独立事务中写入数据。
+        """
+        written = self._in_transaction(
+            f"insert_{self.table_name}",
+            lambda cursor, after_commit: self.write(cursor, data, location, after_commit),
+        )
+        logging.info(f"{self.table_name} 数据已写入MySQL: {written} 行")
+        return True
+
+    def forget(self, location=None):
+        """清除行哈希缓存（如怀疑数据库与缓存不一致时）"""
+        with self._hash_lock:
+            if location is None:
+                self._row_hashes.clear()
+            else:
+                self._row_hashes.pop(location, None)
 
-    def insert(self, weather_data):
+    def _in_transaction(self, operation, work):
         """
-        插入当前天气数据。
+        获取连接，在同一事务中执行 work(cursor, after_commit) 并提交；
+        提交成功后依次执行 after_commit 中的回调；失败时回滚并转换异常类型。
         """
         conn = None
+        after_commit = []
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
-                sql = """
-                INSERT INTO current_weather (dt, sunrise, sunset, temp, feels_like, pressure, humidity, dew_point, uvi, clouds, visibility, wind_speed, wind_deg, wind_gust, weather_id, weather_main, weather_description, weather_icon)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                params = (
-                    weather_data["dt"],
-                    weather_data["sunrise"],
-                    weather_data["sunset"],
-                    weather_data["temp"],
-                    weather_data["feels_like"],
-                    weather_data["pressure"],
-                    weather_data["humidity"],
-                    weather_data["dew_point"],
-                    weather_data["uvi"],
-                    weather_data["clouds"],
-                    weather_data["visibility"],
-                    weather_data["wind_speed"],
-                    weather_data["wind_deg"],
-                    weather_data["wind_gust"],
-                    weather_data["weather"][0]["id"],
-                    weather_data["weather"][0]["main"],
-                    weather_data["weather"][0]["description"],
-                    weather_data["weather"][0]["icon"],
-                )
-                cursor.execute(sql, params)
+                result = work(cursor, after_commit)
             conn.commit()
-            logging.info("当前天气数据已写入MySQL")
-            return True
-            
+            for callback in after_commit:
+                callback()
+            return result
+
         except OperationalError as e:
-            self._log_db_error(e, "insert_current_weather")
+            self._log_db_error(e, operation)
             if conn:
                 conn.rollback()
             raise ConnectionError("数据库连接错误，请检查网络或数据库状态") from e
         except ProgrammingError as e:
-            self._log_db_error(e, "insert_current_weather")
+            self._log_db_error(e, operation)
             if conn:
                 conn.rollback()
             raise ValueError("SQL语句或参数错误") from e
         except InternalError as e:
-            self._log_db_error(e, "insert_current_weather")
+            self._log_db_error(e, operation)
             if conn:
                 conn.rollback()
             raise RuntimeError("数据库内部错误") from e
         except PooledDBError as e:
-            self._log_db_error(e, "insert_current_weather")
+            self._log_db_error(e, operation)
             raise ConnectionError("连接池资源耗尽") from e
         except MySQLError as e:
-            self._log_db_error(e, "insert_current_weather")
+            self._log_db_error(e, operation)
             if conn:
                 conn.rollback()
             raise RuntimeError("数据库操作失败") from e
+        except Exception:
+            if conn:
+                conn.rollback()
+            raise
         finally:
             if conn:
                 conn.close()
 
+    def _log_db_error(self, e, operation):
+        """记录详细的数据库错误日志"""
+        error_details = {
+            'operation': operation,
+            'error_type': type(e).__name__,
+            'error_code': getattr(e, 'args', (None,))[0],
+            'error_msg': str(e),
+            'table': self.table_name
+        }
+        logging.error(f"数据库操作失败: {error_details}", exc_info=True)
+
+class CurrentWeatherDAO(BaseWeatherDAO):
+    """
+    `current_weather` 表的 DAO。
+    """
+    COLUMNS = (
+        "location", "dt", "sunrise", "sunset", "temp", "feels_like", "pressure", "humidity",
+        "dew_point", "uvi", "clouds", "visibility", "wind_speed", "wind_deg", "wind_gust",
+        "weather_id", "weather_main", "weather_description", "weather_icon",
+    )
+    TOUCH_COLUMN = None
+
+    def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB):
+        super().__init__(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, "current_weather")
+
+    _fields = itemgetter(
+        "dt", "sunrise", "sunset", "temp", "feels_like", "pressure", "humidity", "dew_point",
+        "uvi", "clouds", "visibility", "wind_speed", "wind_deg", "wind_gust",
+    )
+    _weather = itemgetter("id", "main", "description", "icon")
+
+    def items(self, weather_data):
+        return [weather_data] if isinstance(weather_data, dict) else weather_data
+
+    def to_row(self, location, weather_data):
+        return (location,) + self._fields(weather_data) + self._weather(weather_data["weather"][0])
+
 class MinutelyForecastDAO(BaseWeatherDAO):
     """
     `minutely_forecast` 表的 DAO。
     """
+    COLUMNS = ("location", "dt", "precipitation")
+
     def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB):
         super().__init__(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, "minutely_forecast")
 
-    def insert(self, forecast_data):
-        """
-        插入分钟级天气数据。
-        """
-        conn = None
-        try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                sql = """
-                INSERT INTO minutely_forecast (dt, precipitation)
-                VALUES (%s, %s)
-                """
-                params = [(minute["dt"], minute["precipitation"]) for minute in forecast_data]
-                cursor.executemany(sql, params)
-            conn.commit()
-            logging.info("分钟级天气数据已写入MySQL")
-            return True
-            
-        except OperationalError as e:
-            self._log_db_error(e, "insert_minutely_forecast")
-            if conn:
-                conn.rollback()
-            raise ConnectionError("数据库连接错误，请检查网络或数据库状态") from e
-        except ProgrammingError as e:
-            self._log_db_error(e, "insert_minutely_forecast")
-            if conn:
-                conn.rollback()
-            raise ValueError("SQL语句或参数错误") from e
-        except InternalError as e:
-            self._log_db_error(e, "insert_minutely_forecast")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库内部错误") from e
-        except PooledDBError as e:
-            self._log_db_error(e, "insert_minutely_forecast")
-            raise ConnectionError("连接池资源耗尽") from e
-        except MySQLError as e:
-            self._log_db_error(e, "insert_minutely_forecast")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库操作失败") from e
-        finally:
-            if conn:
-                conn.close()
+    _fields = itemgetter("dt", "precipitation")
+
+    def to_row(self, location, minute):
+        return (location,) + self._fields(minute)
 
 class HourlyForecastDAO(BaseWeatherDAO):
     """
     `hourly_forecast` 表的 DAO。
     """
+    COLUMNS = (
+        "location", "dt", "temperature", "feels_like", "pressure", "humidity",
+        "wind_speed", "wind_deg", "clouds", "pop", "weather",
+    )
+
     def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB):
         super().__init__(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, "hourly_forecast")
 
-    def insert(self, forecast_data):
-        """
-        插入小时级天气数据。
-        """
-        conn = None
-        try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                sql = """
-                INSERT INTO hourly_forecast (dt, temperature, feels_like, pressure, humidity, wind_speed, wind_deg, clouds, pop, weather)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                params = [(
-                    hour["dt"],
-                    hour["temp"],
-                    hour["feels_like"],
-                    hour["pressure"],
-                    hour["humidity"],
-                    hour["wind_speed"],
-                    hour["wind_deg"],
-                    hour["clouds"],
-                    hour["pop"],
-                    hour["weather"][0]["main"] if hour["weather"] else None,
-                ) for hour in forecast_data]
-                cursor.executemany(sql, params)
-            conn.commit()
-            logging.info("小时级天气数据已写入MySQL")
-            return True
-            
-        except OperationalError as e:
-            self._log_db_error(e, "insert_hourly_forecast")
-            if conn:
-                conn.rollback()
-            raise ConnectionError("数据库连接错误，请检查网络或数据库状态") from e
-        except ProgrammingError as e:
-            self._log_db_error(e, "insert_hourly_forecast")
-            if conn:
-                conn.rollback()
-            raise ValueError("SQL语句或参数错误") from e
-        except InternalError as e:
-            self._log_db_error(e, "insert_hourly_forecast")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库内部错误") from e
-        except PooledDBError as e:
-            self._log_db_error(e, "insert_hourly_forecast")
-            raise ConnectionError("连接池资源耗尽") from e
-        except MySQLError as e:
-            self._log_db_error(e, "insert_hourly_forecast")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库操作失败") from e
-        finally:
-            if conn:
-                conn.close()
+    _fields = itemgetter(
+        "dt", "temp", "feels_like", "pressure", "humidity", "wind_speed", "wind_deg", "clouds", "pop",
+    )
+
+    def to_row(self, location, hour):
+        weather = hour["weather"]
+        return (location,) + self._fields(hour) + (weather[0]["main"] if weather else None,)
 
 class DailyForecastDAO(BaseWeatherDAO):
     """
     `daily_forecast` 表的 DAO。
     """
+    COLUMNS = (
+        "location", "dt", "sunrise", "sunset", "moonrise", "moonset", "moon_phase", "summary",
+        "temp_day", "temp_min", "temp_max", "temp_night", "temp_eve", "temp_morn",
+        "feels_like_day", "feels_like_night", "feels_like_eve", "feels_like_morn",
+        "pressure", "humidity", "wind_speed", "wind_deg", "clouds", "pop", "rain", "uvi", "weather",
+    )
+
     def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB):
         super().__init__(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, "daily_forecast")
 
-    def insert(self, forecast_data):
-        """
-        插入每日天气数据。
-        """
-        conn = None
-        try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                sql = """
-                INSERT INTO daily_forecast (dt, sunrise, sunset, moonrise, moonset, moon_phase, summary, temp_day, temp_min, temp_max, temp_night, temp_eve, temp_morn, feels_like_day, feels_like_night, feels_like_eve, feels_like_morn, pressure, humidity, wind_speed, wind_deg, clouds, pop, rain, uvi, weather)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                params = [(
-                    day["dt"],
-                    day["sunrise"],
-                    day["sunset"],
-                    day["moonrise"],
-                    day["moonset"],
-                    day["moon_phase"],
-                    day["summary"],
-                    day["temp"]["day"],
-                    day["temp"]["min"],
-                    day["temp"]["max"],
-                    day["temp"]["night"],
-                    day["temp"]["eve"],
-                    day["temp"]["morn"],
-                    day["feels_like"]["day"],
-                    day["feels_like"]["night"],
-                    day["feels_like"]["eve"],
-                    day["feels_like"]["morn"],
-                    day["pressure"],
-                    day["humidity"],
-                    day["wind_speed"],
-                    day["wind_deg"],
-                    day["clouds"],
-                    day["pop"],
-                    day.get("rain", 0),
-                    day["uvi"],
-                    day["weather"][0]["main"] if day["weather"] else None,
-                ) for day in forecast_data]
-                cursor.executemany(sql, params)
-            conn.commit()
-            logging.info("每日天气数据已写入MySQL")
-            return True
-            
-        except OperationalError as e:
-            self._log_db_error(e, "insert_daily_forecast")
-            if conn:
-                conn.rollback()
-            raise ConnectionError("数据库连接错误，请检查网络或数据库状态") from e
-        except ProgrammingError as e:
-            self._log_db_error(e, "insert_daily_forecast")
-            if conn:
-                conn.rollback()
-            raise ValueError("SQL语句或参数错误") from e
-        except InternalError as e:
-            self._log_db_error(e, "insert_daily_forecast")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库内部错误") from e
-        except PooledDBError as e:
-            self._log_db_error(e, "insert_daily_forecast")
-            raise ConnectionError("连接池资源耗尽") from e
-        except MySQLError as e:
-            self._log_db_error(e, "insert_daily_forecast")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库操作失败") from e
-        finally:
-            if conn:
-                conn.close()
+    _head = itemgetter("dt", "sunrise", "sunset", "moonrise", "moonset", "moon_phase", "summary")
+    _temp = itemgetter("day", "min", "max", "night", "eve", "morn")
+    _feels_like = itemgetter("day", "night", "eve", "morn")
+    _tail = itemgetter("pressure", "humidity", "wind_speed", "wind_deg", "clouds", "pop")
+
+    def to_row(self, location, day):
+        weather = day["weather"]
+        return (
+            (location,) + self._head(day) + self._temp(day["temp"]) + self._feels_like(day["feels_like"])
+            + self._tail(day) + (day.get("rain", 0), day["uvi"], weather[0]["main"] if weather else None)
+        )
 
 class WeatherAlertsDAO(BaseWeatherDAO):
     """
     `weather_alerts` 表的 DAO。
     """
+    COLUMNS = ("location", "sender_name", "event", "start", "end", "description", "tags")
+    KEY_COLUMNS = ("location", "event", "start")
+
     def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB):
         super().__init__(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, "weather_alerts")
 
-    def insert(self, alert_data):
+    _fields = itemgetter("sender_name", "event", "start", "end", "description")
+
+    def to_row(self, location, alert):
+        tags = alert["tags"]
+        return (location,) + self._fields(alert) + (",".join(tags) if tags else None,)
+
+class WeatherUnitOfWork(BaseWeatherDAO):
+    """
+    一次 one-call 快照的工作单元：一个连接、一个事务写入全部数据段。
+    """
+    def __init__(self, MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB):
+        super().__init__(MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB, "weather_snapshot")
+        args = (MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB)
+        # 数据段名 -> DAO，按此顺序写入
+        self.daos = {
+            "current": CurrentWeatherDAO(*args),
+            "minutely": MinutelyForecastDAO(*args),
+            "hourly": HourlyForecastDAO(*args),
+            "daily": DailyForecastDAO(*args),
+            "alerts": WeatherAlertsDAO(*args),
+        }
+
+    def write(self, cursor, weather_data, location=None, after_commit=None):
         """
-        插入天气警报数据。
+        使用同一个游标写入快照中存在的全部数据段，返回各数据段实际写入的行数。
+        location 为 None 时使用快照中的 location 字段。
         """
-        conn = None
-        try:
-            conn = self.get_connection()
-            with conn.cursor() as cursor:
-                sql = """
-                INSERT INTO weather_alerts (sender_name, event, start, end, description, tags)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """
-                params = [(
-                    alert["sender_name"],
-                    alert["event"],
-                    alert["start"],
-                    alert["end"],
-                    alert["description"],
-                    ",".join(alert["tags"]) if alert["tags"] else None,
-                ) for alert in alert_data]
-                cursor.executemany(sql, params)
-            conn.commit()
-            logging.info("天气警报数据已写入MySQL")
-            return True
-            
-        except OperationalError as e:
-            self._log_db_error(e, "insert_weather_alerts")
-            if conn:
-                conn.rollback()
-            raise ConnectionError("数据库连接错误，请检查网络或数据库状态") from e
-        except ProgrammingError as e:
-            self._log_db_error(e, "insert_weather_alerts")
-            if conn:
-                conn.rollback()
-            raise ValueError("SQL语句或参数错误") from e
-        except InternalError as e:
-            self._log_db_error(e, "insert_weather_alerts")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库内部错误") from e
-        except PooledDBError as e:
-            self._log_db_error(e, "insert_weather_alerts")
-            raise ConnectionError("连接池资源耗尽") from e
-        except MySQLError as e:
-            self._log_db_error(e, "insert_weather_alerts")
-            if conn:
-                conn.rollback()
-            raise RuntimeError("数据库操作失败") from e
-        finally:
-            if conn:
-                conn.close()
+        if location is None:
+            location = weather_data.get("location", "")
+        rows = {}
+        for section, dao in self.daos.items():
+            data = weather_data.get(section)
+            if data:
+                rows[section] = dao.write(cursor, data, location, after_commit)
+        return rows
+
+    def write_snapshot(self, weather_data):
+        """
+        在一个事务中写入一次 one-call 快照，全部成功才提交。
+        参数：
+            weather_data: one-call 响应（可只包含部分数据段），location 字段为地点名称
+        返回：
+            各数据段实际写入的行数（内容未变化的行不计入）
+        """
+        rows = self._in_transaction(
+            "write_snapshot",
+            lambda cursor, after_commit: self.write(cursor, weather_data, after_commit=after_commit),
+        )
+        logging.info(f"天气快照已写入MySQL: {rows}")
+        return rows
+
+    def write_snapshots(self, snapshots):
+        """
+        在一个事务中写入多个快照（写回队列的批量写入入口），全部成功才提交。
+        各快照中有变化的行按表汇总后以多行语句写入。同一地点的多个快照（回放或积压的多个周期）
+        依次与批内前一个快照比对，多行语句中同一唯一键的后一行覆盖前一行。
+        参数：
+            snapshots: 快照列表，每个快照的 location 字段为地点名称
+        """
+        def work(cursor, after_commit):
+            pending = {section: [] for section in self.daos}
+            overlays = {section: {} for section in self.daos}
+            for weather_data in snapshots:
+                location = weather_data.get("location", "")
+                for section, dao in self.daos.items():
+                    data = weather_data.get(section)
+                    if data:
+                        pending[section].extend(
+                            dao.changed_rows(data, location, after_commit, overlays[section]))
+            for section, rows in pending.items():
+                self.daos[section].bulk_upsert(cursor, rows)
+
+        self._in_transaction("write_snapshots", work)
+        logging.info(f"{len(snapshots)} 个天气快照已写入MySQL")
+
+    def stats(self):
+        """返回各表写入/跳过的行数"""
+        return {
+            dao.table_name: {"written": dao.rows_written, "skipped": dao.rows_skipped}
+            for dao in self.daos.values()
+        }
 
 def check_pool_status():
     """
@@ -0,0 +1,264 @@
+"""
+shared/write_behind.py
+
+异步写回（write-behind）队列：采集线程只负责入队，后台写入线程批量写入数据库。
+
+【模块职责】
+- 有界内存队列，写入线程按批次（batch_size 条或 flush_interval 秒）取出并调用 write_batch
+- 数据库不可用（ConnectionError）时，整批追加到本地 JSON Lines 溢出文件，不丢数据
+- 溢出文件中的数据比队列中的旧：有待回放的溢出数据时，新批次也追加到溢出文件之后，
+  回放成功前不直接写库，避免旧快照在回放时覆盖已写入的新数据
+- 溢出记录带入队时间，回放时按入队时间排序（队列已满时直接溢出的条目可能早于队列中更旧的条目落盘）
+- 单条数据本身有问题（非连接类错误）时逐条重试，无法写入的条目记录日志后丢弃，避免阻塞队列
+- 队列已满时新条目直接写入溢出文件，调用方永不阻塞
+- 提供队列深度、滞后时间、溢出/回放计数等指标
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Tuple
+
+
+class WriteBehindQueue:
+    """
+    带磁盘溢出的异步写回队列。
+    """
+
+    def __init__(self, write_batch: Callable[[List], None], spill_path: str,
+                 maxsize: int = 10000, batch_size: int = 50, flush_interval: float = 1.0,
+                 replay_interval: float = 30.0):
+        """
+        参数：
+            write_batch: 批量写入函数，参数为条目列表；数据库不可用时应抛出 ConnectionError
+            spill_path: 溢出文件路径（JSON Lines，条目需可 JSON 序列化）
+            maxsize: 内存队列最大条目数
+            batch_size: 每批最大条目数
+            flush_interval: 凑批的最长等待时间（秒）
+            replay_interval: 写入失败后重试回放溢出文件的间隔（秒）
+        """
+        self.write_batch = write_batch
+        self.spill_path = spill_path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.replay_interval = replay_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_failure = None
+        self._thread = None
+        self.submitted = 0
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_lag = 0.0
+        self.last_batch_size = 0
+        self.last_write_duration = 0.0
+
+    def start(self):
+        """启动写入线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, item):
+        """
+        提交一个条目，不阻塞；队列已满时直接写入溢出文件
+        """
+        self.submitted += 1
+        entry = (time.time(), item)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            logging.warning("写回队列已满，条目写入溢出文件")
+            self._spill([entry])
+
+    def _take_batch(self) -> List:
+        """取出一批条目，最多等待 flush_interval 秒"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._take_batch()
+            if batch:
+                self.last_lag = time.time() - batch[0][0]
+            if self._spill_pending():
+                # 溢出数据更旧，先回放；回放完成前新批次排在溢出数据之后
+                if batch:
+                    self._spill(batch)
+                if self._should_replay():
+                    self.replay()
+            elif batch:
+                self._write(batch)
+
+    def _write(self, entries: List[Tuple[float, object]]) -> bool:
+        """写入一批 (入队时间, 条目)；失败时溢出或逐条重试。返回是否全部写入"""
+        started = time.monotonic()
+        try:
+            self.write_batch([item for _, item in entries])
+        except ConnectionError as e:
+            logging.error(f"数据库不可用，{len(entries)} 条数据写入溢出文件: {e}")
+            self._on_failure(entries)
+            return False
+        except Exception as e:
+            logging.error(f"批量写入失败，逐条重试: {e}")
+            return self._write_one_by_one(entries)
+        self.written += len(entries)
+        self.last_batch_size = len(entries)
+        self.last_write_duration = time.monotonic() - started
+        return True
+
+    def _write_one_by_one(self, entries: List[Tuple[float, object]]) -> bool:
+        for i, entry in enumerate(entries):
+            try:
+                self.write_batch([entry[1]])
+                self.written += 1
+            except ConnectionError as e:
+                # 其余条目一并溢出，保持写入顺序
+                logging.error(f"数据库不可用，{len(entries) - i} 条数据写入溢出文件: {e}")
+                self._on_failure(entries[i:])
+                return False
+            except Exception as e:
+                self.dropped += 1
+                logging.error(f"条目无法写入，已丢弃: {e}")
+        return True
+
+    def _on_failure(self, entries: List[Tuple[float, object]]):
+        self.failures += 1
+        self._last_failure = time.monotonic()
+        self._spill(entries)
+
+    def _spill(self, entries: List[Tuple[float, object]]):
+        """追加 (入队时间, 条目) 到溢出文件，每行为 [入队时间, 条目]"""
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for queued_at, item in entries:
+                    f.write(json.dumps([queued_at, item], ensure_ascii=False))
+                    f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.spilled += len(entries)
+
+    def _spill_pending(self) -> bool:
+        return os.path.exists(self.spill_path) or os.path.exists(self.spill_path + ".replay")
+
+    def _should_replay(self) -> bool:
+        if not self._spill_pending():
+            return False
+        return self._last_failure is None or time.monotonic() - self._last_failure >= self.replay_interval
+
+    def replay(self) -> int:
+        """
+        回放溢出文件，按入队时间顺序写入，返回成功写入的条目数。回放失败的条目重新追加到溢出文件。
+        回放文件在处理完后才删除，进程中途退出时下次启动会重新回放（写入需幂等）。
+        """
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if os.path.exists(self.spill_path):
+                if os.path.exists(replay_path):
+                    # 上次回放未完成，新溢出的条目追加在其后
+                    with open(replay_path, "a", encoding="utf-8") as out, \
+                            open(self.spill_path, encoding="utf-8") as inp:
+                        out.write(inp.read())
+                    os.remove(self.spill_path)
+                else:
+                    os.replace(self.spill_path, replay_path)
+            elif not os.path.exists(replay_path):
+                return 0
+        with open(replay_path, encoding="utf-8") as f:
+            entries = []
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程崩溃时可能留下不完整的最后一行
+                    self.dropped += 1
+                    logging.error("溢出文件中存在无法解析的行，已跳过")
+                    continue
+                if isinstance(record, list) and len(record) == 2 and isinstance(record[0], (int, float)):
+                    entries.append((record[0], record[1]))
+                else:
+                    # 旧版溢出文件只有条目本身，视为最早入队
+                    entries.append((0.0, record))
+        entries.sort(key=lambda entry: entry[0])
+        replayed = 0
+        for i in range(0, len(entries), self.batch_size):
+            chunk = entries[i:i + self.batch_size]
+            failures_before = self.failures
+            if self._write(chunk):
+                replayed += len(chunk)
+            elif self.failures > failures_before:
+                # 数据库仍不可用，剩余条目放回溢出文件，等待下次回放
+                if entries[i + self.batch_size:]:
+                    self._spill(entries[i + self.batch_size:])
+                break
+        os.remove(replay_path)
+        self.replayed += replayed
+        if replayed:
+            logging.info(f"溢出文件回放完成: {replayed}/{len(entries)} 条")
+        return replayed
+
+    def close(self, timeout: float = 10.0):
+        """停止写入线程；超时未写完的条目写入溢出文件"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftovers:
+            self._spill(leftovers)
+
+    def _spill_records(self) -> int:
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return 0
+            with open(self.spill_path, encoding="utf-8") as f:
+                return sum(1 for _ in f)
+
+    def metrics(self) -> Dict:
+        """返回队列指标"""
+        try:
+            oldest = self._queue.queue[0][0]
+            lag = time.time() - oldest
+        except IndexError:
+            lag = 0.0
+        return {
+            "depth": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+            "lag_seconds": round(lag, 3),
+            "last_batch_lag_seconds": round(self.last_lag, 3),
+            "last_batch_size": self.last_batch_size,
+            "last_write_ms": round(self.last_write_duration * 1000, 2),
+            "submitted": self.submitted,
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "spill_pending": self._spill_records(),
+        }
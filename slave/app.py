@@ -6,19 +6,34 @@ slave/app.py
 环境依赖说明：
 - Redis地址、频道名等敏感信息请通过环境变量或配置文件设置，切勿硬编码在代码中。
 - 本地持久化采用SQLite，数据库文件名可通过环境变量指定。
+- 本地副本表与主节点 MySQL 表结构一致（见 slave/replica.py），读请求可由从节点承担。
+- 近期实况观测另存于内存环形缓冲区（见 slave/timeseries.py），启动时从本地副本表回填。
+- 订阅器（Pub/Sub 为 asyncio 任务，Streams 为后台线程）与 SQLite 写入线程由 FastAPI lifespan 启动和停止，
+  停止时先停订阅，再保存增量解码状态并写完缓冲中的数据。
+- 增量解码状态定期（SYNC_STATE_CHECKPOINT_SECONDS）保存到本地 sync_state 表，启动时在开始消费前载入，
+  重启后从 Stream 上次确认的位置继续应用增量。
 
 """
 
 import os
-import json
+import time
+import socket
+import asyncio
 import logging
-import sqlite3
-from threading import Thread
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 import uvicorn
 
+from shared.codec import decode_message
 from shared.redis_util import get_redis_client
-from slave.data_processor import process_weather_data  # 需在data_processor.py实现
+from shared.snapshot_delta import DeltaDecoder
+from slave.stream_consumer import StreamConsumer
+from slave.async_subscriber import AsyncSubscriber
+from slave.sqlite_writer import SQLiteWriter
+from slave.replica import ReplicaReader, WeatherReplica
+from slave.snapshot_cache import SnapshotCache, serialize
+from slave.timeseries import FIELDS as SERIES_FIELDS, TimeSeriesStore
+from slave.data_processor import process_weather_batch, process_weather_data
 
 # 日志配置
 logging.basicConfig(
@@ -26,83 +41,261 @@ logging.basicConfig(
     format="%(asctime)s %(levelname)s %(message)s"
 )
 
+@asynccontextmanager
+async def lifespan(app):
+    """启动写入线程与订阅器；关闭时停止订阅并写完缓冲数据"""
+    global stream_consumer
+    init_sqlite()
+    await asyncio.to_thread(restore_sync_state)
+    await asyncio.to_thread(timeseries.load_from_sqlite, SQLITE_DB)
+    checkpoint_task = asyncio.create_task(checkpoint_sync_state())
+    stream_task = None
+    if REDIS_TRANSPORT == "stream":
+        stream_consumer = create_stream_consumer()
+        logging.info(f"开始消费Redis Stream: {REDIS_CHANNEL}（消费组 {REDIS_STREAM_GROUP}）")
+        stream_task = asyncio.create_task(asyncio.to_thread(stream_consumer.run))
+    else:
+        subscriber.start()
+    try:
+        yield
+    finally:
+        if stream_task is not None:
+            stream_consumer.stop()
+            await asyncio.wait([stream_task], timeout=REDIS_STREAM_BLOCK_MS / 1000 + 5)
+        else:
+            await subscriber.stop()
+        checkpoint_task.cancel()
+        save_sync_state()
+        await asyncio.to_thread(sqlite_writer.close)
+        logging.info("从节点已停止，缓冲数据已写入")
+
 # FastAPI 健康检查API
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/api/health")
 def health_check():
     """健康检查API，返回服务状态"""
     return {"status": "ok"}
 
+@app.get("/api/sync")
+def sync_status():
+    """返回增量同步状态（已还原地点数、序号缺口次数等）及 Stream 消费进度"""
+    status = {"transport": REDIS_TRANSPORT, "delta": delta_decoder.stats()}
+    if stream_consumer is not None:
+        status["stream"] = stream_consumer.stats()
+    else:
+        status["subscriber"] = subscriber.stats()
+    return status
+
+@app.get("/api/storage")
+def storage_status():
+    """返回SQLite批量写入指标（批次大小、提交耗时、队列深度）及各副本表写入/跳过行数"""
+    return {"writer": sqlite_writer.metrics(), "tables": weather_replica.stats(),
+            "timeseries": timeseries.stats()}
+
+def cached_response(request: Request, body: bytes, etag: str) -> Response:
+    """返回预先序列化的响应体；If-None-Match 命中时返回 304"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/locations")
+async def list_locations():
+    """返回已同步的地点列表"""
+    return {"locations": snapshot_cache.locations()}
+
+@app.get("/api/weather/{location}/latest")
+async def latest_weather(location: str, request: Request):
+    """返回某地点的最新实况（current + alerts），直接由内存缓存提供"""
+    cached = snapshot_cache.latest(location)
+    if cached is None:
+        raise HTTPException(status_code=404, detail=f"未知地点: {location}")
+    return cached_response(request, *cached)
+
+@app.get("/api/weather/{location}/forecast")
+async def forecast_window(location: str, request: Request,
+                          section: str = Query("hourly", pattern="^(hourly|daily)$"),
+                          count: int = Query(24, ge=1, le=48)):
+    """返回某地点从当前时段起的前 count 条逐小时/逐日预报，由内存缓存提供"""
+    cached = snapshot_cache.window(location, section, count)
+    if cached is None:
+        raise HTTPException(status_code=404, detail=f"未知地点: {location}")
+    return cached_response(request, *cached)
+
+@app.get("/api/weather/{location}/series")
+async def weather_series(location: str, field: str = Query("temp", pattern="^(" + "|".join(SERIES_FIELDS) + ")$"),
+                         hours: float = Query(24, gt=0, le=168)):
+    """返回某地点最近 hours 小时内某观测字段的时间序列，由内存环形缓冲区提供"""
+    result = timeseries.series(location, field, start=int(time.time() - hours * 3600))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"未知地点: {location}")
+    return {"location": location, **result}
+
+@app.get("/api/weather/{location}/stats")
+async def weather_stats(location: str, start: int = None, end: int = None,
+                        hours: float = Query(24, gt=0, le=168)):
+    """返回某地点时间范围内各观测字段的 min/max/mean（默认最近 hours 小时），由内存环形缓冲区提供"""
+    if start is None:
+        start = int(time.time() - hours * 3600)
+    result = timeseries.aggregate(location, start, end)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"未知地点: {location}")
+    return {"location": location, "latest": timeseries.latest(location), **result}
+
+@app.get("/api/weather/{location}/history")
+def weather_history(location: str, request: Request,
+                    section: str = Query("hourly", pattern="^(current|minutely|hourly|daily|alerts)$"),
+                    start: int = None, end: int = None, limit: int = Query(1000, ge=1, le=10000)):
+    """按时间范围（Unix 时间戳，闭区间）查询本地副本表中的历史数据"""
+    rows = replica_reader.history(section, location, start, end, limit)
+    return cached_response(request, *serialize({"location": location, "section": section, "rows": rows}))
+
 # 配置读取
 REDIS_HOST = os.getenv("REDIS_HOST", "127.0.0.1")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_CHANNEL = os.getenv("REDIS_CHANNEL", "weather:updates")
 SQLITE_DB = os.getenv("SQLITE_DB", "weather_slave.db")
+SQLITE_BATCH_SIZE = int(os.getenv("SQLITE_BATCH_SIZE", 500))
+SQLITE_FLUSH_INTERVAL_MS = int(os.getenv("SQLITE_FLUSH_INTERVAL_MS", 200))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# 传输方式：pubsub（默认）或 stream（Redis Streams 消费组，重启后从上次位置追赶）
+REDIS_TRANSPORT = os.getenv("REDIS_TRANSPORT", "pubsub")
+REDIS_STREAM_GROUP = os.getenv("REDIS_STREAM_GROUP") or f"slave-{socket.gethostname()}"
+REDIS_STREAM_CONSUMER = os.getenv("REDIS_STREAM_CONSUMER") or socket.gethostname()
+REDIS_STREAM_COUNT = int(os.getenv("REDIS_STREAM_COUNT", 100))
+REDIS_STREAM_BLOCK_MS = int(os.getenv("REDIS_STREAM_BLOCK_MS", 5000))
+REDIS_STREAM_CLAIM_IDLE_MS = int(os.getenv("REDIS_STREAM_CLAIM_IDLE_MS", 60000))
+REDIS_STREAM_START_ID = os.getenv("REDIS_STREAM_START_ID", "$")
+KEYFRAME_REQUEST_CHANNEL = os.getenv("KEYFRAME_REQUEST_CHANNEL", f"{REDIS_CHANNEL}:keyframe")
+SUBSCRIBE_BATCH_SIZE = int(os.getenv("SUBSCRIBE_BATCH_SIZE", 100))
+SUBSCRIBE_BATCH_TIMEOUT_MS = int(os.getenv("SUBSCRIBE_BATCH_TIMEOUT_MS", 50))
+TIMESERIES_CAPACITY = int(os.getenv("TIMESERIES_CAPACITY", 2880))
+SYNC_STATE_CHECKPOINT_SECONDS = float(os.getenv("SYNC_STATE_CHECKPOINT_SECONDS", 30))
+
+
+def request_keyframe(location):
+    """序号出现缺口时，请求主节点重新发布该地点的关键帧"""
+    get_redis_client(REDIS_HOST, REDIS_PORT).publish(KEYFRAME_REQUEST_CHANNEL, location)
+
+
+# 按序号还原增量消息为完整快照
+delta_decoder = DeltaDecoder(request_keyframe)
+
+stream_consumer = None
+
+# 本地副本表：与主节点 MySQL 表结构一致，以 (location, dt) 为唯一键 upsert
+weather_replica = WeatherReplica()
+
+# 批量写入器：单个长连接（WAL），按行数或时间间隔批量提交
+sqlite_writer = SQLiteWriter(
+    SQLITE_DB,
+    schema=weather_replica.schema(),
+    batch_size=SQLITE_BATCH_SIZE,
+    flush_interval_ms=SQLITE_FLUSH_INTERVAL_MS,
+    synchronous=SQLITE_SYNCHRONOUS,
+)
+weather_replica.writer = sqlite_writer
+
+# 读接口：最新快照由内存缓存提供，历史数据查询本地副本表
+snapshot_cache = SnapshotCache()
+replica_reader = ReplicaReader(SQLITE_DB, weather_replica)
+# 近期实况观测：每个地点固定容量的环形缓冲区
+timeseries = TimeSeriesStore(TIMESERIES_CAPACITY)
 
 def init_sqlite():
-    """初始化本地SQLite数据库，创建表结构"""
-    conn = sqlite3.connect(SQLITE_DB)
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS weather_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        city TEXT NOT NULL,
-        lat REAL,
-        lon REAL,
-        temperature REAL,
-        humidity INTEGER,
-        weather TEXT,
-        recorded_at TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
+    """初始化本地SQLite数据库（建表）并启动批量写入线程"""
+    sqlite_writer.start()
+
+def restore_sync_state():
+    """载入上次保存的增量解码状态，并用其中的快照预热最新实况缓存"""
+    states = weather_replica.load_sync_state(SQLITE_DB)
+    delta_decoder.load_state(states)
+    for location, _, _, snapshot in states:
+        try:
+            snapshot_cache.update(process_weather_data(snapshot))
+        except ValueError as e:
+            logging.warning(f"{location} 保存的快照校验失败，不预热缓存: {e}")
+    if states:
+        logging.info(f"已载入 {len(states)} 个地点的增量解码状态")
+
+def save_sync_state():
+    """将上次保存后有变化的增量解码状态提交给批量写入器"""
+    try:
+        weather_replica.save_sync_state(delta_decoder.export_state())
+    except Exception as e:
+        logging.error(f"保存增量解码状态失败: {e}")
+
+async def checkpoint_sync_state():
+    """定期保存增量解码状态；进程异常退出时，重启后从最近一次保存的状态继续，之后的缺口按关键帧恢复"""
+    while True:
+        await asyncio.sleep(SYNC_STATE_CHECKPOINT_SECONDS)
+        await asyncio.to_thread(save_sync_state)
 
 def save_to_sqlite(weather_data):
-    """将天气数据写入本地SQLite数据库"""
+    """将快照中有变化的行提交给批量写入器，异步 upsert 到本地副本表"""
     try:
-        conn = sqlite3.connect(SQLITE_DB)
-        cursor = conn.cursor()
-        cursor.execute("""
-        INSERT INTO weather_data (city, lat, lon, temperature, humidity, weather, recorded_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            weather_data["city"],
-            weather_data["lat"],
-            weather_data["lon"],
-            weather_data["temp"],
-            weather_data["humidity"],
-            weather_data["weather"],
-            weather_data["timestamp"]
-        ))
-        conn.commit()
-        conn.close()
-        logging.info("数据已本地持久化到SQLite")
+        weather_replica.write(weather_data)
     except Exception as e:
         logging.error(f"本地持久化失败: {e}")
 
-def subscribe_loop():
-    """订阅Redis频道，处理并本地存储数据"""
-    init_sqlite()
-    redis_client = get_redis_client(REDIS_HOST, REDIS_PORT)
-    pubsub = redis_client.pubsub()
-    pubsub.subscribe(REDIS_CHANNEL)
-    logging.info(f"已订阅Redis频道: {REDIS_CHANNEL}")
-
-    for message in pubsub.listen():
-        if message["type"] == "message":
-            try:
-                data = json.loads(message["data"])
-                # 可在此处调用数据处理逻辑
-                processed = process_weather_data(data)
-                save_to_sqlite(processed)
-            except Exception as e:
-                logging.error(f"数据处理或存储异常: {e}")
+def handle_message(payload):
+    """解码一条消息，还原完整快照后处理并本地存储"""
+    data = delta_decoder.apply(decode_message(payload))
+    if data is None:
+        # 重复消息，或等待关键帧
+        return
+    # 可在此处调用数据处理逻辑
+    processed = process_weather_data(data)
+    snapshot_cache.update(processed)
+    timeseries.add(processed)
+    save_to_sqlite(processed)
+
+def handle_batch(payloads):
+    """处理一批消息（在线程池中执行）：逐条解码还原后批量校验，单条消息失败不影响其他消息"""
+    snapshots = []
+    for payload in payloads:
+        try:
+            data = delta_decoder.apply(decode_message(payload))
+        except Exception as e:
+            logging.error(f"消息解码异常: {e}")
+            continue
+        if data is not None:
+            snapshots.append(data)
+    if not snapshots:
+        return
+    processed, valid = process_weather_batch(snapshots)
+    for snapshot, ok in zip(processed, valid):
+        if not ok:
+            continue
+        try:
+            snapshot_cache.update(snapshot)
+            timeseries.add(snapshot)
+            save_to_sqlite(snapshot)
+        except Exception as e:
+            logging.error(f"数据处理或存储异常: {e}")
+
+# Pub/Sub 订阅器：运行在事件循环中，按批收取消息，处理交给线程池
+subscriber = AsyncSubscriber(
+    REDIS_HOST, REDIS_PORT, REDIS_CHANNEL, handle_batch,
+    batch_size=SUBSCRIBE_BATCH_SIZE,
+    batch_timeout=SUBSCRIBE_BATCH_TIMEOUT_MS / 1000,
+)
+
+def create_stream_consumer():
+    """创建 Redis Stream 消费组消费者（在后台线程中运行）"""
+    return StreamConsumer(
+        get_redis_client(REDIS_HOST, REDIS_PORT, decode_responses=False),
+        stream=REDIS_CHANNEL,
+        group=REDIS_STREAM_GROUP,
+        consumer=REDIS_STREAM_CONSUMER,
+        handler=handle_message,
+        count=REDIS_STREAM_COUNT,
+        block_ms=REDIS_STREAM_BLOCK_MS,
+        claim_idle_ms=REDIS_STREAM_CLAIM_IDLE_MS,
+        start_id=REDIS_STREAM_START_ID,
+    )
 
 if __name__ == "__main__":
-    # 启动订阅线程
-    t = Thread(target=subscribe_loop, daemon=True)
-    t.start()
-    # 启动FastAPI服务（默认127.0.0.1:8001）
+    # 启动FastAPI服务（默认127.0.0.1:8001），订阅器与写入线程随 lifespan 启停
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
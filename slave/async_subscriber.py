@@ -0,0 +1,149 @@
+"""
+slave/async_subscriber.py
+
+基于 redis.asyncio 的 Pub/Sub 订阅器，运行在 FastAPI 的事件循环中，由 lifespan 启动和停止。
+
+【设计说明】
+- 订阅连接断开时按指数退避（带随机抖动）重连，重连后继续订阅；断线期间丢失的增量由关键帧请求补齐
+- 消息按批收取：收到第一条后最多再等待 batch_timeout 秒或凑满 batch_size 条
+- 每批消息交给线程池中的 handle_batch 处理（解码、还原、校验、入写入队列），
+  事件循环只负责网络读取，读接口不会被消息处理阻塞；批次按顺序逐个处理，保证同一地点的消息顺序
+- stop() 后处理完已收到的消息再退出
+"""
+
+import time
+import random
+import asyncio
+import logging
+from typing import Callable, Dict, List
+
+import redis
+
+from shared.redis_util import get_async_redis_client
+
+
+class AsyncSubscriber:
+    """
+    异步 Pub/Sub 订阅器。
+    """
+
+    def __init__(self, host: str, port: int, channel: str, handle_batch: Callable[[List[bytes]], None],
+                 batch_size: int = 100, batch_timeout: float = 0.05, max_backoff: float = 30.0,
+                 client_factory: Callable = None):
+        """
+        参数：
+            host, port: Redis 地址
+            channel: 订阅频道
+            handle_batch: 批处理函数，参数为消息原始字节列表，在线程池中执行
+            batch_size: 每批最多消息数
+            batch_timeout: 收到第一条消息后凑批的最长等待时间（秒）
+            max_backoff: 重连退避的最大间隔（秒）
+            client_factory: 创建 redis.asyncio 客户端的函数，默认使用 shared.redis_util 的配置
+        """
+        self.channel = channel
+        self.handle_batch = handle_batch
+        self.batch_size = max(1, int(batch_size))
+        self.batch_timeout = batch_timeout
+        self.max_backoff = max_backoff
+        self._client_factory = client_factory or (
+            lambda: get_async_redis_client(host, port, decode_responses=False))
+        self._stopping = asyncio.Event()
+        self._task = None
+        self.connected = False
+        self.messages = 0
+        self.batches = 0
+        self.reconnects = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.last_message_at = None
+
+    def start(self) -> asyncio.Task:
+        """在当前事件循环中启动订阅任务"""
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="redis-subscriber")
+        return self._task
+
+    async def stop(self, timeout: float = 10.0):
+        """停止订阅：处理完已收到的消息后退出，超时则取消任务"""
+        self._stopping.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logging.warning("订阅任务未能按时退出，已取消")
+        self._task = None
+
+    async def _run(self):
+        backoff = 1.0
+        while not self._stopping.is_set():
+            client = self._client_factory()
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self.connected = True
+                backoff = 1.0
+                logging.info(f"已订阅Redis频道: {self.channel}")
+                await self._consume(pubsub)
+            except (redis.RedisError, OSError) as e:
+                self.reconnects += 1
+                delay = random.uniform(backoff / 2, backoff)
+                logging.error(f"Redis订阅断开，{delay:.1f} 秒后重连: {e}")
+                backoff = min(backoff * 2, self.max_backoff)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                self.connected = False
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+
+    async def _consume(self, pubsub):
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            batch = await self._read_batch(pubsub)
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                await loop.run_in_executor(None, self.handle_batch, batch)
+            except Exception as e:
+                logging.error(f"消息批处理异常: {e}")
+            self.batches += 1
+            self.messages += len(batch)
+            self.last_batch_size = len(batch)
+            self.last_batch_ms = (time.perf_counter() - started) * 1000
+            self.last_message_at = time.time()
+
+    async def _read_batch(self, pubsub) -> List[bytes]:
+        """读取一批消息；1 秒内没有消息时返回空列表，以便检查停止标志"""
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+        if message is None:
+            return []
+        batch = [message["data"]]
+        deadline = time.monotonic() + self.batch_timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message is None:
+                break
+            batch.append(message["data"])
+        return batch
+
+    def stats(self) -> Dict:
+        return {
+            "channel": self.channel,
+            "connected": self.connected,
+            "messages": self.messages,
+            "batches": self.batches,
+            "reconnects": self.reconnects,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "last_message_at": self.last_message_at,
+        }
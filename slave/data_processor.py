@@ -8,77 +8,191 @@ slave/data_processor.py
 - 可扩展单位转换、异常值过滤、字段补全等功能
 - 为本地持久化和API展示提供标准化数据
 
+【数据格式】
+- 输入为主节点发布的 one-call 快照（经增量还原后的完整快照），字段包括
+  location、lat、lon、timezone、current、minutely、hourly、daily、alerts（数据段可缺失）
+- 时间字段均为 Unix 时间戳（dt），不需要解析时间字符串
+
+【批量校验】
+- process_weather_batch 一次校验一批快照：lat/lon/temp/humidity 按列组装为 NumPy 数组，
+  范围检查向量化完成，返回处理结果列表和有效性掩码
+- 列表数据段先走快速路径（一次取出全部 dt，与排序结果比较），只有缺少 dt 或乱序时才逐条过滤/排序
+- 性能对比见 benchmarks/bench_validation.py
 """
 
 import logging
-from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+
+SECTIONS = ("current", "minutely", "hourly", "daily", "alerts")
+LIST_SECTIONS = ("minutely", "hourly", "daily")
+
 
 def process_weather_data(data):
     """
-    对接收到的天气数据进行校验、清洗和标准化处理
+    对接收到的 one-call 快照进行校验、清洗和标准化处理
 
     参数:
-        data: dict，原始天气数据，预期字段包括
-            - city: str
-            - lat: float
-            - lon: float
-            - temp: float
-            - humidity: int
-            - weather: str
-            - timestamp: str
+        data: dict，one-call 快照，必须包含 location 字段和至少一个数据段
 
     返回:
-        dict，处理后的数据，字段同上
+        dict，处理后的快照：location、lat、lon、timezone 及存在的数据段；
+        缺少 dt 的条目被丢弃，列表数据段按 dt 排序
 
     异常:
         若数据不合法，抛出 ValueError
     """
-    required_fields = ["city", "lat", "lon", "temp", "humidity", "weather", "timestamp"]
-    for field in required_fields:
-        if field not in data:
-            logging.error(f"缺少字段: {field}")
-            raise ValueError(f"缺少字段: {field}")
+    if not isinstance(data, dict):
+        raise ValueError(f"数据格式错误: {type(data).__name__}")
+    location = data.get("location")
+    if not location:
+        logging.error("缺少字段: location")
+        raise ValueError("缺少字段: location")
 
     # 类型和范围校验
+    lat, lon = data.get("lat"), data.get("lon")
+    if lat is not None and lon is not None:
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError) as e:
+            logging.error(f"字段类型转换失败: {e}")
+            raise ValueError(f"字段类型转换失败: {e}")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            logging.error(f"经纬度超出范围: lat={lat}, lon={lon}")
+            raise ValueError(f"经纬度超出范围: lat={lat}, lon={lon}")
+
+    current = data.get("current")
+    if isinstance(current, dict):
+        # 合理性校验（可根据实际需求调整）
+        temp, humidity = current.get("temp"), current.get("humidity")
+        if temp is not None and not (-100 <= temp <= 100):
+            logging.warning(f"{location} 温度异常: {temp}")
+        if humidity is not None and not (0 <= humidity <= 100):
+            logging.warning(f"{location} 湿度异常: {humidity}")
+    return _normalize(data, str(location), lat, lon)
+
+
+def _normalize(data, location, lat, lon):
+    """整理数据段：丢弃缺少 dt 的条目、列表按 dt 排序；没有任何数据段时抛出 ValueError"""
+    result = {"location": location, "lat": lat, "lon": lon, "timezone": data.get("timezone")}
+
+    current = data.get("current")
+    if current:
+        if not isinstance(current, dict) or "dt" not in current:
+            raise ValueError(f"{location} current 数据格式错误")
+        result["current"] = current
+
+    for section in LIST_SECTIONS:
+        entries = data.get(section)
+        if not entries:
+            continue
+        try:
+            dts = [entry["dt"] for entry in entries]
+        except (KeyError, TypeError):
+            valid = [entry for entry in entries if isinstance(entry, dict) and "dt" in entry]
+            logging.warning(f"{location} {section} 中 {len(entries) - len(valid)} 条数据缺少 dt，已丢弃")
+            entries = valid
+            dts = [entry["dt"] for entry in entries]
+        # 主节点数据通常已按 dt 排序，只在乱序时排序
+        if dts != sorted(dts):
+            entries = sorted(entries, key=lambda entry: entry["dt"])
+        result[section] = entries
+
+    alerts = data.get("alerts")
+    if alerts:
+        result["alerts"] = [alert for alert in alerts if isinstance(alert, dict) and "event" in alert]
+
+    if not any(result.get(section) for section in SECTIONS):
+        raise ValueError(f"{location} 快照中没有任何数据段")
+    return result
+
+
+def _number(value) -> float:
+    """转换为浮点数，缺失为 NaN，无法转换时抛出 ValueError"""
+    if value is None:
+        return np.nan
+    if type(value) is float or type(value) is int:
+        return value
     try:
-        city = str(data["city"])
-        lat = float(data["lat"])
-        lon = float(data["lon"])
-        temp = float(data["temp"])
-        humidity = int(data["humidity"])
-        weather = str(data["weather"])
-        # 格式化时间为 MySQL/SQLite 支持的格式
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"数值格式错误: {value!r}")
+
+
+def _column(raw: List) -> Tuple[np.ndarray, np.ndarray]:
+    """将一列取值组装为 float 数组（缺失为 NaN），返回 (数组, 类型错误掩码)"""
+    try:
+        return np.array(raw, dtype=float), np.zeros(len(raw), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+    # 存在无法转换的值时逐个转换
+    values = np.empty(len(raw), dtype=float)
+    bad = np.zeros(len(raw), dtype=bool)
+    for i, value in enumerate(raw):
         try:
-            # 若已是标准格式则直接用，否则尝试转换
-            dt = datetime.strptime(data["timestamp"], "%Y-%m-%d %H:%M:%S")
-            timestamp = dt.strftime("%Y-%m-%d %H:%M:%S")
+            values[i] = _number(value)
         except ValueError:
-            # 兼容主节点传来的 ISO 格式
-            try:
-                dt = datetime.fromisoformat(data["timestamp"].replace("Z", ""))
-                timestamp = dt.strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                timestamp = data["timestamp"]  # 保底兜底
-    except Exception as e:
-        logging.error(f"字段类型转换失败: {e}")
-        raise ValueError(f"字段类型转换失败: {e}")
-
-    # 合理性校验（可根据实际需求调整）
-    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
-        logging.error(f"经纬度超出范围: lat={lat}, lon={lon}")
-        raise ValueError(f"经纬度超出范围: lat={lat}, lon={lon}")
-    if not (-100 <= temp <= 100):
-        logging.warning(f"温度异常: {temp}")
-    if not (0 <= humidity <= 100):
-        logging.warning(f"湿度异常: {humidity}")
-
-    # 返回标准化数据
-    return {
-        "city": city,
-        "lat": lat,
-        "lon": lon,
-        "temp": temp,
-        "humidity": humidity,
-        "weather": weather,
-        "timestamp": timestamp
-    }
\ No newline at end of file
+            values[i] = np.nan
+            bad[i] = True
+    return values, bad
+
+
+def process_weather_batch(batch: List) -> Tuple[List, np.ndarray]:
+    """
+    批量校验、清洗一批 one-call 快照
+
+    参数:
+        batch: 快照列表
+
+    返回:
+        (results, valid)：valid 为布尔掩码（True 表示有效），
+        results[i] 为第 i 条的处理结果（与 process_weather_data 相同），无效记录为 None
+    """
+    n = len(batch)
+    valid = np.ones(n, dtype=bool)
+    records = []
+    for i, data in enumerate(batch):
+        if isinstance(data, dict) and data.get("location"):
+            records.append(data)
+        else:
+            valid[i] = False
+            records.append({})
+
+    currents = [data.get("current") for data in records]
+    currents = [section if isinstance(section, dict) else {} for section in currents]
+    lat, lat_bad = _column([data.get("lat") for data in records])
+    lon, lon_bad = _column([data.get("lon") for data in records])
+    temp, temp_bad = _column([section.get("temp") for section in currents])
+    humidity, humidity_bad = _column([section.get("humidity") for section in currents])
+
+    # 经纬度：只有两者都存在时才校验（与 process_weather_data 一致），超出范围或类型错误为无效
+    has_coords = ~np.isnan(lat) & ~np.isnan(lon)
+    with np.errstate(invalid="ignore"):
+        bad_coords = has_coords & ((np.abs(lat) > 90) | (np.abs(lon) > 180))
+        bad_temp = (temp < -100) | (temp > 100)
+        bad_humidity = (humidity < 0) | (humidity > 100)
+    invalid = valid & (lat_bad | lon_bad | bad_coords)
+    valid &= ~invalid
+    for i in np.flatnonzero(invalid):
+        data = records[i]
+        logging.error(f"{data['location']} 经纬度无效: lat={data.get('lat')}, lon={data.get('lon')}")
+    # 温度/湿度异常只告警
+    for i in np.flatnonzero(valid & (bad_temp | temp_bad)):
+        logging.warning(f"{records[i]['location']} 温度异常: {currents[i].get('temp')}")
+    for i in np.flatnonzero(valid & (bad_humidity | humidity_bad)):
+        logging.warning(f"{records[i]['location']} 湿度异常: {currents[i].get('humidity')}")
+
+    results = [None] * n
+    lat_values, lon_values, coords = lat.tolist(), lon.tolist(), has_coords.tolist()
+    for i in np.flatnonzero(valid).tolist():
+        data = records[i]
+        try:
+            if coords[i]:
+                results[i] = _normalize(data, str(data["location"]), lat_values[i], lon_values[i])
+            else:
+                results[i] = _normalize(data, str(data["location"]), data.get("lat"), data.get("lon"))
+        except ValueError as e:
+            logging.error(f"快照校验失败: {e}")
+            valid[i] = False
+    return results, valid
@@ -0,0 +1,230 @@
+"""
+slave/replica.py
+
+从节点本地副本：在 SQLite 中保存与主节点 MySQL 结构一致的天气数据表，读请求可完全由从节点承担。
+
+【模块职责】
+- 表结构与行转换直接复用 shared.weather_dao 中各 DAO 的 COLUMNS / KEY_COLUMNS / to_row，
+  主从两端的列定义只维护一份
+- current_weather / minutely_forecast / hourly_forecast / daily_forecast 以 (location, dt) 为唯一键，
+  weather_alerts 以 (location, event, start) 为唯一键，使用 INSERT ... ON CONFLICT DO UPDATE 写入
+- 与主节点相同，按地点记录行内容哈希，内容未变化的行不再写入；行哈希在 SQLiteWriter 提交成功后才更新
+- 写入通过 SQLiteWriter 异步批量提交
+- ReplicaReader 为读接口提供按时间范围的历史查询，每个线程一个只读连接（WAL 模式下与写入互不阻塞）
+- sync_state 表保存增量解码状态（各地点的 epoch、seq 和完整快照），与副本数据走同一个写入队列，
+  重启后载入即可从 Redis Stream 上次确认的位置继续应用增量，而不必等待关键帧
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from shared.weather_dao import WeatherUnitOfWork
+
+# SQLite 列类型，未列出的列为 REAL
+_TEXT_COLUMNS = {
+    "location", "summary", "weather", "weather_main", "weather_description", "weather_icon",
+    "sender_name", "event", "description", "tags",
+}
+_INTEGER_COLUMNS = {
+    "dt", "sunrise", "sunset", "moonrise", "moonset", "pressure", "humidity", "clouds",
+    "visibility", "wind_deg", "weather_id", "start", "end",
+}
+
+
+def _column_type(column: str) -> str:
+    if column in _TEXT_COLUMNS:
+        return "TEXT"
+    if column in _INTEGER_COLUMNS:
+        return "INTEGER"
+    return "REAL"
+
+
+def _quote(column: str) -> str:
+    # start / end 等列名与 SQL 关键字冲突
+    return f'"{column}"'
+
+
+SYNC_STATE_SCHEMA = """CREATE TABLE IF NOT EXISTS sync_state (
+    "location" TEXT PRIMARY KEY,
+    "epoch" INTEGER,
+    "seq" INTEGER NOT NULL,
+    "snapshot" TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+SYNC_STATE_UPSERT = (
+    'INSERT INTO sync_state ("location", "epoch", "seq", "snapshot", updated_at) VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT ("location") DO UPDATE SET "epoch" = excluded."epoch", "seq" = excluded."seq", '
+    '"snapshot" = excluded."snapshot", updated_at = excluded.updated_at'
+)
+SYNC_STATE_DELETE = 'DELETE FROM sync_state WHERE "location" = ?'
+
+
+class WeatherReplica:
+    """
+    从节点本地副本表。
+    """
+
+    def __init__(self, writer=None):
+        """
+        参数：
+            writer: SQLiteWriter 实例（可在 schema() 之后再设置）
+        """
+        self.writer = writer
+        # 只借用 DAO 的列定义与行转换，不连接 MySQL
+        self.daos = WeatherUnitOfWork(None, None, None, None, None).daos
+        self.upsert_sql = {dao.table_name: self._build_upsert_sql(dao) for dao in self.daos.values()}
+
+    @staticmethod
+    def _build_upsert_sql(dao) -> str:
+        columns = ", ".join(_quote(c) for c in dao.COLUMNS)
+        placeholders = ", ".join(["?"] * len(dao.COLUMNS))
+        keys = ", ".join(_quote(c) for c in dao.KEY_COLUMNS)
+        updates = [f"{_quote(c)} = excluded.{_quote(c)}" for c in dao.COLUMNS if c not in dao.KEY_COLUMNS]
+        if dao.TOUCH_COLUMN:
+            updates.append(f"{dao.TOUCH_COLUMN} = CURRENT_TIMESTAMP")
+        return (
+            f"INSERT INTO {dao.table_name} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({keys}) DO UPDATE SET " + ", ".join(updates)
+        )
+
+    def schema(self) -> str:
+        """返回全部副本表的建表脚本"""
+        statements = []
+        for dao in self.daos.values():
+            columns = ["id INTEGER PRIMARY KEY AUTOINCREMENT"]
+            columns += [f"{_quote(c)} {_column_type(c)}" + (" NOT NULL" if c in dao.KEY_COLUMNS else "")
+                        for c in dao.COLUMNS]
+            if dao.TOUCH_COLUMN:
+                columns.append(f"{dao.TOUCH_COLUMN} TEXT DEFAULT CURRENT_TIMESTAMP")
+            columns.append("UNIQUE (" + ", ".join(_quote(c) for c in dao.KEY_COLUMNS) + ")")
+            statements.append(f"CREATE TABLE IF NOT EXISTS {dao.table_name} (\n    "
+                              + ",\n    ".join(columns) + "\n);")
+            if "dt" not in dao.COLUMNS:
+                # 唯一键不以时间列开头（警报）时，为按时间范围查询单独建索引
+                statements.append(f"CREATE INDEX IF NOT EXISTS idx_{dao.table_name}_location_start "
+                                  f'ON {dao.table_name} ("location", "start");')
+        statements.append(SYNC_STATE_SCHEMA)
+        return "\n".join(statements) + "\n"
+
+    def write(self, snapshot: Dict) -> Dict[str, int]:
+        """
+        将一个快照中内容有变化的行提交给写入器
+        参数：
+            snapshot: 完整（或部分）one-call 快照，location 字段为地点名称
+        返回：
+            各表提交的行数
+        """
+        location = snapshot["location"]
+        submitted = {}
+        for section, dao in self.daos.items():
+            data = snapshot.get(section)
+            if not data:
+                continue
+            after_commit = []
+            rows = dao.changed_rows(data, location, after_commit)
+            if rows:
+                self.writer.submit(self.upsert_sql[dao.table_name], rows, on_commit=after_commit)
+                submitted[dao.table_name] = len(rows)
+            else:
+                for callback in after_commit:
+                    callback()
+        if submitted:
+            logging.debug(f"{location} 本地副本写入: {submitted}")
+        return submitted
+
+    def save_sync_state(self, states: Iterable[Tuple[str, Optional[int], Optional[int], Optional[Dict]]]) -> int:
+        """
+        将 DeltaDecoder.export_state() 导出的状态提交给写入器；seq 为 None 的地点删除已保存的状态
+        返回：
+            提交的地点数
+        """
+        now = time.time()
+        upserts, deletes = [], []
+        for location, epoch, seq, snapshot in states:
+            if seq is None:
+                deletes.append((location,))
+            else:
+                upserts.append((location, epoch, seq,
+                                json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")), now))
+        self.writer.submit(SYNC_STATE_UPSERT, upserts)
+        self.writer.submit(SYNC_STATE_DELETE, deletes)
+        return len(upserts) + len(deletes)
+
+    @staticmethod
+    def load_sync_state(db_path: str) -> List[Tuple[str, Optional[int], int, Dict]]:
+        """读取已保存的增量解码状态 [(地点, epoch, seq, 快照)]，供 DeltaDecoder.load_state 使用"""
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute('SELECT "location", "epoch", "seq", "snapshot" FROM sync_state').fetchall()
+        except sqlite3.OperationalError:
+            return []
+        finally:
+            conn.close()
+        states = []
+        for location, epoch, seq, snapshot in rows:
+            try:
+                states.append((location, epoch, seq, json.loads(snapshot)))
+            except ValueError:
+                logging.error(f"{location} 的增量解码状态无法解析，等待关键帧")
+        return states
+
+    def stats(self) -> Dict:
+        """返回各表写入/跳过的行数"""
+        return {
+            dao.table_name: {"written": dao.rows_written, "skipped": dao.rows_skipped}
+            for dao in self.daos.values()
+        }
+
+
+class ReplicaReader:
+    """
+    副本表只读查询。
+    """
+
+    def __init__(self, db_path: str, replica: WeatherReplica):
+        self.db_path = db_path
+        # 数据段名 -> (表名, 时间列)
+        self.tables = {
+            section: (dao.table_name, "start" if "dt" not in dao.COLUMNS else "dt")
+            for section, dao in replica.daos.items()
+        }
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA query_only=ON")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def history(self, section: str, location: str, start: int = None, end: int = None,
+                limit: int = 1000) -> List[Dict]:
+        """
+        按时间范围查询某地点的数据，按时间升序
+        参数：
+            section: 数据段名（current/minutely/hourly/daily/alerts）
+            location: 地点名称
+            start, end: 时间范围（Unix 时间戳，闭区间），None 表示不限
+            limit: 最多返回行数
+        """
+        if section not in self.tables:
+            raise ValueError(f"未知的数据段: {section}")
+        table, time_column = self.tables[section]
+        sql = f'SELECT * FROM {table} WHERE "location" = ?'
+        params = [location]
+        if start is not None:
+            sql += f' AND "{time_column}" >= ?'
+            params.append(start)
+        if end is not None:
+            sql += f' AND "{time_column}" <= ?'
+            params.append(end)
+        sql += f' ORDER BY "{time_column}" LIMIT ?'
+        params.append(limit)
+        return [dict(row) for row in self._connection().execute(sql, params)]
@@ -0,0 +1,83 @@
+"""
+slave/snapshot_cache.py
+
+从节点最新快照缓存：订阅线程每收到一个完整快照就更新内存中的该地点条目，读接口直接返回预先序列化好的响应体。
+
+【设计说明】
+- 每个地点保存最新快照、"最新实况"响应体（bytes）及其 ETag，更新时一次性计算，读请求不再序列化
+- ETag 为响应体的短哈希，客户端携带 If-None-Match 命中时返回 304
+- 预报窗口（前 N 小时/天）按 (地点, 类型, N) 缓存序列化结果，快照更新或当前时段结束后失效
+- 条目整体替换（字典赋值为原子操作），读请求无需加锁
+"""
+
+import json
+import time
+import hashlib
+from typing import Dict, Optional, Tuple
+
+LATEST_FIELDS = ("location", "lat", "lon", "timezone", "current", "alerts")
+
+
+def serialize(payload) -> Tuple[bytes, str]:
+    """序列化为 JSON 响应体并计算 ETag"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+class _Entry:
+    __slots__ = ("snapshot", "body", "etag", "updated_at", "windows")
+
+    def __init__(self, snapshot: Dict):
+        self.snapshot = snapshot
+        latest = {field: snapshot.get(field) for field in LATEST_FIELDS}
+        latest["updated_at"] = self.updated_at = time.time()
+        self.body, self.etag = serialize(latest)
+        self.windows = {}
+
+
+class SnapshotCache:
+    """
+    各地点最新快照的内存缓存。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self.updates = 0
+
+    def update(self, snapshot: Dict):
+        """用完整快照替换该地点的缓存条目"""
+        self._entries[snapshot["location"]] = _Entry(snapshot)
+        self.updates += 1
+
+    def latest(self, location: str) -> Optional[Tuple[bytes, str]]:
+        """返回 (最新实况响应体, ETag)，地点未知时返回 None"""
+        entry = self._entries.get(location)
+        return None if entry is None else (entry.body, entry.etag)
+
+    def window(self, location: str, section: str, count: int) -> Optional[Tuple[bytes, str]]:
+        """
+        返回预报窗口 (响应体, ETag)：最新快照中 dt 不早于当前时间的前 count 条 hourly/daily 数据
+        """
+        entry = self._entries.get(location)
+        if entry is None:
+            return None
+        key = (section, count)
+        now = time.time()
+        cached = entry.windows.get(key)
+        if cached is not None and now < cached[2]:
+            return cached[:2]
+        # hourly/daily 的 dt 为该时段起点，保留当前所在时段
+        span = 3600 if section == "hourly" else 86400
+        items = [item for item in entry.snapshot.get(section) or () if item["dt"] + span > now][:count]
+        body, etag = serialize({"location": location, "section": section, "updated_at": entry.updated_at,
+                                section: items})
+        # 窗口随时间推移变化，只缓存到当前时段结束
+        expires = items[0]["dt"] + span if items else now + 60
+        entry.windows[key] = (body, etag, expires)
+        return body, etag
+
+    def locations(self):
+        return sorted(self._entries)
+
+    def stats(self) -> Dict:
+        return {"locations": len(self._entries), "updates": self.updates}
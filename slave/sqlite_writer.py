@@ -0,0 +1,210 @@
+"""
+slave/sqlite_writer.py
+
+从节点 SQLite 批量写入器：单个长连接 + 后台线程批量提交。
+
+【设计说明】
+- 写入线程独占一个长连接，启用 WAL 日志模式，synchronous 可配置（默认 NORMAL）
+- 调用方 submit(sql, rows) 只入队，不阻塞；写入线程按 batch_size 行或 flush_interval_ms 毫秒凑批，
+  相邻的同一条语句的参数合并为一次 executemany（按提交顺序执行，不同语句之间不重排），
+  整批在一个事务中提交（一次 fsync）
+- 整批提交失败时回滚并逐行重试，无法写入的行记录日志后丢弃，不影响其他行
+- submit 可附带提交成功后执行的回调（如更新行哈希）；整批或逐行重试全部写入成功才执行，
+  有行被丢弃时不执行，这些行下次仍会被视为有变化
+- 写入线程捕获所有异常并继续运行，单批失败不会导致线程退出
+- 提供批次大小、提交耗时、队列深度等指标
+- WAL 模式下读请求可以使用独立连接并发读取，不会被写入阻塞
+"""
+
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+class SQLiteWriter:
+    """
+    SQLite 批量写入器。
+    """
+
+    def __init__(self, db_path: str, schema: str = None, batch_size: int = 500,
+                 flush_interval_ms: int = 200, synchronous: str = "NORMAL", maxsize: int = 100000):
+        """
+        参数：
+            db_path: 数据库文件路径
+            schema: 连接建立后执行的建表脚本
+            batch_size: 凑满多少行立即提交
+            flush_interval_ms: 凑批的最长等待时间（毫秒）
+            synchronous: PRAGMA synchronous 取值（OFF / NORMAL / FULL）
+            maxsize: 队列最大条目数，满时 submit 阻塞（背压）
+        """
+        if synchronous.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"无效的 synchronous 取值: {synchronous}")
+        self.db_path = db_path
+        self.schema = schema
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval_ms / 1000
+        self.synchronous = synchronous.upper()
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._error = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def connect(self) -> sqlite3.Connection:
+        """建立长连接并设置 PRAGMA、执行建表脚本"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA busy_timeout=5000")
+        if self.schema:
+            conn.executescript(self.schema)
+        return conn
+
+    def start(self):
+        """启动写入线程，等待连接建立完成；连接失败时抛出异常"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+            self._thread.start()
+            self._ready.wait()
+            if self._error is not None:
+                raise self._error
+        return self
+
+    def submit(self, sql: str, rows: Sequence[Sequence], on_commit: Sequence[Callable[[], None]] = ()):
+        """
+        提交一条语句及其参数行，写入线程异步批量提交
+        参数：
+            on_commit: 这些行提交成功后执行的回调列表
+        """
+        if rows:
+            self._queue.put((sql, list(rows), list(on_commit)))
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待此前提交的数据全部写入，返回是否在超时前完成"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _take_batch(self):
+        """
+        取出一批数据，返回 ([(sql, rows), ...], 行数, 提交成功后的回调, 待通知的 flush 事件)；
+        保持提交顺序，只合并相邻的同一条语句
+        """
+        pending, callbacks, waiters, count = [], [], [], 0
+        deadline = time.monotonic() + self.flush_interval
+        while count < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+                break
+            sql, rows, on_commit = item
+            if pending and pending[-1][0] == sql:
+                pending[-1][1].extend(rows)
+            else:
+                pending.append((sql, rows))
+            callbacks.extend(on_commit)
+            count += len(rows)
+        return pending, count, callbacks, waiters
+
+    def _run(self):
+        try:
+            conn = self.connect()
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            logging.error(f"SQLite 连接失败: {e}")
+            return
+        self._ready.set()
+        logging.info(f"SQLite 写入线程已启动: {self.db_path}（WAL, synchronous={self.synchronous}）")
+        try:
+            while not self._stop.is_set() or not self._queue.empty():
+                pending, count, callbacks, waiters = self._take_batch()
+                try:
+                    if pending:
+                        self._flush(conn, pending, count, callbacks)
+                except Exception as e:
+                    self.rows_failed += count
+                    logging.error(f"SQLite 写入异常，{count} 行已丢弃: {e}", exc_info=True)
+                finally:
+                    for waiter in waiters:
+                        waiter.set()
+        finally:
+            conn.close()
+
+    def _flush(self, conn: sqlite3.Connection, pending: List[Tuple[str, List]], count: int,
+               callbacks: List[Callable[[], None]]):
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN")
+            for sql, rows in pending:
+                conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+            self.rows_written += count
+            committed = True
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logging.error(f"SQLite 批量写入失败，逐行重试: {e}")
+            committed = self._write_one_by_one(conn, pending)
+        if committed:
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logging.error(f"SQLite 提交回调执行失败: {e}")
+        elapsed = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_rows = count
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self.total_flush_ms += elapsed
+
+    def _write_one_by_one(self, conn: sqlite3.Connection, pending: List[Tuple[str, List]]) -> bool:
+        """逐行写入（自动提交），返回是否全部写入成功"""
+        ok = True
+        for sql, rows in pending:
+            for row in rows:
+                try:
+                    conn.execute(sql, row)
+                    self.rows_written += 1
+                except Exception as e:
+                    ok = False
+                    self.rows_failed += 1
+                    logging.error(f"SQLite 行写入失败，已丢弃: {e}")
+        return ok
+
+    def close(self, timeout: float = 10.0):
+        """写完队列中剩余数据后关闭连接"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def metrics(self) -> Dict:
+        """返回写入指标"""
+        return {
+            "depth": self._queue.qsize(),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "avg_flush_rows": round(self.rows_written / self.flushes, 1) if self.flushes else 0.0,
+        }
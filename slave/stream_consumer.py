@@ -0,0 +1,172 @@
+"""
+slave/stream_consumer.py
+
+Redis Streams 消费者：以消费组方式批量读取主节点写入的消息，处理后确认（XACK）。
+
+【设计说明】
+- 每个从节点使用独立的消费组（REDIS_STREAM_GROUP），组内记录已投递位置，重启后从上次位置继续，
+  落后时按 COUNT 批量追赶，无需全量重同步
+- 启动时先处理本消费者名下已投递但未确认的消息（读取 ID "0"），再读取新消息（ID ">"）
+- 定期用 XAUTOCLAIM 认领组内空闲超过 claim_idle_ms 的待确认消息（如同组其他实例崩溃遗留的消息）
+- 单条消息处理失败只记录日志并确认，避免反复投递阻塞消费；连接异常时按指数退避重连
+"""
+
+import time
+import logging
+from typing import Callable, Dict, List, Tuple
+
+import redis
+
+from shared.redis_util import STREAM_FIELD
+
+MESSAGE_FIELD = STREAM_FIELD.encode()
+
+
+class StreamConsumer:
+    """
+    Redis Streams 消费组消费者。
+    """
+
+    def __init__(self, client, stream: str, group: str, consumer: str,
+                 handler: Callable[[bytes], None], count: int = 100, block_ms: int = 5000,
+                 claim_idle_ms: int = 60000, claim_interval: float = 30.0, start_id: str = "$"):
+        """
+        参数：
+            client: redis.Redis 对象（decode_responses=False）
+            stream: Stream 键名
+            group: 消费组名
+            consumer: 消费者名（应在重启后保持不变，才能继续处理自己名下的待确认消息）
+            handler: 单条消息处理函数，参数为消息原始字节
+            count: 每次读取的最大条数
+            block_ms: 无新消息时阻塞等待的毫秒数
+            claim_idle_ms: 待确认消息空闲超过该毫秒数才被认领
+            claim_interval: 认领检查间隔（秒）
+            start_id: 消费组不存在时的起始位置（"$" 只读新消息，"0" 从 Stream 中最早的消息开始）
+        """
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.handler = handler
+        self.count = max(1, int(count))
+        self.block_ms = int(block_ms)
+        self.claim_idle_ms = int(claim_idle_ms)
+        self.claim_interval = claim_interval
+        self.start_id = start_id
+        self._running = False
+        self._last_claim = 0.0
+        self.processed = 0
+        self.failed = 0
+        self.claimed = 0
+        self.batches = 0
+        self.last_id = None
+
+    def ensure_group(self):
+        """创建消费组（已存在时忽略）"""
+        try:
+            self.client.xgroup_create(self.stream, self.group, id=self.start_id, mkstream=True)
+            logging.info(f"已创建消费组 {self.group}（Stream: {self.stream}，起始位置 {self.start_id}）")
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _handle(self, entries: List[Tuple]) -> int:
+        """处理一批消息并确认，返回处理条数"""
+        if not entries:
+            return 0
+        ids = []
+        for entry_id, fields in entries:
+            ids.append(entry_id)
+            # 已被裁剪（MAXLEN）的待确认消息字段为空
+            payload = fields.get(MESSAGE_FIELD) if fields else None
+            if payload is None:
+                continue
+            try:
+                self.handler(payload)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"Stream 消息 {entry_id} 处理失败: {e}")
+        self.client.xack(self.stream, self.group, *ids)
+        self.batches += 1
+        self.last_id = ids[-1]
+        return len(ids)
+
+    def _read(self, stream_id: str, block: int = None) -> List[Tuple]:
+        response = self.client.xreadgroup(self.group, self.consumer, {self.stream: stream_id},
+                                          count=self.count, block=block)
+        return response[0][1] if response else []
+
+    def drain_pending(self) -> int:
+        """处理本消费者名下已投递但未确认的消息"""
+        total = 0
+        while True:
+            entries = self._read("0")
+            if not entries:
+                return total
+            total += self._handle(entries)
+
+    def claim_idle(self) -> int:
+        """认领组内空闲过久的待确认消息并处理"""
+        total = 0
+        start = "0-0"
+        while True:
+            next_start, entries = self.client.xautoclaim(self.stream, self.group, self.consumer,
+                                                         self.claim_idle_ms, start, count=self.count)[:2]
+            self.claimed += len(entries)
+            total += self._handle(entries)
+            if next_start in (b"0-0", "0-0"):
+                return total
+            start = next_start
+
+    def poll(self) -> int:
+        """读取并处理一批新消息，必要时先认领空闲消息；返回处理条数"""
+        now = time.monotonic()
+        handled = 0
+        if now - self._last_claim >= self.claim_interval:
+            self._last_claim = now
+            handled += self.claim_idle()
+        return handled + self._handle(self._read(">", block=self.block_ms))
+
+    def run(self):
+        """阻塞运行消费循环，断线后按指数退避重连，直到 stop() 被调用"""
+        self._running = True
+        backoff = 1
+        while self._running:
+            try:
+                self.ensure_group()
+                pending = self.drain_pending()
+                if pending:
+                    logging.info(f"已处理 {pending} 条未确认消息")
+                backoff = 1
+                while self._running:
+                    self.poll()
+            except redis.RedisError as e:
+                logging.error(f"Stream 消费异常，{backoff} 秒后重连: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def stop(self):
+        self._running = False
+
+    def stats(self) -> Dict:
+        """返回消费统计及消费组积压（lag）"""
+        stats = {
+            "stream": self.stream,
+            "group": self.group,
+            "consumer": self.consumer,
+            "processed": self.processed,
+            "failed": self.failed,
+            "claimed": self.claimed,
+            "batches": self.batches,
+            "last_id": self.last_id.decode() if isinstance(self.last_id, bytes) else self.last_id,
+        }
+        try:
+            for group in self.client.xinfo_groups(self.stream):
+                name = group.get("name")
+                if (name.decode() if isinstance(name, bytes) else name) == self.group:
+                    stats["pending"] = group.get("pending")
+                    stats["lag"] = group.get("lag")
+        except redis.RedisError as e:
+            stats["error"] = str(e)
+        return stats
@@ -0,0 +1,192 @@
+"""
+slave/timeseries.py
+
+从节点近期观测的内存时间序列：每个地点一个定长环形缓冲区，数据存放在紧凑的 NumPy 数组中。
+
+【设计说明】
+- 每个地点预分配 capacity 条：dt 为 int64，各观测字段为 float32（缺失为 NaN），
+  内存占用固定为 capacity * (8 + 4 * 字段数) 字节，写满后覆盖最旧的数据
+- 数据来自 current 数据段，订阅器每还原一个快照追加一条；dt 与最新一条相同时覆盖（同一观测的更新），更早的忽略
+- 最新值 O(1) 读取；时间窗口查询用二分定位，聚合（min/max/mean）对数组切片向量化计算
+- 启动时从 SQLite 副本表 current_weather 回填最近 capacity 条
+"""
+
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+FIELDS = (
+    "temp", "feels_like", "humidity", "pressure", "dew_point", "uvi", "clouds",
+    "visibility", "wind_speed", "wind_deg", "wind_gust",
+)
+_FIELD_INDEX = {field: i for i, field in enumerate(FIELDS)}
+
+
+class RingSeries:
+    """
+    单个地点的环形时间序列。
+    """
+
+    __slots__ = ("capacity", "dt", "values", "head", "size", "lock")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.dt = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((len(FIELDS), capacity), np.nan, dtype=np.float32)
+        self.head = 0  # 下一条写入的位置
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def append(self, dt: int, row) -> bool:
+        """追加一条观测；返回是否写入"""
+        with self.lock:
+            if self.size:
+                last = (self.head - 1) % self.capacity
+                if dt < self.dt[last]:
+                    return False
+                if dt == self.dt[last]:
+                    self.values[:, last] = row
+                    return True
+            self.dt[self.head] = dt
+            self.values[:, self.head] = row
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            return True
+
+    def latest(self) -> Optional[Dict]:
+        with self.lock:
+            if not self.size:
+                return None
+            last = (self.head - 1) % self.capacity
+            return _row_dict(int(self.dt[last]), self.values[:, last])
+
+    def _ordered(self):
+        """按时间顺序返回 (dt, values) 视图/副本"""
+        if self.size < self.capacity:
+            return self.dt[:self.size], self.values[:, :self.size]
+        order = np.r_[self.head:self.capacity, 0:self.head]
+        return self.dt[order], self.values[:, order]
+
+    def window(self, start: int = None, end: int = None):
+        """返回时间范围 [start, end] 内的 (dt, values) 副本"""
+        with self.lock:
+            dt, values = self._ordered()
+            lo = 0 if start is None else int(np.searchsorted(dt, start, side="left"))
+            hi = dt.size if end is None else int(np.searchsorted(dt, end, side="right"))
+            return dt[lo:hi].copy(), values[:, lo:hi].copy()
+
+
+def _row_dict(dt: int, row) -> Dict:
+    result = {"dt": dt}
+    for field, value in zip(FIELDS, row.tolist()):
+        result[field] = None if value != value else round(value, 4)
+    return result
+
+
+def _row(current: Dict):
+    return [np.nan if current.get(field) is None else current.get(field) for field in FIELDS]
+
+
+class TimeSeriesStore:
+    """
+    所有地点的近期观测。
+    """
+
+    def __init__(self, capacity: int = 2880):
+        """
+        参数：
+            capacity: 每个地点保留的观测条数（current 每分钟更新时，2880 条约 48 小时）
+        """
+        self.capacity = max(1, int(capacity))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get(self, location: str, create: bool = False) -> Optional[RingSeries]:
+        series = self._series.get(location)
+        if series is None and create:
+            with self._lock:
+                series = self._series.setdefault(location, RingSeries(self.capacity))
+        return series
+
+    def add(self, snapshot: Dict) -> bool:
+        """从快照的 current 数据段追加一条观测"""
+        current = snapshot.get("current")
+        if not current or "dt" not in current:
+            return False
+        return self._get(snapshot["location"], create=True).append(int(current["dt"]), _row(current))
+
+    def latest(self, location: str) -> Optional[Dict]:
+        series = self._get(location)
+        return None if series is None else series.latest()
+
+    def series(self, location: str, field: str, start: int = None, end: int = None) -> Optional[Dict]:
+        """返回某字段在时间范围内的 {"dt": [...], field: [...]}"""
+        if field not in _FIELD_INDEX:
+            raise ValueError(f"未知字段: {field}")
+        series = self._get(location)
+        if series is None:
+            return None
+        dt, values = series.window(start, end)
+        column = values[_FIELD_INDEX[field]]
+        return {"dt": dt.tolist(), field: [None if v != v else round(v, 4) for v in column.tolist()]}
+
+    def aggregate(self, location: str, start: int = None, end: int = None) -> Optional[Dict]:
+        """返回时间范围内各字段的 min/max/mean/count（忽略缺失值）"""
+        series = self._get(location)
+        if series is None:
+            return None
+        dt, values = series.window(start, end)
+        result = {"count": int(dt.size), "from": int(dt[0]) if dt.size else None,
+                  "to": int(dt[-1]) if dt.size else None, "fields": {}}
+        if not dt.size:
+            return result
+        present = ~np.isnan(values)
+        counts = present.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            filled = np.where(present, values, 0)
+            means = filled.sum(axis=1, dtype=np.float64) / counts
+            mins = np.where(present, values, np.inf).min(axis=1)
+            maxs = np.where(present, values, -np.inf).max(axis=1)
+        for i, field in enumerate(FIELDS):
+            if counts[i]:
+                result["fields"][field] = {
+                    "min": round(float(mins[i]), 4), "max": round(float(maxs[i]), 4),
+                    "mean": round(float(means[i]), 4), "count": int(counts[i]),
+                }
+        return result
+
+    def load_from_sqlite(self, db_path: str) -> int:
+        """从副本表 current_weather 回填每个地点最近 capacity 条观测，返回回填条数"""
+        columns = ", ".join(f'"{field}"' for field in FIELDS)
+        sql = (
+            f'SELECT "location", "dt", {columns} FROM ('
+            f'  SELECT *, ROW_NUMBER() OVER (PARTITION BY "location" ORDER BY "dt" DESC) AS rn'
+            f'  FROM current_weather'
+            f') WHERE rn <= ? ORDER BY "location", "dt"'
+        )
+        loaded = 0
+        conn = sqlite3.connect(db_path)
+        try:
+            for row in conn.execute(sql, (self.capacity,)):
+                values = [np.nan if v is None else v for v in row[2:]]
+                if self._get(row[0], create=True).append(int(row[1]), values):
+                    loaded += 1
+        except sqlite3.Error as e:
+            logging.error(f"时间序列回填失败: {e}")
+        finally:
+            conn.close()
+        logging.info(f"时间序列已从SQLite回填 {loaded} 条（{len(self._series)} 个地点）")
+        return loaded
+
+    def stats(self) -> Dict:
+        bytes_per_location = self.capacity * (8 + 4 * len(FIELDS))
+        return {
+            "locations": len(self._series),
+            "capacity": self.capacity,
+            "fields": list(FIELDS),
+            "bytes_per_location": bytes_per_location,
+            "bytes_total": bytes_per_location * len(self._series),
+        }
@@ -0,0 +1,190 @@
+"""
+tests/test_alarm_manager.py
+
+AlarmManager：温度滑动窗口的升降温计算、规则触发与重复抑制。
+"""
+
+import random
+
+from master.alarm_manager import AlarmManager, SlidingWindow
+
+HOUR = 3600
+
+
+class FakeSender:
+    def __init__(self):
+        self.sent = []
+
+    def send_sms(self, phone_numbers, message):
+        self.sent.append((list(phone_numbers), message))
+
+    def stats(self):
+        return {}
+
+
+def make_manager(**kwargs):
+    return AlarmManager({}, sms_sender=FakeSender(), **kwargs)
+
+
+def snapshot(dt, temp, location="beijing", **extra):
+    return dict({"location": location, "current": {"dt": dt, "temp": temp}}, **extra)
+
+
+def test_window_matches_brute_force():
+    rng = random.Random(7)
+    window = SlidingWindow(24 * HOUR)
+    history = []
+    dt = 0
+    for _ in range(2000):
+        dt += rng.choice((60, 600, 1800, 3 * HOUR))
+        temp = rng.uniform(-10, 35)
+        assert window.add(dt, temp)
+        history.append((dt, temp))
+        recent = [t for d, t in history if d >= dt - 24 * HOUR]
+        assert abs(window.rise() - (temp - min(recent))) < 1e-9
+        assert abs(window.drop() - (max(recent) - temp)) < 1e-9
+
+
+def test_window_ignores_old_and_duplicate_observations():
+    window = SlidingWindow(24 * HOUR)
+    assert window.add(1000, 10.0)
+    assert not window.add(1000, 30.0)
+    assert not window.add(500, 30.0)
+    assert window.rise() == 0.0
+
+
+def test_expired_minimum_leaves_window():
+    window = SlidingWindow(24 * HOUR)
+    window.add(0, 0.0)
+    window.add(HOUR, 10.0)
+    assert window.rise() == 10.0
+    window.add(25 * HOUR, 10.0)
+    assert window.rise() == 0.0
+
+
+def test_temperature_rise_triggers_once_per_severity():
+    manager = make_manager()
+    manager.check_alerts(snapshot(0, 10.0))
+    manager.check_alerts(snapshot(HOUR, 14.0))
+    assert manager.triggered == 0
+    manager.check_alerts(snapshot(2 * HOUR, 16.0))
+    assert manager.triggered == 1
+    # 同一档位在抑制期内不再通知
+    manager.check_alerts(snapshot(3 * HOUR, 16.5))
+    assert (manager.triggered, manager.suppressed) == (1, 1)
+    # 幅度升到两倍阈值，重新通知
+    manager.check_alerts(snapshot(4 * HOUR, 20.5))
+    assert manager.triggered == 2
+    assert "升温10.5℃" in manager._pending[-1][1]
+
+
+def test_temperature_drop_triggers():
+    manager = make_manager()
+    manager.check_alerts(snapshot(0, 20.0))
+    manager.check_alerts(snapshot(HOUR, 13.0))
+    assert manager.triggered == 1
+    assert manager._pending[0] == ("beijing", "寒潮预警：beijing24小时内降温7.0℃")
+
+
+def test_window_rules_skip_snapshots_without_new_observation():
+    manager = make_manager()
+    manager.check_alerts(snapshot(0, 10.0))
+    manager.check_alerts(snapshot(HOUR, 16.0))
+    manager.suppression.clear()
+    # 只刷新了预报数据段的快照仍带着上一条实况，不应重复检查升降温
+    manager.check_alerts(snapshot(HOUR, 16.0, hourly=[]))
+    assert manager.triggered == 1
+
+
+def test_extreme_weather_matches_alert_events():
+    manager = make_manager()
+    data = snapshot(0, 25.0, alerts=[{"event": "暴雨橙色预警"}])
+    manager.check_alerts(data)
+    assert manager._pending == [("beijing", "极端天气预警：beijing当前天气暴雨橙色预警")]
+    manager.check_alerts(data)
+    assert manager.triggered == 1
+
+
+class FakeConnection:
+    """记录 executemany 写入的行；fail 为 True 时执行失败"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, rows):
+        if self.db.fail:
+            raise ConnectionError("db down")
+        self.db.rows.extend(rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    def __init__(self):
+        self.fail = False
+        self.rows = []
+
+    def connect(self, **kwargs):
+        return FakeConnection(self)
+
+
+def test_flush_merges_alerts_per_recipient(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr("master.alarm_manager.get_db_connection", db.connect)
+    manager = make_manager(phone_numbers=["1", "2"])
+    manager._trigger_alert("beijing", "告警A")
+    manager._trigger_alert("shanghai", "告警B")
+    assert manager.flush() == 2
+    assert manager.sms_sender.sent == [(["1", "2"], "天气预警（2条）：\n告警A\n告警B")]
+    assert [message for message, _ in db.rows] == ["告警A", "告警B"]
+
+
+def test_failed_record_is_retried_on_next_flush(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr("master.alarm_manager.get_db_connection", db.connect)
+    manager = make_manager()
+    db.fail = True
+    manager._trigger_alert("beijing", "告警A")
+    manager.flush()
+    assert manager.stats()["unrecorded"] == 1
+    assert len(manager.sms_sender.sent) == 1
+
+    db.fail = False
+    manager._trigger_alert("beijing", "告警B")
+    manager.flush()
+    assert [message for message, _ in db.rows] == ["告警A", "告警B"]
+    assert manager.stats()["unrecorded"] == 0
+    # 重试不会重复发送短信
+    assert len(manager.sms_sender.sent) == 2
+
+
+def test_unrecorded_backlog_is_bounded(monkeypatch):
+    db = FakeDB()
+    db.fail = True
+    monkeypatch.setattr("master.alarm_manager.get_db_connection", db.connect)
+    manager = make_manager(record_backlog=3)
+    for i in range(5):
+        manager._trigger_alert("beijing", f"告警{i}")
+        manager.flush()
+    assert manager.stats()["unrecorded"] == 3
+    assert manager.record_dropped == 2
+
+    db.fail = False
+    manager.flush()
+    assert [message for message, _ in db.rows] == ["告警2", "告警3", "告警4"]
+
+
+def test_flush_splits_messages_over_merge_size(monkeypatch):
+    monkeypatch.setattr("master.alarm_manager.get_db_connection", FakeDB().connect)
+    manager = make_manager(phone_numbers=["1"], merge_size=2)
+    for name in "ABC":
+        manager._trigger_alert(name, f"告警{name}")
+    manager.flush()
+    assert manager.sms_sender.sent == [(["1"], "天气预警（2条）：\n告警A\n告警B"), (["1"], "告警C")]
@@ -0,0 +1,71 @@
+"""
+tests/test_codec.py
+
+MessageCodec：各格式/压缩方式的编解码往返、旧格式兼容、多线程共用编解码器。
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from shared import codec
+from shared.codec import MessageCodec
+
+SNAPSHOT = {
+    "location": "beijing",
+    "current": {"dt": 1700000000, "temp": 21.5, "weather": [{"id": 800, "main": "Clear"}]},
+    "hourly": [{"dt": 1700000000 + i * 3600, "temp": 20.0 + i / 10, "pop": 0.1} for i in range(48)],
+    "alerts": [{"event": "大风蓝色预警", "tags": ["Wind"]}],
+}
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_msgpack_round_trip(compression):
+    c = MessageCodec(compression=compression, compress_threshold=64)
+    encoded = c.encode(SNAPSHOT)
+    assert isinstance(encoded, bytes)
+    assert encoded[0] >> 4 == codec.FORMAT_VERSION
+    assert encoded[0] & 0x3 == (codec.COMPRESSION_ZLIB if compression == "zlib" else codec.COMPRESSION_NONE)
+    assert c.decode(encoded) == SNAPSHOT
+
+
+def test_small_messages_are_not_compressed():
+    c = MessageCodec(compression="zlib", compress_threshold=1 << 20)
+    encoded = c.encode(SNAPSHOT)
+    assert encoded[0] & 0x3 == codec.COMPRESSION_NONE
+    assert c.decode(encoded) == SNAPSHOT
+
+
+def test_json_format_stays_legacy_text():
+    encoded = MessageCodec(fmt="json").encode(SNAPSHOT)
+    assert isinstance(encoded, str)
+    assert MessageCodec().decode(encoded) == SNAPSHOT
+
+
+def test_decodes_legacy_json_bytes():
+    assert MessageCodec().decode(json.dumps(SNAPSHOT).encode("utf-8")) == SNAPSHOT
+
+
+def test_rejects_unknown_version_and_empty_message():
+    with pytest.raises(ValueError):
+        MessageCodec().decode(bytes(((codec.FORMAT_VERSION + 1) << 4,)) + b"x")
+    with pytest.raises(ValueError):
+        MessageCodec().decode(b"")
+
+
+def test_zstd_round_trip_across_threads():
+    pytest.importorskip("zstandard")
+    c = MessageCodec(compression="zstd", compress_threshold=0)
+    payloads = [dict(SNAPSHOT, seq=i) for i in range(200)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        decoded = list(pool.map(lambda p: c.decode(c.encode(p)), payloads))
+    assert decoded == payloads
+
+
+def test_zstd_falls_back_to_zlib_without_zstandard(monkeypatch):
+    monkeypatch.setattr(codec, "zstandard", None)
+    c = MessageCodec(compression="zstd", compress_threshold=0)
+    encoded = c.encode(SNAPSHOT)
+    assert encoded[0] & 0x3 == codec.COMPRESSION_ZLIB
+    assert c.decode(encoded) == SNAPSHOT
@@ -0,0 +1,30 @@
+"""
+tests/test_geo_grid.py
+
+GeoGrid：默认不分桶；多个地点的单元按中心坐标请求，只有一个地点的单元按地点自身坐标请求。
+"""
+
+from master.geo_grid import GeoGrid
+from master.location_registry import Location
+
+
+def test_default_grid_does_not_bucket():
+    locations = [Location("a", 39.91, 116.41), Location("b", 39.92, 116.42)]
+    groups = GeoGrid().group(locations)
+    assert [(target, members) for target, members in groups.values()] == [
+        (locations[0], [locations[0]]), (locations[1], [locations[1]])]
+
+
+def test_single_member_cell_keeps_own_coordinates():
+    beijing = Location("beijing", 39.9042, 116.4074)
+    groups = GeoGrid(0.05).group([beijing])
+    assert list(groups.values()) == [(beijing, [beijing])]
+
+
+def test_shared_cell_uses_center():
+    a, b, far = Location("a", 39.91, 116.41), Location("b", 39.92, 116.42), Location("far", 31.23, 121.47)
+    groups = GeoGrid(0.05).group([a, b, far])
+    targets = {tuple(members): target for target, members in groups.values()}
+    shared = targets[(a, b)]
+    assert (shared.lat, shared.lon) == (39.925, 116.425)
+    assert targets[(far,)] is far
@@ -0,0 +1,88 @@
+"""
+tests/test_llm_advisor.py
+
+LLMAdvisor：天气特征量化与提示词描述、缓存命中、并发未命中凑批、批量接口、上游失败时的兜底文本，
+上游使用 benchmarks/fake_llm_server 提供的模拟模型服务。
+"""
+
+import threading
+
+import pytest
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from master.llm_advisor import FALLBACK_ADVICE, LLMAdvisor, describe, quantize
+
+
+@pytest.fixture
+def server():
+    server = FakeLLMServer(latency=0.0, per_item=0.0).start()
+    yield server
+    server.stop()
+
+
+def weather(temp, code=800, wind=2.0, uvi=1.0):
+    return {"current": {"temp": temp, "weather": [{"id": code}], "wind_speed": wind, "uvi": uvi}}
+
+
+def test_quantize_groups_similar_weather():
+    assert quantize(weather(21.3)) == quantize(weather(24.9)) == (20, 800, 0, 0)
+    assert quantize(weather(25.0)) != quantize(weather(24.9))
+    assert quantize(weather(-0.5, code=601, wind=9.0, uvi=11))[:2] == (-5, 6)
+    assert quantize({"weather": "晴朗", "temperature": 25}) == (25, "晴朗", None, None)
+    with pytest.raises(ValueError):
+        quantize({"current": {"humidity": 40}})
+
+
+def test_describe_only_contains_bands():
+    assert describe((20, 5, 1, 2)) == "气温 20~25℃，天气雨，风力和风，紫外线高"
+    assert describe((25, "晴朗", None, None)) == "气温 25~30℃，天气晴朗"
+
+
+def test_similar_weather_hits_cache(server):
+    advisor = LLMAdvisor(api_url=server.url)
+    first = advisor.get_advice(weather(21.0))
+    assert first.startswith("气温 20~25℃")
+    assert advisor.get_advice(weather(23.5)) == first
+    assert server.requests == 1
+
+
+def test_concurrent_misses_share_one_request(server):
+    advisor = LLMAdvisor(api_url=server.url, batch_window=0.2)
+    temps = [0, 5, 10, 15, 20, 25]
+    results = {}
+
+    def ask(temp):
+        results[temp] = advisor.get_advice(weather(temp))
+
+    threads = [threading.Thread(target=ask, args=(temp,)) for temp in temps]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.requests == 1
+    assert server.items == len(temps)
+    for temp in temps:
+        assert results[temp].startswith(f"气温 {temp}~{temp + 5}℃")
+
+
+def test_get_advice_many_batches_distinct_keys(server):
+    advisor = LLMAdvisor(api_url=server.url, batch_size=2)
+    advisor.get_advice(weather(0))
+    batch = [weather(1), weather(6), weather(7), weather(11), {"weather": "晴"}]
+    advice = advisor.get_advice_many(batch)
+    # 0~5℃ 已缓存，其余两个特征一次请求
+    assert server.requests == 2
+    assert server.items == 3
+    assert advice[1] == advice[2]
+    assert advice[3].startswith("气温 10~15℃")
+    assert advice[4] == FALLBACK_ADVICE
+
+
+def test_upstream_failure_returns_fallback_without_caching(server):
+    advisor = LLMAdvisor(api_url="http://127.0.0.1:9/v1/chat/completions", timeout=(0.5, 1))
+    assert advisor.get_advice(weather(20)) == FALLBACK_ADVICE
+    assert advisor.get_advice_many([weather(20)]) == [FALLBACK_ADVICE]
+    assert advisor.failures == 2
+
+    advisor.api_url = server.url
+    assert advisor.get_advice(weather(20)).startswith("气温 20~25℃")
@@ -0,0 +1,73 @@
+"""
+tests/test_location_registry.py
+
+LocationRegistry.from_env：LOCATIONS_FILE、LOCATIONS_TABLE（MySQL 连接池）与 WEATHER_LAT / WEATHER_LON 的优先顺序。
+"""
+
+import json
+
+import pytest
+
+from master.location_registry import LocationRegistry
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.sql = None
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.sql = sql
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in ("LOCATIONS_FILE", "LOCATIONS_TABLE", "WEATHER_LAT", "WEATHER_LON", "WEATHER_LOCATION_NAME"):
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+def test_locations_table_uses_pooled_connection(env):
+    conn = FakeConnection([("beijing", 39.9, 116.4), ("bad", 100.0, 0.0)])
+    env.setattr("shared.db_connector.get_db_connection", lambda **kwargs: conn)
+    env.setenv("LOCATIONS_TABLE", "city_locations")
+    env.setenv("WEATHER_LAT", "1")
+    env.setenv("WEATHER_LON", "2")
+    registry = LocationRegistry.from_env()
+    assert [loc.name for loc in registry] == ["beijing"]
+    assert "FROM city_locations WHERE enabled = 1" in conn.sql
+    assert conn.closed
+
+
+def test_locations_file_takes_precedence(env, tmp_path):
+    path = tmp_path / "locations.json"
+    path.write_text(json.dumps([{"name": "shanghai", "lat": 31.2, "lon": 121.5}]), encoding="utf-8")
+    env.setenv("LOCATIONS_FILE", str(path))
+    env.setenv("LOCATIONS_TABLE", "locations")
+    assert [loc.name for loc in LocationRegistry.from_env()] == ["shanghai"]
+
+
+def test_falls_back_to_single_coordinate(env):
+    env.setenv("WEATHER_LAT", "44.34")
+    env.setenv("WEATHER_LON", "10.99")
+    assert [loc.to_dict() for loc in LocationRegistry.from_env()] == [
+        {"name": "44.3400,10.9900", "lat": 44.34, "lon": 10.99}]
+    env.delenv("WEATHER_LON")
+    with pytest.raises(ValueError):
+        LocationRegistry.from_env()
@@ -0,0 +1,138 @@
+"""
+tests/test_sms_sender.py
+
+SmsSender：对 benchmarks/fake_sms_gateway 投递、相同内容合并请求但不改写内容、429/5xx 重试、
+Retry-After 上限、令牌桶参数校验、待重试请求跨重启保留。
+"""
+
+import json
+import time
+
+import pytest
+
+from benchmarks.fake_sms_gateway import FakeSmsGateway
+from master.sms_sender import SmsSender, TokenBucket
+
+
+class RecordingGateway(FakeSmsGateway):
+    """记录成功请求的请求体"""
+
+    def __init__(self, **kwargs):
+        super().__init__(latency=0.0, **kwargs)
+        self.bodies = []
+
+    def _handle(self, body):
+        status, headers = super()._handle(body)
+        if status == 200:
+            with self._lock:
+                self.bodies.append(json.loads(body))
+        return status, headers
+
+
+@pytest.fixture
+def gateway():
+    gateway = RecordingGateway().start()
+    yield gateway
+    gateway.stop()
+
+
+def make_sender(gateway, tmp_path, **kwargs):
+    kwargs.setdefault("rate_limit", 1000)
+    kwargs.setdefault("batch_interval", 0.05)
+    kwargs.setdefault("max_attempts", 5)
+    kwargs.setdefault("max_backoff", 0.05)
+    return SmsSender(gateway.url, retry_path=str(tmp_path / "sms_retry.jsonl"), **kwargs)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_identical_messages_share_one_request(gateway, tmp_path):
+    sender = make_sender(gateway, tmp_path)
+    try:
+        sender.send_sms(["1", "2"], "告警A")
+        sender.send_sms(["2", "3"], "告警A")
+        assert sender.flush(5)
+        assert gateway.bodies == [{"phone_numbers": ["1", "2", "3"], "message": "告警A"}]
+        assert sender.stats()["recipients_sent"] == 3
+    finally:
+        sender.close()
+
+
+def test_different_messages_are_not_merged(gateway, tmp_path):
+    sender = make_sender(gateway, tmp_path, batch_size=2)
+    try:
+        sender.send_sms(["1", "2", "3"], "告警A")
+        sender.send_sms(["1"], "告警B")
+        assert sender.flush(5)
+        received = sorted((body["message"], tuple(body["phone_numbers"])) for body in gateway.bodies)
+        assert received == [("告警A", ("1", "2")), ("告警A", ("3",)), ("告警B", ("1",))]
+    finally:
+        sender.close()
+
+
+def test_server_errors_are_retried(gateway, tmp_path):
+    gateway.failure_rate = 1.0
+    sender = make_sender(gateway, tmp_path)
+    try:
+        sender.send_sms(["1"], "告警A")
+        assert wait_until(lambda: sender.retried >= 1)
+        gateway.failure_rate = 0.0
+        assert wait_until(lambda: sender.sent == 1)
+        assert gateway.bodies == [{"phone_numbers": ["1"], "message": "告警A"}]
+        assert sender.dropped == 0
+    finally:
+        sender.close()
+
+
+def test_throttled_requests_are_retried(gateway, tmp_path):
+    gateway.rate_limit = 1
+    sender = make_sender(gateway, tmp_path, max_attempts=100)
+    try:
+        for i in range(3):
+            sender.send_sms(["1"], f"告警{i}")
+        assert wait_until(lambda: sender.sent == 3)
+        assert gateway.throttled > 0
+        assert sorted(body["message"] for body in gateway.bodies) == ["告警0", "告警1", "告警2"]
+    finally:
+        sender.close()
+
+
+def test_retry_after_is_capped_at_max_backoff(tmp_path):
+    sender = SmsSender("http://127.0.0.1:9/send", rate_limit=10, max_attempts=5, max_backoff=5.0,
+                       retry_path=str(tmp_path / "sms_retry.jsonl"))
+    request = {"phone_numbers": ["1"], "message": "告警A", "queued_at": time.time(), "attempts": 0}
+    before = time.time()
+    sender._schedule_retry(request, "HTTP 429", retry_after="86400")
+    next_at = sender._retries[0][0]
+    assert before <= next_at <= time.time() + 5.0
+
+
+@pytest.mark.parametrize("rate,burst", [(0, None), (-1, None), (10, 0.5)])
+def test_token_bucket_rejects_invalid_parameters(rate, burst):
+    with pytest.raises(ValueError):
+        TokenBucket(rate, burst)
+
+
+def test_pending_retries_survive_restart(gateway, tmp_path):
+    gateway.failure_rate = 1.0
+    sender = make_sender(gateway, tmp_path, max_backoff=0.5)
+    sender.send_sms(["1"], "告警A")
+    assert wait_until(lambda: sender.stats()["pending_retries"] == 1)
+    sender.close()
+    assert (tmp_path / "sms_retry.jsonl").exists()
+
+    gateway.failure_rate = 0.0
+    restarted = make_sender(gateway, tmp_path)
+    try:
+        assert wait_until(lambda: restarted.sent == 1)
+        assert gateway.bodies == [{"phone_numbers": ["1"], "message": "告警A"}]
+        assert not (tmp_path / "sms_retry.jsonl").exists()
+    finally:
+        restarted.close()
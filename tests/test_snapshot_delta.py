@@ -0,0 +1,111 @@
+"""
+tests/test_snapshot_delta.py
+
+DeltaEncoder / DeltaDecoder：增量往返、重复与缺口处理、主节点重启（epoch 变化）、已结束的数据段删除。
+"""
+
+import copy
+
+from shared.snapshot_delta import DELTA, KEYFRAME, DeltaDecoder, DeltaEncoder, apply_patch, diff_snapshot
+
+
+def snapshot(temp, dt=1700000000, alerts=None):
+    data = {
+        "location": "beijing",
+        "lat": 39.9,
+        "lon": 116.4,
+        "current": {"dt": dt, "temp": temp, "humidity": 40},
+        "hourly": [{"dt": dt + i * 3600, "temp": temp + i, "pop": 0.0} for i in range(3)],
+    }
+    if alerts is not None:
+        data["alerts"] = alerts
+    return data
+
+
+def test_diff_and_apply_round_trip():
+    old = snapshot(20.0, alerts=[{"event": "大风"}])
+    new = snapshot(21.0, dt=1700003600)
+    del new["current"]["humidity"]
+    patch = diff_snapshot(old, new)
+    assert apply_patch(old, patch) == new
+    assert "alerts" in patch["del"]
+
+
+def test_decoder_reconstructs_every_snapshot():
+    encoder, decoder = DeltaEncoder(keyframe_interval=3), DeltaDecoder()
+    for i in range(10):
+        data = snapshot(20.0 + i, dt=1700000000 + i * 60)
+        message = encoder.encode(copy.deepcopy(data))
+        assert message["type"] == (KEYFRAME if i % 3 == 0 else DELTA)
+        assert decoder.apply(message) == data
+    assert decoder.stats()["gaps"] == 0
+
+
+def test_duplicate_messages_are_ignored():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    first = encoder.encode(snapshot(20.0))
+    second = encoder.encode(snapshot(21.0))
+    decoder.apply(first)
+    assert decoder.apply(second) is not None
+    assert decoder.apply(second) is None
+    assert decoder.apply(first) is None
+    assert decoder.stats()["stale"] == 2
+
+
+def test_gap_requests_keyframe_and_recovers():
+    requested = []
+    encoder = DeltaEncoder()
+    decoder = DeltaDecoder(requested.append, request_interval=0)
+    decoder.apply(encoder.encode(snapshot(20.0)))
+    encoder.encode(snapshot(21.0))  # 丢失
+    assert decoder.apply(encoder.encode(snapshot(22.0))) is None
+    assert requested == ["beijing"]
+    assert decoder.snapshot("beijing") is None
+    assert decoder.apply(encoder.keyframe("beijing")) == snapshot(22.0)
+    assert decoder.apply(encoder.encode(snapshot(23.0))) == snapshot(23.0)
+
+
+def test_decoder_follows_master_restart():
+    requested = []
+    decoder = DeltaDecoder(requested.append, request_interval=0)
+    old_master = DeltaEncoder(epoch=1)
+    for i in range(50):
+        decoder.apply(old_master.encode(snapshot(10.0 + i)))
+
+    new_master = DeltaEncoder(epoch=2)
+    # 重启后的第一条消息是 seq=1 的关键帧，必须替换本地状态
+    assert decoder.apply(new_master.encode(snapshot(30.0))) == snapshot(30.0)
+    assert decoder.apply(new_master.encode(snapshot(31.0))) == snapshot(31.0)
+    assert decoder.stats()["stale"] == 0
+    assert decoder.stats()["epoch_changes"] == 1
+    assert requested == []
+
+
+def test_delta_from_new_epoch_requests_keyframe():
+    requested = []
+    decoder = DeltaDecoder(requested.append, request_interval=0)
+    old_master = DeltaEncoder(epoch=1)
+    for i in range(5):
+        decoder.apply(old_master.encode(snapshot(10.0 + i)))
+
+    new_master = DeltaEncoder(epoch=2)
+    new_master.encode(snapshot(30.0))  # 关键帧丢失
+    assert decoder.apply(new_master.encode(snapshot(31.0))) is None
+    assert requested == ["beijing"]
+    assert decoder.apply(new_master.keyframe("beijing")) == snapshot(31.0)
+
+
+def test_requested_section_missing_from_response_is_removed():
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    decoder.apply(encoder.encode(snapshot(20.0, alerts=[{"event": "大风"}])))
+
+    # 本轮只请求了 current，alerts 不在请求范围内，保留
+    partial = {"location": "beijing", "current": {"dt": 1700000060, "temp": 20.5, "humidity": 40}}
+    assert decoder.apply(encoder.encode(partial, sections=["current"]))["alerts"] == [{"event": "大风"}]
+
+    # 请求了 alerts 但响应中没有：警报已结束
+    partial = {"location": "beijing", "current": {"dt": 1700000120, "temp": 21.0, "humidity": 40}}
+    restored = decoder.apply(encoder.encode(partial, sections=["current", "alerts"]))
+    assert "alerts" not in restored
+    assert "alerts" not in encoder.snapshot("beijing")
+    assert encoder.keyframe("beijing")["snapshot"] == restored
@@ -0,0 +1,105 @@
+"""
+tests/test_sqlite_writer.py
+
+SQLiteWriter / WeatherReplica：行哈希只在提交成功后更新，写入线程遇到任意异常都继续运行。
+"""
+
+import sqlite3
+
+import pytest
+
+from slave.replica import WeatherReplica
+from slave.sqlite_writer import SQLiteWriter
+
+CURRENT = {
+    "dt": 1700000000, "sunrise": 1699990000, "sunset": 1700030000, "temp": 20.5, "feels_like": 19.0,
+    "pressure": 1012, "humidity": 40, "dew_point": 6.0, "uvi": 2.1, "clouds": 10, "visibility": 10000,
+    "wind_speed": 3.2, "wind_deg": 180, "wind_gust": 5.0,
+    "weather": [{"id": 800, "main": "Clear", "description": "晴", "icon": "01d"}],
+}
+
+
+@pytest.fixture
+def replica(tmp_path):
+    replica = WeatherReplica()
+    replica.writer = SQLiteWriter(str(tmp_path / "slave.db"), schema=replica.schema(), flush_interval_ms=10).start()
+    yield replica
+    replica.writer.close()
+
+
+def count_rows(replica, table):
+    conn = sqlite3.connect(replica.writer.db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_unchanged_rows_skipped_after_commit(replica):
+    snapshot = {"location": "beijing", "current": CURRENT}
+    assert replica.write(snapshot) == {"current_weather": 1}
+    assert replica.writer.flush(5)
+    assert replica.write(snapshot) == {}
+    assert count_rows(replica, "current_weather") == 1
+
+
+def test_failed_rows_are_resubmitted(replica):
+    # dt 为 NOT NULL 唯一键列，整批与逐行重试都会失败
+    snapshot = {"location": "beijing", "current": dict(CURRENT, dt=None)}
+    assert replica.write(snapshot) == {"current_weather": 1}
+    assert replica.writer.flush(5)
+    assert replica.writer.metrics()["rows_failed"] == 1
+    # 行哈希未更新，同样的数据下次仍会提交
+    assert replica.write(snapshot) == {"current_weather": 1}
+    assert replica.writer.flush(5)
+
+
+def test_hashes_wait_for_commit(replica):
+    snapshot = {"location": "beijing", "current": CURRENT}
+    replica.writer.close()
+    assert replica.write(snapshot) == {"current_weather": 1}
+    # 写入线程已停止，尚未提交，再次写入仍提交
+    assert replica.write(snapshot) == {"current_weather": 1}
+
+
+class ExplodingRow:
+    """按序列读取参数时抛出非 sqlite3 异常"""
+
+    def __len__(self):
+        return 1
+
+    def __getitem__(self, index):
+        raise RuntimeError("boom")
+
+
+def test_writer_survives_unexpected_errors(tmp_path):
+    writer = SQLiteWriter(str(tmp_path / "w.db"), schema="CREATE TABLE t (v INTEGER);", flush_interval_ms=10).start()
+    called = []
+    writer.submit("INSERT INTO t (v) VALUES (?)", [ExplodingRow()], on_commit=[lambda: called.append("bad")])
+    assert writer.flush(5)
+    writer.submit("INSERT INTO t (v) VALUES (?)", [(1,), (2,)], on_commit=[lambda: called.append("ok")])
+    assert writer.flush(5)
+    assert writer._thread.is_alive()
+    assert called == ["ok"]
+    assert writer.metrics()["rows_written"] == 2
+    assert writer.metrics()["rows_failed"] == 1
+    writer.close()
+
+
+def test_batch_keeps_submit_order(tmp_path):
+    writer = SQLiteWriter(str(tmp_path / "w.db"), schema="CREATE TABLE t (k INTEGER PRIMARY KEY, v INTEGER);",
+                          flush_interval_ms=200).start()
+    upsert, delete = "INSERT OR REPLACE INTO t (k, v) VALUES (?, ?)", "DELETE FROM t WHERE k = ?"
+    # 同一批中先写入、再删除、再写入：不能把两次写入合并到删除之前
+    writer.submit(upsert, [(1, 1)])
+    writer.submit(delete, [(1,)])
+    writer.submit(upsert, [(1, 2)])
+    writer.submit(upsert, [(2, 2)])
+    assert writer.flush(5)
+    writer.close()
+    assert writer.flushes == 1
+    conn = sqlite3.connect(writer.db_path)
+    try:
+        assert conn.execute("SELECT k, v FROM t ORDER BY k").fetchall() == [(1, 2), (2, 2)]
+    finally:
+        conn.close()
@@ -0,0 +1,117 @@
+"""
+tests/test_sync_state.py
+
+从节点重启后的 Stream 追赶：增量解码状态保存到 SQLite sync_state 表，重启后载入并直接应用积压的增量。
+"""
+
+import fakeredis
+
+from shared.codec import MessageCodec
+from shared.redis_util import STREAM_FIELD
+from shared.snapshot_delta import DeltaDecoder, DeltaEncoder
+from slave.replica import WeatherReplica
+from slave.sqlite_writer import SQLiteWriter
+from slave.stream_consumer import StreamConsumer
+
+STREAM = "weather:updates"
+CODEC = MessageCodec()
+
+
+def snapshot(location, i):
+    return {
+        "location": location,
+        "current": {"dt": 1700000000 + i * 60, "temp": 20.0 + i / 10, "humidity": 40},
+        "hourly": [{"dt": 1700000000 + h * 3600, "temp": 20.0 + h + i / 10} for h in range(3)],
+    }
+
+
+def publish(client, encoder, rounds, start=0):
+    for i in range(start, start + rounds):
+        for location in ("beijing", "shanghai"):
+            client.xadd(STREAM, {STREAM_FIELD: CODEC.encode(encoder.encode(snapshot(location, i)))})
+
+
+class Slave:
+    """最小从节点：Stream 消费者 + 增量解码器 + 本地副本（sync_state 表）"""
+
+    def __init__(self, client, db_path):
+        self.requested = []
+        self.received = []
+        self.replica = WeatherReplica()
+        self.writer = SQLiteWriter(str(db_path), schema=self.replica.schema(), flush_interval_ms=10).start()
+        self.replica.writer = self.writer
+        self.decoder = DeltaDecoder(self.requested.append, request_interval=0)
+        self.decoder.load_state(self.replica.load_sync_state(str(db_path)))
+        self.consumer = StreamConsumer(client, STREAM, "slave-1", "slave-1", self.handle,
+                                       block_ms=1, start_id="0")
+        self.consumer.ensure_group()
+
+    def handle(self, payload):
+        data = self.decoder.apply(CODEC.decode(payload))
+        if data is not None:
+            self.received.append(data)
+
+    def consume(self):
+        self.consumer.drain_pending()
+        while self.consumer.poll():
+            pass
+
+    def stop(self):
+        self.replica.save_sync_state(self.decoder.export_state())
+        self.writer.close()
+
+
+def test_restarted_slave_applies_backlog_without_keyframes(tmp_path):
+    client = fakeredis.FakeRedis()
+    encoder = DeltaEncoder(keyframe_interval=1000)
+    db_path = tmp_path / "slave.db"
+
+    publish(client, encoder, 5)
+    slave = Slave(client, db_path)
+    slave.consume()
+    assert len(slave.received) == 10
+    slave.stop()
+
+    # 从节点停机期间主节点继续发布增量
+    publish(client, encoder, 5, start=5)
+    restarted = Slave(client, db_path)
+    restarted.consume()
+    assert restarted.requested == []
+    assert restarted.decoder.stats()["gaps"] == 0
+    assert len(restarted.received) == 10
+    assert restarted.decoder.snapshot("beijing") == snapshot("beijing", 9)
+    restarted.stop()
+
+
+def test_missing_checkpoint_falls_back_to_keyframe_request(tmp_path):
+    client = fakeredis.FakeRedis()
+    encoder = DeltaEncoder(keyframe_interval=1000)
+    publish(client, encoder, 3)
+    slave = Slave(client, tmp_path / "slave.db")
+    slave.consume()
+    # 异常退出：不保存状态
+    slave.writer.close()
+
+    publish(client, encoder, 2, start=3)
+    restarted = Slave(client, tmp_path / "slave.db")
+    restarted.consume()
+    assert sorted(set(restarted.requested)) == ["beijing", "shanghai"]
+    assert restarted.received == []
+    restarted.stop()
+
+
+def test_dropped_state_is_deleted_from_checkpoint(tmp_path):
+    replica = WeatherReplica()
+    writer = SQLiteWriter(str(tmp_path / "slave.db"), schema=replica.schema(), flush_interval_ms=10).start()
+    replica.writer = writer
+    decoder = DeltaDecoder(request_interval=0)
+    encoder = DeltaEncoder()
+    decoder.apply(encoder.encode(snapshot("beijing", 0)))
+    replica.save_sync_state(decoder.export_state())
+    assert decoder.export_state() == []
+
+    encoder.encode(snapshot("beijing", 1))  # 丢失，出现缺口
+    decoder.apply(encoder.encode(snapshot("beijing", 2)))
+    replica.save_sync_state(decoder.export_state())
+    writer.close()
+    assert WeatherReplica.load_sync_state(str(tmp_path / "slave.db")) == []
@@ -0,0 +1,89 @@
+"""
+tests/test_weather_dao.py
+
+WeatherUnitOfWork.write_snapshots：同一批中同一地点的多个快照依次比对，回到旧值的行不会被误判为未变化。
+"""
+
+from pymysql.converters import escape_item
+
+from shared.weather_dao import WeatherUnitOfWork
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        self.conn.statements.append(sql)
+
+    def fetchone(self):
+        return (4 * 1024 * 1024,)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def escape(self, row):
+        return escape_item(row, "utf8")
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_uow(conn):
+    uow = WeatherUnitOfWork("localhost", 3306, "user", "password", "weather")
+    uow.get_connection = lambda: conn
+    return uow
+
+
+def snapshot(precipitation):
+    return {"location": "beijing", "minutely": [{"dt": 1700000000, "precipitation": precipitation}]}
+
+
+def inserts(conn):
+    return [sql for sql in conn.statements if sql.startswith("INSERT")]
+
+
+def test_value_reverting_within_batch_is_written_last():
+    conn = FakeConnection()
+    uow = make_uow(conn)
+    uow.write_snapshots([snapshot(0.0)])
+    conn.statements.clear()
+
+    uow.write_snapshots([snapshot(0.5), snapshot(0.0)])
+    statements = inserts(conn)
+    assert len(statements) == 1
+    # 同一唯一键的后一行覆盖前一行，数据库最终为 0.0
+    assert statements[0].index("0.5") < statements[0].rindex("0.0")
+
+    conn.statements.clear()
+    uow.write_snapshots([snapshot(0.0)])
+    assert inserts(conn) == []
+    uow.write_snapshots([snapshot(0.5)])
+    assert len(inserts(conn)) == 1
+
+
+def test_unchanged_snapshots_in_batch_are_skipped():
+    conn = FakeConnection()
+    uow = make_uow(conn)
+    uow.write_snapshots([snapshot(0.2), snapshot(0.2)])
+    statements = inserts(conn)
+    assert len(statements) == 1
+    assert statements[0].count("0.2") == 1
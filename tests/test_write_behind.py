@@ -0,0 +1,108 @@
+"""
+tests/test_write_behind.py
+
+WriteBehindQueue：数据库不可用时溢出到文件，恢复后先回放旧数据再写入新数据。
+"""
+
+import time
+import threading
+
+from shared.write_behind import WriteBehindQueue
+
+
+class FlakyDB:
+    """按调用顺序记录写入的条目；down 为 True 时抛出 ConnectionError"""
+
+    def __init__(self):
+        self.down = False
+        self.written = []
+        self.lock = threading.Lock()
+
+    def write_batch(self, items):
+        if self.down:
+            raise ConnectionError("db down")
+        with self.lock:
+            self.written.extend(items)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def make_queue(db, tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 0.02)
+    kwargs.setdefault("replay_interval", 0.2)
+    return WriteBehindQueue(db.write_batch, spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+
+
+def test_spilled_items_replay_before_newer_items(tmp_path):
+    db = FlakyDB()
+    db.down = True
+    wq = make_queue(db, tmp_path).start()
+    try:
+        wq.submit({"location": "a", "v": 1})
+        assert wait_until(lambda: wq.spilled == 1)
+        db.down = False
+        wq.submit({"location": "a", "v": 2})
+        wq.submit({"location": "a", "v": 3})
+        assert wait_until(lambda: wq.replayed == 3)
+        assert [item["v"] for item in db.written] == [1, 2, 3]
+        assert wq.metrics()["spill_pending"] == 0
+    finally:
+        wq.close()
+
+
+def test_replay_orders_by_enqueue_time(tmp_path):
+    db = FlakyDB()
+    wq = make_queue(db, tmp_path)
+    wq._spill([(2.0, {"v": 2}), (1.0, {"v": 1})])
+    wq._spill([(3.0, {"v": 3})])
+    assert wq.replay() == 3
+    assert [item["v"] for item in db.written] == [1, 2, 3]
+
+
+def test_replay_keeps_remaining_items_while_db_down(tmp_path):
+    db = FlakyDB()
+    wq = make_queue(db, tmp_path, batch_size=2)
+    wq._spill([(float(i), {"v": i}) for i in range(5)])
+    db.down = True
+    assert wq.replay() == 0
+    assert wq.metrics()["spill_pending"] == 5
+    db.down = False
+    assert wq.replay() == 5
+    assert [item["v"] for item in db.written] == [0, 1, 2, 3, 4]
+
+
+def test_legacy_spill_lines_replay_first(tmp_path):
+    db = FlakyDB()
+    wq = make_queue(db, tmp_path)
+    with open(wq.spill_path, "w", encoding="utf-8") as f:
+        f.write('{"v": 0}\n')
+    wq._spill([(1.0, {"v": 1})])
+    with open(wq.spill_path, "a", encoding="utf-8") as f:
+        f.write('[2.0, {"v"')
+    assert wq.replay() == 2
+    assert [item["v"] for item in db.written] == [0, 1]
+    assert wq.dropped == 1
+
+
+def test_close_spills_queued_items_for_next_start(tmp_path):
+    db = FlakyDB()
+    wq = make_queue(db, tmp_path)
+    wq.submit({"v": 1})
+    wq.submit({"v": 2})
+    wq.close()
+    assert db.written == []
+    assert wq.metrics()["spill_pending"] == 2
+
+    restarted = make_queue(db, tmp_path).start()
+    try:
+        assert wait_until(lambda: len(db.written) == 2)
+        assert [item["v"] for item in db.written] == [1, 2]
+    finally:
+        restarted.close()